@@ -16,6 +16,7 @@ from configparser import ConfigParser
 try:
     from qick import QickSoc, QickProgram
     from qick.helpers import json2progs
+    from qick.progcache import BinprogCache
 except:
     pass
 
@@ -53,8 +54,10 @@ class RefetchSession(OAuth2Session):
 
 class QickClient:
 
-    def __init__(self, api_endpoint, dummy_mode=False):
+    def __init__(self, api_endpoint, dummy_mode=False, cache_dir=None):
         self.api_endpoint = api_endpoint
+        # directory for caching compiled programs, or None to always compile
+        self.cache_dir = cache_dir
         self.session = requests
         self.cfg_path = "/etc/qick/config"
         self.cred_path = "/etc/qick/credentials"
@@ -188,6 +191,8 @@ class QickClient:
                 with h5py.File(resultsfile,'w') as outf:
                     datagrp = outf.create_group("data", track_order=True)
                     newprog = QickProgram(soc)
+                    if self.cache_dir is not None:
+                        newprog.binprog_cache = BinprogCache(self.cache_dir)
                     for iProg, progdict in enumerate(proglist):
                         proggrp = datagrp.create_group(str(iProg))
                         newprog.load_prog(progdict)
@@ -234,9 +239,10 @@ if __name__ == "__main__":
     parser.add_argument("--api", type=str, default=None, help="URL of API endpoint")
     parser.add_argument("-n", dest='interval', type=float, default=5.0, help="polling interval")
     parser.add_argument("-d", action='store_true', help="run in dummy mode (use DummySoc instead of QickSoc)")
+    parser.add_argument("--cache", dest='cache_dir', type=str, default=None, help="directory for caching compiled programs")
     args = parser.parse_args()
 
-    qick = QickClient(args.api, args.d)
+    qick = QickClient(args.api, args.d, cache_dir=args.cache_dir)
 
     work = None
     qick.update_status(update_config=True)
@@ -10,7 +10,7 @@ from abc import ABC, abstractmethod
 
 from .qick_asm import AbsQickProgram, AcquireMixin
 from .helpers import ch2list, check_keys
-from .parser import parse_prog
+from .parser import parse_to_bin
 
 RegisterType = ["freq", "time", "phase", "adc_freq"]
 DefaultUnits = {"freq": "MHz", "time": "us", "phase": "deg", "adc_freq": "MHz"}
@@ -523,7 +523,7 @@ class MultiplexedGenManager(AbsGenManager):
 class QickProgram(AbsQickProgram):
     """QickProgram is a Python representation of the QickSoc processor assembly program. It can be used to compile simple assembly programs and also contains macros to help make it easy to configure and schedule pulses."""
     # Instruction set for the tproc describing how to automatically generate methods for these instructions
-    instructions = {'pushi': {'type': "I", 'bin': 0b00010000, 'fmt': ((0, 53), (1, 41), (2, 36), (3, 0)), 'repr': "{0}, ${1}, ${2}, {3}"},
+    instructions = {'pushi': {'type': "I", 'bin': 0b00010000, 'fmt': ((0, 53), (1, 36), (2, 41), (3, 0)), 'repr': "{0}, ${1}, ${2}, {3}"},
                     'popi':  {'type': "I", 'bin': 0b00010001, 'fmt': ((0, 53), (1, 41)), 'repr': "{0}, ${1}"},
                     'mathi': {'type': "I", 'bin': 0b00010010, 'fmt': ((0, 53), (1, 41), (2, 36), (3, 46), (4, 0)), 'repr': "{0}, ${1}, ${2} {3} {4}"},
                     'seti':  {'type': "I", 'bin': 0b00010011, 'fmt': ((1, 53), (0, 50), (2, 36), (3, 0)), 'repr': "{0}, {1}, ${2}, {3}"},
@@ -533,7 +533,7 @@ class QickProgram(AbsQickProgram):
                     'memri': {'type': "I", 'bin': 0b00010111, 'fmt': ((0, 53), (1, 41), (2, 0)), 'repr': "{0}, ${1}, {2}"},
                     'memwi': {'type': "I", 'bin': 0b00011000, 'fmt': ((0, 53), (1, 31), (2, 0)), 'repr': "{0}, ${1}, {2}"},
                     'regwi': {'type': "I", 'bin': 0b00011001, 'fmt': ((0, 53), (1, 41), (2, 0)), 'repr': "{0}, ${1}, {2}"},
-                    'setbi': {'type': "I", 'bin': 0b00011010, 'fmt': ((0, 53), (1, 41), (2, 0)), 'repr': "{0}, ${1}, {2}"},
+                    'setbi': {'type': "I", 'bin': 0b00011010, 'fmt': ((1, 53), (0, 50), (2, 36), (3, 0)), 'repr': "{0}, {1}, ${2}, {3}"},
 
                     'loopnz': {'type': "J1", 'bin': 0b00110000, 'fmt': ((0, 53), (1, 41), (1, 36), (2, 0)), 'repr': "{0}, ${1}, @{2}"},
                     'end':    {'type': "J1", 'bin': 0b00111111, 'fmt': (), 'repr': ""},
@@ -548,7 +548,7 @@ class QickProgram(AbsQickProgram):
                     'bitw': {'type': "R", 'bin': 0b01010101, 'fmt': ((0, 53), (1, 41), (2, 36), (3, 46), (4, 31)), 'repr': "{0}, ${1}, ${2} {3} ${4}"},
                     'memr': {'type': "R", 'bin': 0b01010110, 'fmt': ((0, 53), (1, 41), (2, 36)), 'repr': "{0}, ${1}, ${2}"},
                     'memw': {'type': "R", 'bin': 0b01010111, 'fmt': ((0, 53), (2, 36), (1, 31)), 'repr': "{0}, ${1}, ${2}"},
-                    'setb': {'type': "R", 'bin': 0b01011000, 'fmt': ((0, 53), (2, 36), (1, 31)), 'repr': "{0}, ${1}, ${2}"},
+                    'setb': {'type': "R", 'bin': 0b01011000, 'fmt': ((1, 53), (0, 50), (2, 36), (7, 31), (3, 26), (4, 21), (5, 16), (6, 11)), 'repr': "{0}, {1}, ${2}, ${3}, ${4}, ${5}, ${6}, ${7}"},
                     'comment': {'fmt': ()}
                     }
 
@@ -607,6 +607,7 @@ class QickProgram(AbsQickProgram):
 
         # Attributes to dump when saving the program to JSON.
         self.dump_keys += ['prog_list']
+        self.binprog_keys += ['prog_list']
 
     def _allocate_registers(self):
         # assign tProc-controlled generator/readout channels to pages
@@ -1188,6 +1189,89 @@ class QickProgram(AbsQickProgram):
         else:
             return val
 
+    @classmethod
+    def _encoding_table(cls):
+        """Build (once per class) the lookup table used to encode instructions.
+
+        Returns
+        -------
+        dict
+            Map from instruction name to a tuple (base code, field list, immediate arg index, op-code arg indices, label arg indices).
+            The base code already includes the opcode and any fixed bits; each field is (arg index, bit shift).
+        """
+        table = cls.__dict__.get('_encoding')
+        if table is None:
+            table = {}
+            for name, idef in cls.instructions.items():
+                if name == 'comment':
+                    continue
+                fmt = tuple(idef['fmt'])
+                base = idef['bin'] << 56
+                imm = len(fmt)-1 if idef['type'] == "I" else None
+                ops = ()
+                labels = ()
+                if name == 'loopnz':
+                    base |= (0b1000 << 46)
+                    labels = (2,)
+                elif name == 'condj':
+                    ops = (2,)
+                    labels = (4,)
+                elif name[:4] in ['math', 'bitw']:
+                    ops = (3,)
+                elif name[:4] == 'read':
+                    ops = (2,)
+                table[name] = (base, fmt, imm, ops, labels)
+            cls._encoding = table
+        return table
+
+    def _convert_args(self, entry, args, labels=None):
+        # convert an instruction's immediate, op codes and labels to the unsigned ints that get encoded
+        # if labels is None, the label names are left in place (the caller must resolve them)
+        base, fmt, imm, ops, label_args = entry
+        if imm is not None or ops or label_args:
+            args = list(args)
+            if imm is not None:
+                args[imm] = self.convert_immediate(args[imm])
+            for i in ops:
+                args[i] = self.__class__.op_codes[args[i]]
+            if labels is not None:
+                for i in label_args:
+                    args[i] = labels[args[i]]  # resolve label
+        return args
+
+    def _encode(self, entry, args, labels):
+        # encode one instruction using its encoding table entry
+        base, fmt, imm, ops, label_args = entry
+        args = self._convert_args(entry, args, labels)
+        mcode = base
+        for iarg, shift in fmt:
+            mcode |= (args[iarg] << shift)
+        return mcode
+
+    @classmethod
+    def _encode_group(cls, name, rows):
+        """Encode a batch of instructions with the same name.
+
+        Parameters
+        ----------
+        name : str
+            Instruction name
+        rows : list of list
+            Argument lists, with immediates, op codes and labels already converted to unsigned ints
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of binary instructions (uint64)
+        """
+        base, fmt, imm, ops, label_args = cls._encoding_table()[name]
+        nargs = max([f[0] for f in fmt]+[-1])+1
+        args = np.array([row[:nargs] for row in rows], dtype=np.uint64).reshape(len(rows), nargs)
+        mcode = np.full(len(rows), base, dtype=np.uint64)
+        for iarg, shift in fmt:
+            mcode |= (args[:, iarg] << np.uint64(shift))
+        return mcode
+
     def compile_instruction(self, inst, labels, debug=False):
         """Converts an assembly instruction into a machine bytecode.
 
@@ -1206,73 +1290,71 @@ class QickProgram(AbsQickProgram):
             Compiled instruction in binary
 
         """
-        args = list(inst['args'])
-        idef = self.__class__.instructions[inst['name']]
-        fmt = idef['fmt']
-
         if debug:
             print(inst)
-
-        if idef['type'] == "I":
-            args[len(fmt)-1] = self.convert_immediate(args[len(fmt)-1])
-
-        if inst['name'] == 'loopnz':
-            args[2] = labels[args[2]]  # resolve label
-
-        if inst['name'] == 'condj':
-            args[4] = labels[args[4]]  # resolve label
-            # get binary condtional op code
-            args[2] = self.__class__.op_codes[inst['args'][2]]
-
-        if inst['name'][:4] == 'math':
-            args[3] = self.__class__.op_codes[inst['args'][3]]  # get math op code
-
-        if inst['name'][:4] == 'bitw':
-            # get bitwise op code
-            args[3] = self.__class__.op_codes[inst['args'][3]]
-
-        if inst['name'][:4] == 'read':
-            args[2] = self.__class__.op_codes[inst['args'][2]]  # get read op code
-
-        mcode = (idef['bin'] << 56)
-        # print(inst)
-        for field in fmt:
-            mcode |= (args[field[0]] << field[1])
-
-        if inst['name'] == 'loopnz':
-            mcode |= (0b1000 << 46)
-
-        return mcode
+        return self._encode(self._encoding_table()[inst['name']], inst['args'], labels)
 
     def compile(self, debug=False):
         """Compiles program to machine code.
+        Labels are collected in the same pass, and forward references are filled in at the end.
+        If binprog_cache is set, a previously compiled copy of the same program is used instead.
 
         Parameters
         ----------
         debug : bool
-            If True, debug mode is on
+            If True, debug mode is on (and the cache is not used)
 
         Returns
         -------
-        list of int
-            List of binary instructions
+        numpy.ndarray
+            Array of binary instructions (uint64)
         """
+        if debug:
+            self.binprog = self._compile_prog(debug=True)
+        else:
+            self.binprog = self._cached_mems(lambda: {'pmem': self._compile_prog()})['pmem']
+        return self.binprog
+
+    def _compile_prog(self, debug=False):
+        # encode the ASM list
+        table = self._encoding_table()
         labels = {}
-        # Scan the ASM instructions for labels. Skip comment lines.
+        # instructions are grouped by name, and each group is encoded with numpy at the end
+        # name -> (program counters, argument lists)
+        groups = {}
+        # jumps to labels: (group name, position in group, arg index, label name)
+        label_refs = []
         prog_counter = 0
         for inst in self.prog_list:
-            if inst['name']=='comment':
+            name = inst['name']
+            if name == 'comment':
                 continue
             if 'label' in inst:
                 if inst['label'] in labels:
                     raise RuntimeError("label used twice:", inst['label'])
                 labels[inst['label']] = prog_counter
+            if debug:
+                print(inst)
+            entry = table[name]
+            label_args = entry[4]
+            args = self._convert_args(entry, inst['args'])
+            pcs, rows = groups.setdefault(name, ([], []))
+            for i in label_args:
+                # labels may be defined after the jump, so these get resolved once all labels are known
+                label_refs.append((name, len(rows), i, args[i]))
+            pcs.append(prog_counter)
+            rows.append(args)
             prog_counter += 1
-        self.binprog = [self.compile_instruction(inst, labels, debug=debug) for inst in self.prog_list if inst['name']!='comment']
-        progsize = len(self.binprog)
+        for name, row, i, label in label_refs:
+            groups[name][1][row][i] = labels[label]  # resolve label
+        binprog = np.zeros(prog_counter, dtype=np.uint64)
+        for name, (pcs, rows) in groups.items():
+            binprog[pcs] = self._encode_group(name, rows)
+        progsize = len(binprog)
         memsize = self.tproccfg['pmem_size']
         if progsize > memsize:
             raise RuntimeError("compiled program uses %d ASM instructions, but the tProc program memory is only %d words"%(progsize, memsize))
+        return binprog
 
     def append_instruction(self, name, *args):
         """Append instruction to the program list
@@ -1337,7 +1419,7 @@ class QickProgram(AbsQickProgram):
             Compiled program in hex format
         """
         self.compile()
-        return "\n".join([format(mc, '#018x') for mc in self.binprog])
+        return "\n".join([format(int(mc), '#018x') for mc in self.binprog])
 
     def bin(self):
         """Returns binary representation of program as string.
@@ -1348,7 +1430,7 @@ class QickProgram(AbsQickProgram):
             Compiled program in binary format
         """
         self.compile()
-        return "\n".join([format(mc, '#066b') for mc in self.binprog])
+        return "\n".join([format(int(mc), '#066b') for mc in self.binprog])
 
     def asm(self):
         """Returns assembly representation of program as string, should be compatible with the parse_prog from the parser module.
@@ -1394,8 +1476,7 @@ class QickProgram(AbsQickProgram):
         """
         match = True
         pns = [int(n, 2) for n in self.bin().split('\n')]
-        fns = [int(n, 2)
-               for ii, n in parse_prog(file=fname, outfmt="bin").items()]
+        fns = parse_to_bin(fname)
         if len(pns) != len(fns):
             print("Programs are different lengths")
             return False
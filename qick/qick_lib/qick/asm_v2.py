@@ -12,6 +12,7 @@ import copy
 from numbers import Number, Integral
 
 from .tprocv2_assembler import Assembler
+from .tprocv2_optimizer import optimize as optimize_asm
 from .qick_asm import AbsQickProgram, AcquireMixin
 from .helpers import to_int, check_bytes, check_keys
 
@@ -389,21 +390,38 @@ class Waveform(Mapping, SimpleClass):
         self.name = name
 
     def compile(self):
-        # use the field ordering, skipping the name
-        params = [getattr(self, f) for f in self._fields[1:]]
-        # if a parameter is swept, the start value is what we write to the wave memory
-        startvals = [x.start if isinstance(x, QickRawParam) else x for x in params]
-        # convert to bytes to get a 168-bit word (this is what actually ends up in the wave memory)
-        # we truncate each parameter to its correct length using mod
-        # some generator parameter lengths are smaller than the waveform parameter length:
-        # e.g. int4 uses 16 bits for all params, full-speed uses 16 bits for length
-        # in these cases the sg_translator will apply the additional truncation
-        # truncation causes parameters to wrap, which is good for some params (freq, phase) not for others (gain, length)
-        rawbytes = b''.join([int(i%2**(8*w)).to_bytes(length=w, byteorder='little', signed=False) for i, w in zip(startvals, self.widths)])
-        # pad with zero bytes to get the 256-bit word (this is the format for DMA transfers)
-        paddedbytes = rawbytes[:11]+bytes(1)+rawbytes[11:]+bytes(10)
-        # pack into a numpy array
-        return np.frombuffer(paddedbytes, dtype=np.int32)
+        return Waveform.compile_many([self])[0]
+
+    @classmethod
+    def compile_many(cls, waves):
+        """Convert a list of waveforms to the wave memory image.
+
+        Parameters
+        ----------
+        waves : list of Waveform
+            waveforms, in wave memory order
+
+        Returns
+        -------
+        numpy.ndarray
+            int32 array of shape (len(waves), 8), one 256-bit word per waveform
+        """
+        # each parameter gets its own 32-bit word, which is how the 168-bit wave memory word is laid out:
+        # the byte widths are 4, 4, 3, 4, 4, 2, and the env field is followed by a zero pad byte
+        # the remaining two words pad to the 256-bit word used for DMA transfers
+        image = np.zeros((len(waves), 8), dtype=np.int32)
+        words = image.view(np.uint32)
+        for i, (field, width) in enumerate(zip(cls._fields[1:], cls.widths)):
+            # if a parameter is swept, the start value is what we write to the wave memory
+            vals = np.array([w[field] for w in waves], dtype=np.int64)
+            # we truncate each parameter to its correct length using a mask (same as mod, for two's-complement ints)
+            # some generator parameter lengths are smaller than the waveform parameter length:
+            # e.g. int4 uses 16 bits for all params, full-speed uses 16 bits for length
+            # in these cases the sg_translator will apply the additional truncation
+            # truncation causes parameters to wrap, which is good for some params (freq, phase) not for others (gain, length)
+            words[:, i] = vals & ((1 << (8*width)) - 1)
+        return image
+
     def sweeps(self):
         return [r for r in [self.freq, self.phase, self.gain, self.length] if isinstance(r, QickRawParam)]
     def fill_steps(self, loops):
@@ -531,7 +549,7 @@ class QickRegisterV2(SimpleClass):
 
 class Macro(SimpleNamespace):
     def translate(self, prog):
-        logger.debug("translating %s" % (self))
+        logger.debug("translating %s", self)
         # translate to ASM and push to prog_list
         insts = self.expand(prog)
         for inst in insts:
@@ -549,12 +567,12 @@ class Macro(SimpleNamespace):
 
 class AsmInst(Macro):
     def translate(self, prog):
-        logger.debug("adding ASM %s, addr_inc=%d" % (self.inst, self.addr_inc))
+        logger.debug("adding ASM %s, addr_inc=%d", self.inst, self.addr_inc)
         prog._add_asm(self.inst.copy(), self.addr_inc)
 
 class Label(Macro):
     def translate(self, prog):
-        logger.debug("adding label %s" % (self.label))
+        logger.debug("adding label %s", self.label)
         prog._add_label(self.label)
 
 class End(Macro):
@@ -608,7 +626,7 @@ class WriteWmem(Macro):
     # name
     def expand(self, prog):
         addr = prog.wave2idx[self.name]
-        return [AsmInst(inst={'CMD':'WMEM_WR', 'DST':f'&{addr}'}, addr_inc=1)]
+        return [AsmInst(inst={'CMD':'WMEM_WR', 'DST':f'[&{addr}]'}, addr_inc=1)]
 
 class ReadDmem(Macro):
     # copy a dmem value into a register, using an int literal or register for the dmem address
@@ -682,6 +700,8 @@ class OpenLoop(Macro):
     def preprocess(self, prog):
         # allocate a register with the same name
         prog.add_reg(name=self.name)
+        if self.name in prog.table_loads:
+            prog.add_reg("scratch", allow_reuse=True)
 
     def expand(self, prog):
         insts = []
@@ -690,6 +710,14 @@ class OpenLoop(Macro):
         insts.append(WriteReg(dst=self.name, src=0))
         label = self.name
         insts.append(Label(label=label))
+        # at the start of each iteration, look up the table-swept values for this iteration
+        for wname, fields in prog.table_loads.get(self.name, []):
+            insts.append(ReadWmem(name=wname))
+            for par, addr in fields:
+                reg = prog._get_reg(self.name)
+                insts.append(AsmInst(inst={'CMD':"REG_WR", 'DST': prog._get_reg("scratch"), 'SRC':'op', 'OP': '%s + #%d'%(reg, addr)}, addr_inc=1))
+                insts.append(ReadDmem(dst="w_"+par, addr="scratch"))
+            insts.append(WriteWmem(name=wname))
         return insts
 
 class CloseLoop(Macro):
@@ -1910,6 +1938,9 @@ class QickProgramV2(AsmV2, AbsQickProgram):
     ----------
     soccfg : QickConfig
         The QICK firmware configuration dictionary.
+    optimize : bool
+        Run the peephole optimizer (see tprocv2_optimizer) on the generated ASM before assembling it.
+        This shrinks the program and shortens the loops, but the ASM no longer maps one-to-one to your macros.
     """
     gentypes = {'axis_signal_gen_v4': StandardGenManager,
                 'axis_signal_gen_v5': StandardGenManager,
@@ -1959,7 +1990,8 @@ class QickProgramV2(AsmV2, AbsQickProgram):
     # supported revisions of the tProc v2 core
     ASM_REVISIONS = [21, 22, 23, 24, 25, 26]
 
-    def __init__(self, soccfg):
+    def __init__(self, soccfg, optimize=False):
+        self.optimize = optimize
         super().__init__(soccfg)
 
         if self.tproccfg['type']!='qick_processor':
@@ -1997,7 +2029,8 @@ class QickProgramV2(AsmV2, AbsQickProgram):
         # Attributes to dump when saving the program to JSON.
         # The dump just keeps enough information to execute the program - ASM and initial waveform values.
         # Most of the high-level information (macros, sweeps) is lost.
-        self.dump_keys += ['waves', 'prog_list', 'labels']
+        self.dump_keys += ['waves', 'prog_list', 'labels', 'dmem_tables']
+        self.binprog_keys += ['waves', 'prog_list', 'labels']
 
     def _init_declarations(self):
         # initialize the high-level objects that get filled in manually, or by a make_program()
@@ -2022,6 +2055,9 @@ class QickProgramV2(AsmV2, AbsQickProgram):
         # allocated registers
         self.reg_dict = {}
 
+        # pulse parameters swept through lists of values, see add_table_sweep()
+        self.table_sweeps = []
+
     def _init_instructions(self):
         # initialize the low-level objects that get filled by macro expansion
 
@@ -2035,6 +2071,14 @@ class QickProgramV2(AsmV2, AbsQickProgram):
         self.loop_dict = OrderedDict()
         self.loop_stack = []
 
+        # dmem tables for table sweeps: loop name -> list of (waveform name, [(param name, table address)])
+        self.table_loads = {}
+        # the tables, as a dict with the start address and the data (list of int)
+        self.dmem_tables = None
+        # output of compile_datamem(), which is only called once per compilation (see _get_datamem())
+        self._datamem = None
+        self._datamem_done = False
+
         # low-level ASM management
 
         # the initial values here are copied from command_recognition() and label_recognition() in tprocv2_assembler.py
@@ -2048,21 +2092,25 @@ class QickProgramV2(AsmV2, AbsQickProgram):
     def load_prog(self, progdict):
         # note that we only dump+load the raw waveforms and ASM (the low-level stuff that gets converted to binary)
         # we don't load the macros, pulses, or sweeps (the high-level stuff that gets translated to the low-level stuff)
+        # programs dumped before table sweeps existed have no tables
+        progdict = dict(progdict)
+        progdict.setdefault('dmem_tables', None)
         super().load_prog(progdict)
         # re-create the Waveform objects
         self.waves = [Waveform(**w) for w in self.waves]
+        self._datamem_done = False
         # make the binary (this will prevent compile() from running and wiping out the low-level stuff)
         self._make_binprog()
 
     def _compile_prog(self):
-        # the assembler modifies some of the command dicts, so do a copy first
-        plist_copy = copy.deepcopy(self.prog_list)
-        _, p_mem = Assembler.list2bin(plist_copy, self.labels)
+        # the assembler doesn't modify the program list, so no copy is needed
+        # encoded instructions are memoized across compilations, so after a small change to a program only the changed instructions get encoded
+        _, p_mem = Assembler.list2bin(self.prog_list, self.labels, debug_strings=False, use_cache=True)
         return p_mem
 
     def _compile_waves(self):
         if self.waves:
-            return [w.compile().tolist() for w in self.waves]
+            return Waveform.compile_many(self.waves)
         else:
             return None
 
@@ -2081,14 +2129,40 @@ class QickProgramV2(AsmV2, AbsQickProgram):
 
     def compile(self):
         self._make_asm()
+        if self.optimize:
+            self.prog_list, self.labels = optimize_asm(self.prog_list, self.labels)
         self._make_binprog()
 
+    def _get_datamem(self):
+        # the sweep tables are placed after the compile_datamem() data, so the same data must be used for placing the tables and building the dmem image
+        if not self._datamem_done:
+            self._datamem = self.compile_datamem()
+            self._datamem_done = True
+        return self._datamem
+
+    def _compile_datamem_tables(self):
+        # add the table-sweep tables after whatever compile_datamem() wants to write
+        d_mem = self._get_datamem()
+        if self.dmem_tables is None:
+            return d_mem
+        addr = self.dmem_tables['addr']
+        user_len = 0 if d_mem is None else len(d_mem)
+        if user_len > addr:
+            raise RuntimeError("compile_datamem() returned %d words, which overlaps the sweep tables at address %d"%(user_len, addr))
+        full = np.zeros(addr + len(self.dmem_tables['data']), dtype=np.int32)
+        if d_mem is not None:
+            full[:user_len] = d_mem
+        full[addr:] = self.dmem_tables['data']
+        return full
+
     def _make_binprog(self):
         # convert the low-level program definition (ASM and waveform list) to binary
+        # pmem and wmem can come from the binprog cache; dmem is always rebuilt, since compile_datamem() can be overridden and isn't part of the dump
+        mems = self._cached_mems(lambda: {'pmem': self._compile_prog(), 'wmem': self._compile_waves()})
         self.binprog = {}
-        self.binprog['pmem'] = self._compile_prog()
-        self.binprog['wmem'] = self._compile_waves()
-        self.binprog['dmem'] = self.compile_datamem()
+        self.binprog['pmem'] = mems.get('pmem')
+        self.binprog['wmem'] = mems.get('wmem')
+        self.binprog['dmem'] = self._compile_datamem_tables()
         # check that the program will fit
         for name in ['pmem', 'wmem', 'dmem']:
             progsize = 0
@@ -2121,6 +2195,9 @@ class QickProgramV2(AsmV2, AbsQickProgram):
         # this need to happen before preprocess, because it determines pulse lengths
         for w in self.waves:
             w.fill_steps(self.loop_dict)
+        # build the tables for table sweeps
+        # this needs to happen before preprocess, because it determines which loops need scratch registers
+        self._make_tables()
         # preprocess macros
         # this means stepping through the timeline (evaluating "auto" times etc.)
         for i, macro in enumerate(self.macro_list):
@@ -2303,6 +2380,78 @@ class QickProgramV2(AsmV2, AbsQickProgram):
         pulse.gen_chs = ch
         self._register_pulse(pulse, name)
 
+    def add_table_sweep(self, pulse, loop, **kwargs):
+        """Sweep pulse parameters through arbitrary lists of values, one value per iteration of a loop.
+        This is for sweeps that aren't evenly spaced (log-spaced frequencies, randomized orders, etc.).
+
+        The raw values are stored as tables in the tProc data memory, after any data from compile_datamem().
+        At the start of each iteration of the loop, the values for that iteration are copied into the pulse's waveforms.
+        After the loop finishes, the pulse keeps the values from the last iteration.
+
+        Only the freq, phase, and gain parameters can be swept this way, since changing a length would change the timeline.
+        The values you gave the parameter in add_pulse() are not used while the loop runs, but they must be scalars.
+
+        Parameters
+        ----------
+        pulse : str
+            Name of the pulse
+        loop : str
+            Name of the loop; the number of values must equal the number of iterations
+        kwargs : list or numpy.ndarray of float
+            Values for each swept parameter, in the same units as add_pulse()
+        """
+        for parname in kwargs:
+            if parname not in ['freq', 'phase', 'gain']:
+                raise RuntimeError("table sweeps are only supported for freq, phase, and gain, not %s"%(parname))
+        self.table_sweeps.append({'pulse': pulse, 'loop': loop, 'params': {k: np.asarray(v, dtype=float) for k,v in kwargs.items()}})
+
+    def _make_tables(self):
+        # convert the table sweeps to dmem tables and the list of table loads for each loop
+        if not self.table_sweeps:
+            return
+        d_mem = self._get_datamem()
+        addr = 0 if d_mem is None else len(d_mem)
+        start_addr = addr
+        data = []
+        swept = set()
+        for sweep in self.table_sweeps:
+            pulse = self.pulses[sweep['pulse']]
+            loop = sweep['loop']
+            if loop not in self.loop_dict:
+                raise RuntimeError("table sweep for pulse %s uses loop %s, which is not defined"%(sweep['pulse'], loop))
+            if pulse.ch_mgr is None or not pulse.params:
+                raise RuntimeError("table sweeps can only be used with pulses defined with add_pulse()")
+            for parname, vals in sweep['params'].items():
+                if len(vals) != self.loop_dict[loop]:
+                    raise RuntimeError("table sweep of %s for pulse %s has %d values, but loop %s has %d iterations"%(parname, sweep['pulse'], len(vals), loop, self.loop_dict[loop]))
+                if pulse.params[parname].is_sweep():
+                    raise RuntimeError("parameter %s of pulse %s is already swept, it can't also be table-swept"%(parname, sweep['pulse']))
+                if (sweep['pulse'], parname) in swept:
+                    raise RuntimeError("parameter %s of pulse %s has more than one table sweep"%(parname, sweep['pulse']))
+                swept.add((sweep['pulse'], parname))
+
+            # re-run the pulse definition for each set of values, and collect the raw waveform values
+            wavenames = pulse.get_wavenames()
+            tables = defaultdict(list)
+            for i in range(self.loop_dict[loop]):
+                params = {k: QickParam(start=v.start) if isinstance(v, QickParam) else v for k,v in pulse.params.items()}
+                for parname, vals in sweep['params'].items():
+                    params[parname] = QickParam(start=float(vals[i]))
+                newpulse = pulse.ch_mgr.make_pulse(params)
+                for wname, w in zip(wavenames, newpulse.waveforms):
+                    if not isinstance(w, Waveform): continue
+                    for parname in sweep['params']:
+                        tables[(wname, parname)].append(int(getattr(w, parname)))
+
+            loads = defaultdict(list)
+            for (wname, parname), vals in tables.items():
+                # dmem is 32-bit, wrap the values the same way the waveform memory would
+                data.extend(np.array(vals, dtype=np.int64).astype(np.int32).tolist())
+                loads[wname].append((parname, addr))
+                addr += len(vals)
+            self.table_loads.setdefault(loop, []).extend(loads.items())
+        self.dmem_tables = {'addr': start_addr, 'data': data}
+
     def add_readoutconfig(self, ch, name, **kwargs):
         """Add a readout config to the program's pulse library.
         The "mode" and "length" parameters have no useful effect and should probably never be used.
@@ -2636,10 +2785,12 @@ class AveragerProgramV2(AcquireProgramV2):
         Instructions to execute before the contents of the "reps" loop.
     after_reps : AsmV2
         Instructions to execute after the contents of the "reps" loop.
+    optimize : bool
+        Run the peephole optimizer on the generated ASM.
     """
 
     COUNTER_ADDR = 1
-    def __init__(self, soccfg, reps, final_delay, final_wait=0, initial_delay=1.0, reps_innermost=False, before_reps=None, after_reps=None, cfg=None):
+    def __init__(self, soccfg, reps, final_delay, final_wait=0, initial_delay=1.0, reps_innermost=False, before_reps=None, after_reps=None, cfg=None, optimize=False):
         self.cfg = {} if cfg is None else cfg.copy()
         self.reps = reps
         self.final_delay = final_delay
@@ -2648,7 +2799,7 @@ class AveragerProgramV2(AcquireProgramV2):
         self.reps_innermost = reps_innermost
         self.before_reps = before_reps
         self.after_reps = after_reps
-        super().__init__(soccfg)
+        super().__init__(soccfg, optimize=optimize)
 
         # fill the program
         self.compile()
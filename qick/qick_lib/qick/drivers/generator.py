@@ -3,7 +3,7 @@ Drivers for signal generators: FPGA blocks that send data to DACs.
 """
 from pynq.buffer import allocate
 import numpy as np
-from qick.ip import SocIP
+from qick.ip import SocIP, MemoryContents
 
 class AbsSignalGen(SocIP):
     """
@@ -111,6 +111,9 @@ class AbsArbSignalGen(AbsSignalGen):
         self.switch = None
         self.switch_ch = None
 
+        # envelopes that are already in the memory
+        self.env_contents = MemoryContents()
+
         super().__init__(description)
 
     def _init_config(self, description):
@@ -144,46 +147,79 @@ class AbsArbSignalGen(AbsSignalGen):
         :param addr: starting address
         :type addr: int
         """
-        length = xin.shape[0]
-        assert xin.dtype==np.int16
-
-        # Check for max length.
-        if length+addr > self['maxlen']:
-            raise RuntimeError("%s: buffer length must be %d samples or less." %
-                  (self.__class__.__name__, self['maxlen']))
-
-        # Check for even transfer size.
-        #if length % 2 != 0:
-        #    raise RuntimeError("Buffer transfer length must be even number.")
+        self.load_batch([(xin, addr)])
 
-        # Check Waveform is Real if Complex envelope is not supported
-        if not self['complex_env']:
-            if np.any(xin[:,1]):
-                raise NotImplementedError("This channel does not support complex envelopes.")
+    def load_batch(self, envs, force=False):
+        """
+        Load multiple waveforms into I,Q envelope memory.
+        Waveforms that sit next to each other in memory are packed into one image and loaded with a single DMA transfer.
+        Waveforms that are already in memory at the same address (from a previous load) are skipped.
+
+        :param envs: list of (data, addr) pairs, where data is an array of 16-bit (I, Q) values and addr is the starting address
+        :type envs: list
+        :param force: load all waveforms, even if they are already in memory
+        :type force: bool
+        """
+        if not force:
+            envs = [(xin, addr) for xin, addr in envs if not self.env_contents.is_loaded(xin, addr)]
+        if not envs: return
+        envs = sorted(envs, key=lambda x: x[1])
+        for xin, addr in envs:
+            assert xin.dtype==np.int16
+            # Check for max length.
+            if xin.shape[0]+addr > self['maxlen']:
+                raise RuntimeError("%s: buffer length must be %d samples or less." %
+                      (self.__class__.__name__, self['maxlen']))
+
+            # Check for even transfer size.
+            #if length % 2 != 0:
+            #    raise RuntimeError("Buffer transfer length must be even number.")
+
+            # Check Waveform is Real if Complex envelope is not supported
+            if not self['complex_env']:
+                if np.any(xin[:,1]):
+                    raise NotImplementedError("This channel does not support complex envelopes.")
 
         # Route switch to channel.
         if self.switch is not None:
             self.switch.sel(mst=self.switch_ch)
 
-        # Pack the data into a single array; columns will be concatenated
-        # -> lower 16 bits: I value.
-        # -> higher 16 bits: Q value.
-        # Format and copy data.
-        np.copyto(self.buff[:length],
-                np.frombuffer(xin, dtype=np.int32))
-
-        ################
-        ### Load I/Q ###
-        ################
-        # Enable writes.
-        self._wr_enable(addr)
-
-        # DMA data.
-        self.dma.sendchannel.transfer(self.buff, nbytes=int(length*4))
-        self.dma.sendchannel.wait()
-
-        # Disable writes.
-        self._wr_disable()
+        # Group the waveforms into contiguous runs, each run is one transfer.
+        runs = []
+        for xin, addr in envs:
+            if runs and runs[-1][1] == addr:
+                runs[-1][1] += xin.shape[0]
+                runs[-1][2].append(xin)
+            else:
+                runs.append([addr, addr + xin.shape[0], [xin]])
+
+        for start, end, xins in runs:
+            # Pack the data into a single array; columns will be concatenated
+            # -> lower 16 bits: I value.
+            # -> higher 16 bits: Q value.
+            # Format and copy data.
+            offset = 0
+            for xin in xins:
+                length = xin.shape[0]
+                np.copyto(self.buff[offset:offset+length],
+                        np.frombuffer(np.ascontiguousarray(xin), dtype=np.int32))
+                offset += length
+
+            ################
+            ### Load I/Q ###
+            ################
+            # Enable writes.
+            self._wr_enable(start)
+
+            # DMA data.
+            self.dma.sendchannel.transfer(self.buff, nbytes=int((end-start)*4))
+            self.dma.sendchannel.wait()
+
+            # Disable writes.
+            self._wr_disable()
+
+        for xin, addr in envs:
+            self.env_contents.update(xin, addr)
 
     def _wr_enable(self, addr=0):
         """
@@ -3,6 +3,8 @@ Drivers for qick_processor Peripherals.
 2024-5-22
 """
 from pynq.buffer import allocate
+from threading import Thread, Event, Lock
+import time
 import numpy as np
 from qick import SocIP
 import re
@@ -29,6 +31,9 @@ class QICK_Time_Tagger(SocIP):
         # DMA buffer
         self.buff_rd = None
 
+        # serializes DMA reads, so a TagStreamer can run alongside read_mem() calls
+        self.dma_lock = Lock()
+
     def _init_config(self, description):
         self.REGISTERS = {
             'qtt_ctrl'     :0 ,
@@ -128,19 +133,20 @@ class QICK_Time_Tagger(SocIP):
         # Configure FIFO Read.
         if length is None:
             length = min(getattr(self, mem_counter), len(self.buff_rd))
-        self.dma_cfg = mem_id + 16*length
        
         if length==0:
             print('No Data to read in ', mem_sel)
             return np.array([])
         else:
-            #Start DMA Transfer
-            self.qtt_ctrl     = 32
-            # DMA data.
-            self.dma.recvchannel.transfer(self.buff_rd, nbytes=int(length*4))
-            self.dma.recvchannel.wait()
-            # truncate, copy, convert PynqBuffer to ndarray
-            return np.array(self.buff_rd[:length], copy=True)
+            with self.dma_lock:
+                self.dma_cfg = mem_id + 16*length
+                #Start DMA Transfer
+                self.qtt_ctrl     = 32
+                # DMA data.
+                self.dma.recvchannel.transfer(self.buff_rd, nbytes=int(length*4))
+                self.dma.recvchannel.wait()
+                # truncate, copy, convert PynqBuffer to ndarray
+                return np.array(self.buff_rd[:length], copy=True)
     
     def flush_mems(self, verbose=False):
         """Flush the time-tagger memories by reading them.
@@ -153,6 +159,19 @@ class QICK_Time_Tagger(SocIP):
                 if to_read == 0: break
                 self.read_mem(memname)
 
+    def stream(self, mems=None, histograms=None, period=0.01, ring_len=2**16):
+        """Start a TagStreamer, which reads the memories in the background until you stop it.
+        See TagStreamer for the parameters.
+
+        Returns
+        -------
+        TagStreamer
+            The running streamer
+        """
+        streamer = TagStreamer(self, mems=mems, histograms=histograms, period=period, ring_len=ring_len)
+        streamer.start()
+        return streamer
+
     def set_config(self, filt, slope, interp, wr_smp, invert):
         """
         QICK_Time_Tagger Configuration
@@ -276,6 +295,355 @@ class QICK_Time_Tagger(SocIP):
         print( ' CMD_CNT    : ' + str(cmd_cnt) )
 
 
+def _pair_diffs(a, b, lo, hi):
+    """All differences b[j]-a[i] that fall in [lo, hi).
+    Both arrays must be sorted.
+    """
+    start = np.searchsorted(b, a + lo, side='left')
+    n = np.searchsorted(b, a + hi, side='left') - start
+    total = n.sum()
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    # for each pair, the index into a and the index into b
+    i_a = np.repeat(np.arange(len(a)), n)
+    i_b = np.arange(total) - np.repeat(np.cumsum(n) - n, n) + np.repeat(start, n)
+    return b[i_b] - a[i_a]
+
+# time-tagger memories that hold timestamps; the SMP memory holds ADC samples
+TIMESTAMP_MEMS = ['TAG0', 'TAG1', 'TAG2', 'TAG3', 'ARM']
+
+def _unwrap(raw, ref):
+    """Convert raw 32-bit timestamps, in time order, to unwrapped 64-bit timestamps.
+    The epoch is chosen to put the first timestamp within half a wrap period of the reference.
+
+    Parameters
+    ----------
+    raw : numpy.ndarray
+        Raw timestamps
+    ref : int
+        Unwrapped timestamp to measure against; if None, the first timestamp is taken to be in epoch 0
+
+    Returns
+    -------
+    numpy.ndarray
+        int64 array of unwrapped timestamps
+    """
+    raw = raw.astype(np.int64)
+    steps = np.diff(raw, prepend=raw[0])
+    # a step backwards by more than half the range is a wraparound
+    wraps = np.cumsum(steps < -2**31) - np.cumsum(steps > 2**31)
+    vals = raw + wraps*2**32
+    if ref is not None:
+        vals += ((ref - vals[0] + 2**31) // 2**32) * 2**32
+    return vals
+
+class TagRing:
+    """Ring buffer holding the most recent timestamps from one time-tagger memory.
+    The timestamps are unwrapped to 64 bits before they are added (see TagStreamer), so the ring is always sorted.
+    The SMP memory holds ADC samples, not timestamps: its ring holds the raw values, in the order they were read.
+
+    Parameters
+    ----------
+    size : int
+        Number of timestamps to keep
+    """
+    def __init__(self, size):
+        self.buf = np.zeros(size, dtype=np.int64)
+        self.size = size
+        # total number of timestamps ever added
+        self.count = 0
+
+    def append(self, vals):
+        n = len(vals)
+        vals = vals[-self.size:]
+        first = self.count + n - len(vals)
+        self.buf[(first + np.arange(len(vals))) % self.size] = vals
+        self.count += n
+
+    def latest(self, n=None):
+        """Get the most recent timestamps, oldest first.
+
+        Parameters
+        ----------
+        n : int
+            Number of timestamps to get; if None, everything in the ring.
+
+        Returns
+        -------
+        numpy.ndarray
+            int64 array of timestamps
+        """
+        avail = min(self.count, self.size)
+        if n is None or n > avail: n = avail
+        return self.buf[(self.count - n + np.arange(n)) % self.size]
+
+class TagHistogram:
+    """Histogram of time differences between two time-tagger memories, updated as tags arrive.
+
+    Parameters
+    ----------
+    src : str
+        Memory holding the reference timestamps (TAG0, TAG1, TAG2, TAG3, ARM)
+    dst : str
+        Memory holding the timestamps measured relative to the reference
+    bin_width : int
+        Width of each bin, in timestamp units
+    nbins : int
+        Number of bins
+    offset : int
+        Time difference at the low edge of the first bin
+    mode : str
+        'startstop': each dst tag is measured against the latest src tag at or before it.
+        'correlation': every (src, dst) pair in the histogram range is counted, as for g2 measurements.
+    """
+    MODES = ['startstop', 'correlation']
+
+    def __init__(self, src, dst, bin_width, nbins, offset=0, mode='startstop'):
+        if mode not in self.MODES:
+            raise RuntimeError("invalid histogram mode %s, options are %s" % (mode, self.MODES))
+        for mem in [src, dst]:
+            if mem not in TIMESTAMP_MEMS:
+                raise RuntimeError("Histogram memory error. Options are %s current Value : %s" % (TIMESTAMP_MEMS, mem))
+        self.src = src
+        self.dst = dst
+        self.bin_width = bin_width
+        self.nbins = nbins
+        self.offset = offset
+        self.mode = mode
+        self.counts = np.zeros(nbins, dtype=np.int64)
+
+    def edges(self):
+        """Bin edges, in timestamp units.
+        """
+        return self.offset + self.bin_width*np.arange(self.nbins+1)
+
+    def _add(self, dt):
+        idx = (dt - self.offset)//self.bin_width
+        idx = idx[(idx >= 0) & (idx < self.nbins)]
+        self.counts += np.bincount(idx, minlength=self.nbins)
+
+    def update(self, old, new):
+        """Add the pairs formed by newly read tags.
+
+        Parameters
+        ----------
+        old : dict
+            Previously read timestamps (TagRing.latest()) for each memory
+        new : dict
+            Newly read timestamps for each memory
+        """
+        src_old, src_new = old[self.src], new[self.src]
+        dst_old, dst_new = old[self.dst], new[self.dst]
+        if self.mode == 'startstop':
+            # stops are read before starts, so the starts preceding the new stops have all arrived
+            # but an old start may still be the latest one before a new stop
+            if len(dst_new) == 0: return
+            first = max(0, np.searchsorted(src_old, dst_new[0], side='right') - 1)
+            starts = np.concatenate([src_old[first:], src_new])
+            i = np.searchsorted(starts, dst_new, side='right') - 1
+            valid = i >= 0
+            self._add(dst_new[valid] - starts[i[valid]])
+        else:
+            lo, hi = self.offset, self.offset + self.nbins*self.bin_width
+            # new src against all dst, plus old src against new dst: each pair is counted once
+            dst_all = np.concatenate([dst_old, dst_new])
+            self._add(_pair_diffs(src_new, dst_all, lo, hi))
+            if len(dst_new) > 0:
+                # only the old src tags in range of the new dst tags matter
+                src_old = src_old[np.searchsorted(src_old, dst_new[0] - hi, side='right'):]
+                self._add(_pair_diffs(src_old, dst_new, lo, hi))
+
+class TagStreamer:
+    """Continuously drains the time-tagger memories in a background thread.
+    The timestamps are kept in ring buffers, and time-difference histograms are built as the tags arrive,
+    so experiments can run for as long as you like without losing tags or storing every timestamp.
+
+    While the streamer runs, it owns the tagger memories: calls to read_mem() or flush_mems() will steal tags from it.
+
+    Parameters
+    ----------
+    tagger : QICK_Time_Tagger
+        The time tagger to read
+    mems : list of str
+        Memories to read (TAG0, TAG1, TAG2, TAG3, ARM, SMP); memories used by the histograms are added automatically.
+        The SMP memory holds ADC samples, which are stored as read; the other memories hold timestamps, which are unwrapped.
+        If None, TAG0-TAG3 and ARM.
+    histograms : list of TagHistogram
+        Histograms to update; if None, no histograms
+    period : float
+        Time (in seconds) to sleep between polls when the memories are empty
+    ring_len : int
+        Number of timestamps to keep for each memory
+    """
+    def __init__(self, tagger, mems=None, histograms=None, period=0.01, ring_len=2**16):
+        self.tagger = tagger
+        if mems is None:
+            mems = ['TAG0', 'TAG1', 'TAG2', 'TAG3', 'ARM']
+        self.histograms = [] if histograms is None else list(histograms)
+        mems = list(mems)
+        for h in self.histograms:
+            for mem in [h.src, h.dst]:
+                if mem not in mems: mems.append(mem)
+        for mem in mems:
+            if mem not in tagger.MEMS:
+                raise RuntimeError('Source Memory error. Options are TAG0, TAG1, TAG2, TAG3, ARM, SMP current Value : %s' % (mem))
+        # stop memories are read before start memories (see TagHistogram.update)
+        starts = set(h.src for h in self.histograms if h.mode == 'startstop')
+        self.mems = [m for m in mems if m not in starts] + [m for m in mems if m in starts]
+        self.period = period
+        self.rings = {mem: TagRing(ring_len) for mem in self.mems}
+        # latest unwrapped timestamp seen in any memory, which sets the epoch for unwrapping new tags
+        # this assumes the memories are polled at least once every half wrap period (2**31 timestamp units)
+        self.t_ref = None
+        # number of polls where a memory was found full, meaning tags may have been dropped
+        self.overflows = {mem: 0 for mem in self.mems}
+        self.lock = Lock()
+        self.stop_flag = Event()
+        self.thread = None
+        self.error = None
+        self.t_start = None
+        # (time, counts) at the last refresh of the recent rates
+        self.rate_ref = None
+        self.recent_rates = {mem: 0.0 for mem in self.mems}
+
+    def start(self):
+        """Start the background thread.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            raise RuntimeError("streamer is already running")
+        self.stop_flag.clear()
+        self.error = None
+        self.t_start = time.time()
+        self.rate_ref = (self.t_start, self.get_counts())
+        self.thread = Thread(target=self._run_stream, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background thread, after it drains the memories once more.
+        Any exception raised by the thread is re-raised here.
+        """
+        self.stop_flag.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.error is not None:
+            raise RuntimeError("exception in time-tagger streamer") from self.error
+
+    def _mem_size(self, mem):
+        if mem.startswith('TAG'): return self.tagger['tag_mem_size']
+        return self.tagger['%s_mem_size' % (mem.lower())]
+
+    def _poll(self):
+        """Drain every memory once and update the histograms.
+
+        Returns
+        -------
+        int
+            Number of tags read
+        """
+        old = {}
+        new = {}
+        for mem in self.mems:
+            _, countname = self.tagger.MEMS[mem]
+            avail = getattr(self.tagger, countname)
+            if avail >= self._mem_size(mem):
+                self.overflows[mem] += 1
+            chunks = []
+            while avail > 0:
+                chunks.append(self.tagger.read_mem(mem, length=min(avail, len(self.tagger.buff_rd))))
+                avail -= len(chunks[-1])
+            ring = self.rings[mem]
+            old[mem] = ring.latest()
+            if chunks and mem not in TIMESTAMP_MEMS:
+                # ADC samples: nothing to unwrap, and they must not move the time reference
+                new[mem] = np.concatenate(chunks).astype(np.int64)
+            elif chunks:
+                # all memories are unwrapped against the same reference, so a memory that was idle across a wrap still lands in the right epoch
+                new[mem] = _unwrap(np.concatenate(chunks), self.t_ref)
+                last = int(new[mem][-1])
+                self.t_ref = last if self.t_ref is None else max(self.t_ref, last)
+            else:
+                new[mem] = np.zeros(0, dtype=np.int64)
+        with self.lock:
+            for mem in self.mems:
+                self.rings[mem].append(new[mem])
+            for h in self.histograms:
+                h.update(old, new)
+            t = time.time()
+            counts = {mem: ring.count for mem, ring in self.rings.items()}
+            t_ref, counts_ref = self.rate_ref
+            # refresh the recent rates about once a second, so they aren't dominated by polling noise
+            if t - t_ref >= 1.0:
+                self.recent_rates = {mem: (counts[mem]-counts_ref[mem])/(t-t_ref) for mem in self.mems}
+                self.rate_ref = (t, counts)
+        return sum(len(v) for v in new.values())
+
+    def _run_stream(self):
+        try:
+            while not self.stop_flag.is_set():
+                if self._poll() == 0:
+                    self.stop_flag.wait(self.period)
+            self._poll()
+        except Exception as e:
+            self.error = e
+
+    def get_counts(self):
+        """Total number of tags read from each memory.
+
+        Returns
+        -------
+        dict
+            count for each memory
+        """
+        return {mem: ring.count for mem, ring in self.rings.items()}
+
+    def get_rates(self, recent=False):
+        """Tag rates for each memory.
+
+        Parameters
+        ----------
+        recent : bool
+            If True, the rate over the most recent second or so; if False, the average since the streamer started.
+
+        Returns
+        -------
+        dict
+            rate (in tags/second) for each memory
+        """
+        with self.lock:
+            if recent:
+                return dict(self.recent_rates)
+            elapsed = time.time() - self.t_start
+            return {mem: ring.count/elapsed for mem, ring in self.rings.items()}
+
+    def get_tags(self, mem, n=None):
+        """Most recent timestamps from a memory.
+
+        Parameters
+        ----------
+        mem : str
+            Memory name
+        n : int
+            Number of timestamps; if None, everything in the ring buffer
+
+        Returns
+        -------
+        numpy.ndarray
+            int64 array of unwrapped timestamps, oldest first
+        """
+        with self.lock:
+            return self.rings[mem].latest(n)
+
+    def get_histograms(self):
+        """Current contents of the histograms.
+
+        Returns
+        -------
+        list of (numpy.ndarray, numpy.ndarray)
+            (bin edges, counts) for each histogram
+        """
+        with self.lock:
+            return [(h.edges(), h.counts.copy()) for h in self.histograms]
+
 
 class QICK_Com(SocIP):
     """
@@ -3,7 +3,8 @@ Drivers for readouts (FPGA blocks that receive data from ADCs) and buffers (bloc
 """
 from pynq.buffer import allocate
 import numpy as np
-from qick.ip import SocIP, QickIP, DummyIP
+import time
+from qick.ip import SocIP, QickIP, DummyIP, MemoryContents
 
 def _trace_trigger(soc, start_block):
     """Helper function for finding the tProc port that triggers a buffer.
@@ -30,6 +31,18 @@ def _trace_trigger(soc, start_block):
         trigger_port, trigger_type = soc._get_block(block).port2ch(port)
     return trigger_type, trigger_port, trigger_bit
 
+def _copy_out(data, out=None, dtype=None):
+    """Helper function for returning data from a DMA buffer.
+    The data is copied out of the buffer (since the buffer will be reused) into the supplied array, or a new array with the requested dtype.
+    Any dtype conversion happens in the same pass as the copy.
+    """
+    if out is not None:
+        out[...] = data
+        return out
+    if dtype is not None:
+        return data.astype(dtype)
+    return data.copy()
+
 RO_TYPES = ["axis_readout_v2", "axis_readout_v3", "axis_pfb_readout_v2", "axis_pfb_readout_v3", "axis_pfb_readout_v4", "axis_dyn_readout_v1"]
 BUF_TYPES = ['axis_avg_buffer', 'axis_weighted_buffer']
 
@@ -616,6 +629,8 @@ class AxisAvgBuffer(SocIP):
         # which switch_avg port does this buffer drive?
         dma_path, switch_path, switch_avg_ch = soc.metadata.trace_dma('forward', self['fullpath'], 'm0_axis')
         self.dma_avg = soc._get_block(dma_path)
+        # buffers behind different DMAs can be read out in parallel
+        self.cfg['avg_dma'] = dma_path
         if switch_path is not None:
             self.switch_avg = soc._get_block(switch_path)
 
@@ -757,7 +772,7 @@ class AxisAvgBuffer(SocIP):
         self.avg_len_reg = length
         self.cfg["number_of_trace_average"] = number_of_trace_average
 
-    def transfer_avg(self, address=0, length=100):
+    def transfer_avg(self, address=0, length=100, out=None, dtype=None, route=True):
         """
         Transfer data from accumulated buffer
 
@@ -765,6 +780,12 @@ class AxisAvgBuffer(SocIP):
         :type addr: int
         :param length: number of samples
         :type length: int
+        :param out: array of shape (length, 2) to write the data into, instead of allocating a new array
+        :type out: numpy.ndarray
+        :param dtype: dtype for the returned array, if out is None (default int32)
+        :type dtype: numpy.dtype
+        :param route: set the DMA switch to this buffer; only skip this if the previous transfer on this DMA was from this buffer
+        :type route: bool
         :return: I,Q pairs
         :rtype: list
         """
@@ -777,7 +798,7 @@ class AxisAvgBuffer(SocIP):
         transferlen = length + (length % 2)
 
         # Route switch to channel.
-        if self.switch_avg is not None:
+        if route and self.switch_avg is not None:
             self.switch_avg.sel(slv=self.switch_ch)
 
         if (not self.FIRST_OUT_SAMPLE_BUG_FIX):
@@ -818,12 +839,14 @@ class AxisAvgBuffer(SocIP):
             data = data[:length]
 
         # data is a view into the data buffer, so copy it before returning
-        return data.copy()
+        return _copy_out(data, out, dtype)
 
     def transfer_trace_avg(
         self,
         address:int = 0,
-        length:int = 100
+        length:int = 100,
+        out:np.ndarray = None,
+        dtype = None
     ) -> list:
         """
         Transfer data from accumulated buffer (averaged trace)
@@ -834,6 +857,10 @@ class AxisAvgBuffer(SocIP):
             starting reading address
         length : int
             number of samples
+        out : numpy.ndarray
+            array of shape (length, 2) to write the data into, instead of allocating a new array
+        dtype : numpy.dtype
+            dtype for the returned array, if out is None (default int32)
 
         Returns
         -------
@@ -893,7 +920,7 @@ class AxisAvgBuffer(SocIP):
             data = data[:length]
 
         # data is a view into the data buffer, so copy it before returning
-        return data.copy()
+        return _copy_out(data, out, dtype)
 
     def config_buf(self, address=0, length=100):
         """
@@ -915,7 +942,7 @@ class AxisAvgBuffer(SocIP):
         self.buf_addr_reg = address
         self.buf_len_reg = length
 
-    def transfer_buf(self, address=0, length=100):
+    def transfer_buf(self, address=0, length=100, out=None, dtype=None):
         """
         Transfer data from decimated buffer
 
@@ -923,6 +950,10 @@ class AxisAvgBuffer(SocIP):
         :type addr: int
         :param length: number of samples
         :type length: int
+        :param out: array of shape (length, 2) to write the data into, instead of allocating a new array
+        :type out: numpy.ndarray
+        :param dtype: dtype for the returned array, if out is None (default int16)
+        :type dtype: numpy.dtype
         :return: I,Q pairs
         :rtype: list
         """
@@ -976,7 +1007,7 @@ class AxisAvgBuffer(SocIP):
             data = data[:length]
 
         # data is a view into the data buffer, so copy it before returning
-        return data.copy()
+        return _copy_out(data, out, dtype)
 
 class AxisAvgBufferV1pt1(AxisAvgBuffer):
 
@@ -1050,6 +1081,9 @@ class AxisWeightedBuffer(AxisAvgBufferV1pt1):
         self.switch_wgt = None
         self.switch_wgt_ch = None
 
+        # weights that are already in the memory
+        self.wgt_contents = MemoryContents()
+
         super().__init__(description)
 
     def _init_config(self, description):
@@ -1119,9 +1153,10 @@ class AxisWeightedBuffer(AxisAvgBufferV1pt1):
     def _stop_transfer(self):
         self.dr_start_reg = 0
 
-    def load_weights(self, data, addr=0):
+    def load_weights(self, data, addr=0, force=False):
         """
-        Load weights array
+        Load weights array.
+        If the same weights are already in memory at the same address (from a previous load), the load is skipped.
 
         Parameters
         ----------
@@ -1129,9 +1164,12 @@ class AxisWeightedBuffer(AxisAvgBufferV1pt1):
             array of 16-bit (I, Q) values for weights
         addr : int
             starting address
+        force : bool
+            load the weights even if they are already in memory
         """
         length = data.shape[0]
         assert data.dtype==np.int16
+        if not force and self.wgt_contents.is_loaded(data, addr): return
 
         # Check for max length.
         if length > self['wgt_maxlen']:
@@ -1169,6 +1207,8 @@ class AxisWeightedBuffer(AxisAvgBufferV1pt1):
         # Disable writes.
         self._stop_transfer()
 
+        self.wgt_contents.update(data, addr)
+
 class MrBufferEt(SocIP):
     # Registers.
     # DW_CAPTURE_REG
@@ -1361,6 +1401,8 @@ class AxisBufferDdrV1(SocIP):
         super().configure_connections(soc)
 
         self.soc = soc
+        # the avg_buf whose readout is routed to this buffer (set by set_switch)
+        self.bufname = None
 
         # follow the output to find the DDR4 controller
         ((block,port),) = soc.metadata.trace_bus(self['fullpath'], 'm_axi')
@@ -1369,6 +1411,10 @@ class AxisBufferDdrV1(SocIP):
         self.ddr4_mem = soc._get_block(block)
         self.ddr4_array = self.ddr4_mem.mmio.array.view('uint32')
         self.cfg['maxlen'] = self.ddr4_array.shape[0]
+        # high-water mark of the region that may hold data: we don't know what's in the memory at startup
+        self.dirty_len = self['maxlen']
+        # span that the last armed capture will write; the buffer has no "done" status, so we assume the capture may still be running
+        self.armed_len = 0
 
         # Typical: buffer_ddr -> clock_converter -> dwidth_converter -> switch (optional) -> broadcaster
         # the broadcaster will feed this block and a regular avg_buf
@@ -1432,33 +1478,158 @@ class AxisBufferDdrV1(SocIP):
             assert self.buf2switch[bufname]==0
         else:
             self.switch.sel(slv=self.buf2switch[bufname])
+        # remember which buffer we're recording, so we know the sample rate
+        self.bufname = bufname
 
     def clear_mem(self, length=None):
-        if length is None:
-            np.copyto(self.ddr4_array, 0)
-        else:
-            np.copyto(self.ddr4_array[:length], 0)
+        """Fill the memory with 0's.
+        Only the part of the memory that may have been written since the last clear is actually touched.
 
-    def get_mem(self, nt, start=None):
+        Parameters
+        ----------
+        length : int
+            Number of words to clear (starting at the beginning of the memory). If None, clear the entire memory.
+        """
+        if length is None:
+            length = self['maxlen']
+        # everything past the high-water mark is already 0
+        np.copyto(self.ddr4_array[:min(length, self.dirty_len)], 0)
+        if length >= self.dirty_len:
+            # an armed capture can write into the memory again after the clear
+            self.dirty_len = self.armed_len
+
+    def _mem_span(self, nt, start=None):
+        """Convert the get_mem() arguments to a range of memory words.
+        """
         if start is None:
             start = self['junk_len']
             end = nt*self['burst_len']
         else:
             end = start + nt*self['burst_len']
-        length = end-start
+        return start, end
 
+    def _copy_mem(self, start, end, out=None):
+        """Copy a range of memory words, as (I, Q) pairs.
+        """
+        length = end-start
+        if out is None:
+            out = np.empty((length, 2), dtype=np.int16)
         # when we access memory-mapped data, the start and end need to be aligned to multiples of 64 bits.
         # violations result in the Python interpreter crashing on SIGBUS/BUS_ADRALN
         # this doesn't matter for all operations, but np.copy() definitely seems to care
         # it seems that even if you slice out an address-aligned chunk of data and just print it, sometimes that will access it in an illegal way
-        # therefore we pad out the requested address block, copy the data, and trim
-        # this way, no special care needs to be taken with the returned array
-        buf_copy = self.ddr4_array[start - (start%2):end + (end%2)].copy()
-        return buf_copy[start%2:length + start%2].view(dtype=np.int16).reshape((-1,2))
+        if start%2 == 0 and end%2 == 0:
+            # aligned: copy straight into the output
+            np.copyto(out.view(np.uint32).reshape(-1), self.ddr4_array[start:end])
+        else:
+            # unaligned: pad out the requested address block, copy the data, and trim
+            buf_copy = self.ddr4_array[start - (start%2):end + (end%2)].copy()
+            out[...] = buf_copy[start%2:length + start%2].view(dtype=np.int16).reshape((-1,2))
+        return out
+
+    def get_mem(self, nt, start=None, out=None):
+        """Copy data from the DDR4 memory.
+
+        Parameters
+        ----------
+        nt : int
+            Number of data transfers; see QickSoc.get_ddr4()
+        start : int
+            Number of samples to skip; see QickSoc.get_ddr4()
+        out : numpy.ndarray
+            int16 array of shape (length, 2) to write into (e.g. a numpy.memmap); if None, a new array is allocated
+
+        Returns
+        -------
+        numpy.ndarray
+            int16 array of shape (length, 2)
+        """
+        start, end = self._mem_span(nt, start)
+        return self._copy_mem(start, end, out)
+
+    def iter_mem(self, nt, start=None, chunk_len=2**22, follow=False, t_trigger=None, margin=0.01):
+        """Read data from the DDR4 memory in chunks.
+        Chunk boundaries are kept on 64-bit boundaries, so only the first and last chunks may need padding.
+
+        Parameters
+        ----------
+        nt : int
+            Number of data transfers; see QickSoc.get_ddr4()
+        start : int
+            Number of samples to skip; see QickSoc.get_ddr4()
+        chunk_len : int
+            Maximum number of samples per chunk (4 bytes per sample)
+        follow : bool
+            Read while the buffer is filling: wait until the write pointer has passed the end of each chunk before reading it.
+            The firmware doesn't report its write pointer, so it is estimated from the sample rate of the readout being recorded and the trigger time.
+        t_trigger : float
+            Time (from time.time()) when the buffer was triggered, for follow mode; if None, the time of the first call to the iterator is used.
+            An estimate that is too early makes the reader overtake the writer, so err on the late side.
+        margin : float
+            Extra time (in seconds) to wait after the estimated write pointer passes the end of a chunk, for follow mode.
+
+        Yields
+        ------
+        int
+            index of the first sample of the chunk, relative to the start of the requested data
+        numpy.ndarray
+            int16 array of shape (n, 2)
+        """
+        start, end = self._mem_span(nt, start)
+        if follow:
+            if self.bufname is None:
+                raise RuntimeError("follow mode needs the buffer to be armed first, so the sample rate is known")
+            if t_trigger is None: t_trigger = time.time()
+            rocfg = self.soc['readouts'][[ro['avgbuf_fullpath'] for ro in self.soc['readouts']].index(self.bufname)]
+            # samples per second
+            rate = rocfg['f_fabric']*1e6
+        chunk_len -= chunk_len%2
+        pos = start
+        while pos < end:
+            # the first chunk ends on an even address
+            chunk_end = min(end, pos - (pos%2) + chunk_len)
+            if follow:
+                t_ready = t_trigger + chunk_end/rate + margin
+                while time.time() < t_ready:
+                    time.sleep(min(0.01, t_ready - time.time()))
+            yield pos-start, self._copy_mem(pos, chunk_end)
+            pos = chunk_end
+
+    def get_mem_to_file(self, filename, nt, start=None, chunk_len=2**22, **kwargs):
+        """Copy data from the DDR4 memory into a memory-mapped file, one chunk at a time.
+        This way, captures bigger than the board's RAM can be saved.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the file to write; it will be a raw int16 (I, Q) file, readable with numpy.memmap
+        nt : int
+            Number of data transfers; see QickSoc.get_ddr4()
+        start : int
+            Number of samples to skip; see QickSoc.get_ddr4()
+        chunk_len : int
+            Maximum number of samples per chunk
+        kwargs : optional named arguments
+            Follow-mode arguments for iter_mem()
+
+        Returns
+        -------
+        numpy.memmap
+            int16 array of shape (length, 2)
+        """
+        span_start, span_end = self._mem_span(nt, start)
+        mm = np.memmap(filename, dtype=np.int16, mode='w+', shape=(span_end-span_start, 2))
+        for pos, chunk in self.iter_mem(nt, start, chunk_len=chunk_len, **kwargs):
+            mm[pos:pos+chunk.shape[0]] = chunk
+        mm.flush()
+        return mm
 
     def arm(self, nt, force_overwrite=False):
         if nt > self['maxlen']//self['burst_len'] and not force_overwrite:
             raise RuntimeError("the requested number of DDR4 transfers (nt) exceeds the memory size; the buffer will overwrite itself. You can disable this error message with force_overwrite=True.")
+        # the buffer will write up to this point (or all of it, if it wraps around)
+        self.armed_len = min(nt*self['burst_len'], self['maxlen'])
+        self.dirty_len = max(self.dirty_len, self.armed_len)
         self.wlen(nt)
         self.wstop()
         self.wstart()
@@ -6,6 +6,19 @@ from pynq.buffer import allocate
 import numpy as np
 from qick.ip import SocIP
 
+def _changed_ranges(changed, gap):
+    """Convert a boolean array of changed words into a list of (start, end) ranges to write.
+    Ranges separated by fewer than gap unchanged words are merged, since each transfer has overhead.
+    """
+    idx = np.flatnonzero(changed)
+    if len(idx) == 0:
+        return []
+    # split where the distance between changed words is too large
+    splits = np.flatnonzero(np.diff(idx) > gap)
+    starts = np.concatenate([idx[:1], idx[splits+1]])
+    ends = np.concatenate([idx[splits], idx[-1:]]) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
 class AxisTProc64x32_x8(SocIP):
     """
     AxisTProc64x32_x8 class
@@ -180,7 +193,7 @@ class AxisTProc64x32_x8(SocIP):
         Write the program to the tProc program memory.
         """
         # cast the program words to 64-bit uints
-        self.binprog = np.array(binprog, dtype=np.uint64)
+        self.binprog = np.asarray(binprog, dtype=np.uint64)
         # reshape to 32 bits to match the program memory
         self.binprog = np.frombuffer(self.binprog, np.uint32)
 
@@ -364,6 +377,13 @@ class Axis_QICK_Proc(SocIP):
         # the currently loaded program - cached here to make it easy to reload the memories
         self.binprog = None
 
+        # copy of what we last wrote to the program memory, so we only need to write the changes
+        # the program can't write pmem, so this stays valid until something else writes pmem
+        # (dmem and wmem get written by the program, so we don't track them)
+        self.pmem_shadow = None
+        # which words of the shadow are valid
+        self.pmem_known = None
+
     def _init_config(self, description):
         self.REGISTERS = {
             'tproc_ctrl'    :0 ,
@@ -658,6 +678,10 @@ class Axis_QICK_Proc(SocIP):
         self.mem_addr        = addr
         self.mem_len         = length
 
+        if mem_sel=='pmem' and self.pmem_shadow is not None:
+            # until the write has been confirmed, we don't know what this range holds
+            self.pmem_known[addr:addr+length] = False
+
         # Copy buffer.
         if mem_sel=='dmem':
             np.copyto(self.buff_wr[:length, 0], buff_in)
@@ -676,7 +700,7 @@ class Axis_QICK_Proc(SocIP):
         self.tproc_cfg       &= ~63
 
         if check:
-            readback = self.read_mem(mem_sel, length=length, truncate=False)
+            readback = self.read_mem(mem_sel, length=length, addr=addr, truncate=False)
             if mem_sel=='dmem':
                 to_compare = buff_in.reshape((-1,1))
             else:
@@ -687,6 +711,9 @@ class Axis_QICK_Proc(SocIP):
             else:
                 raise RuntimeError("tProc %s: readback does not match what was just loaded"%(mem_sel))
 
+        if mem_sel=='pmem':
+            self._update_pmem_shadow(buff_in, addr)
+
     def read_mem(self, mem_sel, length, addr=0, truncate=True):
         """
         Read selected tProc memory using DMA.
@@ -744,12 +771,61 @@ class Axis_QICK_Proc(SocIP):
         if self.binprog['dmem'] is not None:
             self.load_mem('dmem', self.binprog['dmem'])
 
+    def _update_pmem_shadow(self, buff_in, addr):
+        length = len(buff_in)
+        if self.pmem_shadow is None:
+            self.pmem_shadow = np.zeros((self['pmem_size'], 8), dtype=np.int32)
+            self.pmem_known = np.zeros(self['pmem_size'], dtype=bool)
+        self.pmem_shadow[addr:addr+length] = buff_in
+        self.pmem_known[addr:addr+length] = True
+
+    def clear_pmem_shadow(self):
+        """Forget the contents of the program memory, so the next program load writes the whole program.
+        Use this if the program memory may have been written by something other than this driver.
+        """
+        self.pmem_shadow = None
+
+    def load_pmem_diff(self, buff_in, check=True, gap=16):
+        """
+        Write the program memory, only transferring the words that differ from what was last written.
+        If the check is enabled, only the written words are read back.
+
+        Parameters
+        ----------
+        buff_in : numpy.ndarray
+            32-bit array of shape (n, 8), written starting at address 0
+        check : bool
+            do a readback to check that the data was written correctly
+        gap : int
+            changed blocks separated by fewer than this many unchanged words are merged into one transfer
+
+        Returns
+        -------
+        int
+            Number of words written
+        """
+        length = len(buff_in)
+        if self.pmem_shadow is None:
+            changed = np.ones(length, dtype=bool)
+        else:
+            # only the columns that hold data matter
+            changed = np.any(self.pmem_shadow[:length, :3] != buff_in[:, :3], axis=1)
+            changed |= ~self.pmem_known[:length]
+        written = 0
+        for start, end in _changed_ranges(changed, gap):
+            self.load_mem('pmem', buff_in[start:end], addr=start, check=check)
+            written += end-start
+        if written == 0:
+            self.logger.info('tProc pmem: unchanged, skipping load')
+        return written
+
     def load_bin_program(self, binprog, load_mem):
         """
         Write the program to the tProc program memory.
+        Only the program words that changed since the last load are written.
         """
         self.binprog = binprog
-        self.load_mem('pmem', self.binprog['pmem'])
+        self.load_pmem_diff(self.binprog['pmem'])
         if load_mem: self.reload_mem()
 
     def print_axi_regs(self):
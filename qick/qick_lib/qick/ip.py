@@ -4,6 +4,7 @@ Support classes for dealing with FPGA IP blocks.
 from pynq.overlay import DefaultIP
 import numpy as np
 import logging
+import hashlib
 from qick import obtain
 
 class DummyIP:
@@ -114,6 +115,59 @@ class SocIP(QickIP, DefaultIP):
         else:
             return super().__getattribute__(a)
 
+class MemoryContents:
+    """Tracks the data that has been loaded into a firmware memory, so a load of identical data can be skipped.
+    Each loaded region is remembered by its address, length and a hash of its contents.
+    Regions that are partly overwritten are forgotten.
+
+    The record is only valid as long as nothing else writes the memory.
+    If the firmware is reprogrammed or the memory is written some other way, call clear().
+    """
+    def __init__(self):
+        # address -> (length, digest)
+        self.regions = {}
+
+    def _digest(self, data):
+        return hashlib.blake2b(np.ascontiguousarray(data), digest_size=16).digest()
+
+    def clear(self):
+        """Forget everything, so the next load of each region will be done.
+        """
+        self.regions.clear()
+
+    def is_loaded(self, data, addr):
+        """Check whether this data is already in the memory at this address.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Data to be loaded, one row per memory word
+        addr : int
+            Starting address
+
+        Returns
+        -------
+        bool
+            True if the load can be skipped
+        """
+        return self.regions.get(addr) == (data.shape[0], self._digest(data))
+
+    def update(self, data, addr):
+        """Record a load.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Data that was loaded, one row per memory word
+        addr : int
+            Starting address
+        """
+        end = addr + data.shape[0]
+        for a, (length, _) in list(self.regions.items()):
+            if a < end and addr < a + length:
+                del self.regions[a]
+        self.regions[addr] = (data.shape[0], self._digest(data))
+
 class QickMetadata:
     """
     Provides information about the connections between IP blocks, extracted from the HWH file.
@@ -1,9 +1,182 @@
 """
-Function to parse tProc assembly language programs.
+Functions to parse tProc v1 assembly language programs.
+
+The instruction syntax and encoding come from :class:`qick.asm_v1.QickProgram`, so text programs compile to the same machine code as programs built in Python.
 """
 import re
+import numpy as np
+
+# One line of ASM: an optional label, the instruction name and its arguments, terminated by a semicolon and optionally followed by a comment.
+_LINE_RE = re.compile(r"^\s*(?:(?P<label>[^\s:;/][^:;]*?)\s*:)?\s*(?P<inst>[a-z]+)\b(?P<args>[^;]*);\s*(?://.*)?$")
+# Blank lines and comments.
+_SKIP_RE = re.compile(r"^\s*(?://.*)?$")
+# Placeholders in the instructions' repr templates: register ($), label (@) or plain value.
+_FIELD_RE = re.compile(r"([$@]?)\{(\d+)\}")
+_NUMBER_RE = r"(-?(?:0x[0-9a-fA-F]+|\d+))"
+
+# Width (in bits) of the instruction fields, indexed by bit shift.
+# The field at shift 0 is the 31-bit immediate for I-type instructions and the 16-bit address for J-type instructions.
+_FIELD_BITS = {53: 3, 50: 3, 46: 4, 41: 5, 36: 5, 31: 5, 26: 5, 21: 5, 16: 5, 11: 5, 0: 16}
+
+# Alternate forms for the bitwise NOT, which only uses one operand.
+# Each entry is (template, values for the arguments missing from the template).
+_ALIASES = {'bitwi': [("{0}, ${1}, ~{4}", {2: 0, 3: '~'})],
+            'bitw': [("{0}, ${1}, ~${4}", {2: 0, 3: '~'})]}
+
+_grammar = None
+
+
+def _template2re(template, ops, op_re):
+    # build the regex for an instruction's arguments from its repr template
+    # the template is split into literal text and fields: (arg index, kind)
+    items = []
+    pos = 0
+    for m in _FIELD_RE.finditer(template):
+        items.append(template[pos:m.start()])
+        iarg = int(m.group(2))
+        if m.group(1) == "$":
+            items.append((iarg, 'reg'))
+        elif m.group(1) == "@":
+            items.append((iarg, 'label'))
+        elif iarg in ops:
+            items.append((iarg, 'op'))
+        else:
+            items.append((iarg, 'num'))
+        pos = m.end()
+    items.append(template[pos:])
+
+    field_res = {'reg': r"\$(\d+)", 'label': r"@(\S+)", 'op': op_re, 'num': _NUMBER_RE}
+    pattern = r"\s*"
+    for i, item in enumerate(items):
+        if isinstance(item, tuple):
+            pattern += field_res[item[1]]
+            continue
+        # commas next to an operator are optional, so both "$1, ==, $2" and "$1 == $2" are accepted
+        next_to_op = any(0 <= j < len(items) and isinstance(items[j], tuple) and items[j][1] == 'op' for j in (i-1, i+1))
+        for c in item:
+            if c == ",":
+                pattern += r"\s*,?\s*" if next_to_op else r"\s*,\s*"
+            elif c.isspace():
+                pattern += r"\s*"
+            else:
+                pattern += r"\s*" + re.escape(c) + r"\s*"
+    pattern += r"\s*"
+    return re.compile(pattern), tuple([item for item in items if isinstance(item, tuple)])
+
+
+def _get_grammar():
+    """Build (once) the argument parsers for all tProc v1 instructions.
+
+    Returns
+    -------
+    dict
+        Map from instruction name to a list of (compiled regex, field list, default arguments, number of arguments).
+    """
+    global _grammar
+    if _grammar is None:
+        # imported here, since asm_v1 itself imports this module
+        from .asm_v1 import QickProgram
+        table = QickProgram._encoding_table()
+        op_re = "(" + "|".join([re.escape(op) for op in sorted(QickProgram.op_codes, key=len, reverse=True)]) + ")"
+        grammar = {}
+        for name, (base, fmt, imm, ops, label_args) in table.items():
+            nargs = max([f[0] for f in fmt]+[-1])+1
+            forms = [(QickProgram.instructions[name]['repr'], {})] + _ALIASES.get(name, [])
+            grammar[name] = []
+            for template, defaults in forms:
+                regex, fields = _template2re(template, ops, op_re)
+                grammar[name].append((regex, fields, defaults, nargs))
+        _grammar = grammar
+    return _grammar
+
+
+def _parse_number(s):
+    if "0x" in s:
+        return int(s, 16)
+    return int(s, 10)
+
+
+def assemble(file="prog.asm"):
+    """
+    Assembles a .asm tProc v1 program into machine code.
+    Labels may be used before they are defined.
 
-# Function to parse program.
+    :param file: ASM program file name
+    :type file: str
+    :return: Program as an array of 64-bit words, and the (instruction, arguments) text of each word
+    :rtype: tuple[numpy.ndarray, list[tuple[str,str]]]
+    """
+    from .asm_v1 import QickProgram
+    grammar = _get_grammar()
+    table = QickProgram._encoding_table()
+    op_codes = QickProgram.op_codes
+
+    labels = {}
+    # name -> (program counters, line numbers, argument lists)
+    groups = {}
+    # jumps to labels: (group name, position in group, arg index, label name, line number)
+    label_refs = []
+    text = []
+    with open(file, "r") as fd:
+        for lineno, line in enumerate(fd, start=1):
+            if _SKIP_RE.match(line):
+                continue
+            m = _LINE_RE.match(line)
+            if m is None:
+                raise RuntimeError("%s, line %d: could not parse line: %s" % (file, lineno, line.strip()))
+            label, name, argstr = m.group('label', 'inst', 'args')
+            if name not in grammar:
+                raise RuntimeError("%s, line %d: unknown instruction \"%s\"" % (file, lineno, name))
+            for regex, fields, defaults, nargs in grammar[name]:
+                margs = regex.fullmatch(argstr)
+                if margs is not None:
+                    break
+            else:
+                raise RuntimeError("%s, line %d: bad arguments for %s: %s" % (file, lineno, name, argstr.strip()))
+            if label is not None:
+                if label in labels:
+                    raise RuntimeError("%s, line %d: label used twice: %s" % (file, lineno, label))
+                labels[label] = len(text)
+
+            pcs, linenos, rows = groups.setdefault(name, ([], [], []))
+            args = [0]*nargs
+            for iarg, val in defaults.items():
+                args[iarg] = op_codes[val] if isinstance(val, str) else val
+            for (iarg, kind), val in zip(fields, margs.groups()):
+                if kind == 'label':
+                    label_refs.append((name, len(rows), iarg, val, lineno))
+                elif kind == 'op':
+                    args[iarg] = op_codes[val]
+                else:
+                    args[iarg] = _parse_number(val)
+            pcs.append(len(text))
+            linenos.append(lineno)
+            rows.append(args)
+            text.append((name, argstr.strip()))
+
+    for name, row, iarg, label, lineno in label_refs:
+        if label not in labels:
+            raise RuntimeError("%s, line %d: could not resolve label %s" % (file, lineno, label))
+        groups[name][2][row][iarg] = labels[label]
+
+    binprog = np.zeros(len(text), dtype=np.uint64)
+    for name, (pcs, linenos, rows) in groups.items():
+        base, fmt, imm, ops, label_args = table[name]
+        args = np.array(rows, dtype=np.int64).reshape(len(rows), len(rows[0]))
+        for iarg, shift in fmt:
+            col = args[:, iarg]
+            if iarg == imm:
+                # immediates are 31 bits, negative values are stored as two's complement
+                bad = (col < -2**30) | (col >= 2**31)
+            else:
+                bad = (col < 0) | (col >= 2**_FIELD_BITS[shift])
+            if bad.any():
+                i = np.argmax(bad)
+                raise RuntimeError("%s, line %d: value %d does not fit in its field: %s %s" % (file, linenos[i], col[i], *text[pcs[i]]))
+            if iarg == imm:
+                col[col < 0] += 2**31
+        binprog[pcs] = QickProgram._encode_group(name, args.tolist())
+    return binprog, text
 
 
 def parse_prog(file="prog.asm", outfmt="bin"):
@@ -17,866 +190,13 @@ def parse_prog(file="prog.asm", outfmt="bin"):
     :return: Program in the new output format
     :rtype: dict[int,str]
     """
-    # Output structure.
-    outProg = {}
-
-    # Instructions.
-    instList = {}
-
-    # I-type.
-    instList['pushi'] = {'bin': '00010000'}
-    instList['popi'] = {'bin': '00010001'}
-    instList['mathi'] = {'bin': '00010010'}
-    instList['seti'] = {'bin': '00010011'}
-    instList['synci'] = {'bin': '00010100'}
-    instList['waiti'] = {'bin': '00010101'}
-    instList['bitwi'] = {'bin': '00010110'}
-    instList['memri'] = {'bin': '00010111'}
-    instList['memwi'] = {'bin': '00011000'}
-    instList['regwi'] = {'bin': '00011001'}
-    instList['setbi'] = {'bin': '00011010'}
-
-    # J-type.
-    instList['loopnz'] = {'bin': '00110000'}
-    instList['condj'] = {'bin': '00110001'}
-    instList['end'] = {'bin': '00111111'}
-
-    # R-type.
-    instList['math'] = {'bin': '01010000'}
-    instList['set'] = {'bin': '01010001'}
-    instList['sync'] = {'bin': '01010010'}
-    instList['read'] = {'bin': '01010011'}
-    instList['wait'] = {'bin': '01010100'}
-    instList['bitw'] = {'bin': '01010101'}
-    instList['memr'] = {'bin': '01010110'}
-    instList['memw'] = {'bin': '01010111'}
-    instList['setb'] = {'bin': '01011000'}
-
-    # Structures for symbols and program.
-    progList = {}
-    symbList = {}
-
-    ##############################
-    ### Read program from file ###
-    ##############################
-    fd = open(file, "r")
-    addr = 0
-    for line in fd:
-        # Match comments.
-        m = re.search("^\s*//", line)
-
-        # If there is a match.
-        if m:
-            # print(line)
-            a = 1
-
-        else:
-            # Match instructions.
-            jump_re = "^((.+):)?"
-            inst_re_I = "pushi|popi|mathi|seti|synci|waiti|bitwi|memri|memwi|regwi|setbi|"
-            inst_re_J = "loopnz|condj|end|"
-            inst_re_R = "math|set|sync|read|wait|bitw|memr|memw|setb"
-            inst_re = "\s*(" + inst_re_I + inst_re_J + inst_re_R + ")\s+(.+);"
-            comp_re = jump_re + inst_re
-            m = re.search(comp_re, line, flags=re.MULTILINE)
-
-            # If there is a match.
-            if m:
-                # Tagged instruction for jump.
-                if m.group(2):
-                    symb = m.group(2)
-                    inst = m.group(3)
-                    args = m.group(4)
-
-                    # Add symbol to symbList.
-                    symbList[symb] = addr
-
-                    # Add instruction to progList.
-                    progList[addr] = {'inst': inst, 'args': args}
-
-                    # Increment address.
-                    addr = addr + 1
-
-                # Normal instruction.
-                else:
-                    inst = m.group(3)
-                    args = m.group(4)
-
-                    # Add instruction to progList.
-                    progList[addr] = {'inst': inst, 'args': args}
-
-                    # Increment address.
-                    addr = addr + 1
-
-            # Check special case of "end" instruction.
-            else:
-                m = re.search("\s*(end)\s*;", line)
-
-                # If there is a match.
-                if m:
-                    # Add instruction to progList.
-                    progList[addr] = {'inst': 'end', 'args': ''}
-
-                    # Increment address.
-                    addr = addr + 1
-
-    #########################
-    ### Support functions ###
-    #########################
-    def unsigned2bin(strin, bits=8):
-        maxv = 2**bits - 1
-
-        # Check if hex string.
-        m = re.search("^0x", strin, flags=re.MULTILINE)
-        if m:
-            dec = int(strin, 16)
-        else:
-            dec = int(strin, 10)
-
-        # Check max.
-        if dec > maxv:
-            print("Error: number %d is bigger than %d" % (dec, maxv))
-            return None
-
-        # Convert to binary.
-        fmt = "{0:0" + str(bits) + "b}"
-        binv = fmt.format(dec)
-
-        return binv
-
-    def integer2bin(strin, bits=8):
-        minv = -2**(bits-1)
-        maxv = 2**(bits-1) - 1
-
-        # Check if hex string.
-        m = re.search("^0x", strin, flags=re.MULTILINE)
-        if m:
-            # Special case for hex number.
-            dec = int(strin, 16)
-
-            # Convert to binary.
-            fmt = "{0:0" + str(bits) + "b}"
-            binv = fmt.format(dec)
-
-            return binv
-        else:
-            dec = int(strin, 10)
-
-        # Check max.
-        if dec < minv:
-            print("Error: number %d is smaller than %d" % (dec, minv))
-            return None
-
-        # Check max.
-        if dec > maxv:
-            print("Error: number %d is bigger than %d" % (dec, maxv))
-            return None
-
-        # Check if number is negative.
-        if dec < 0:
-            dec = dec + 2**bits
-
-        # Convert to binary.
-        fmt = "{0:0" + str(bits) + "b}"
-        binv = fmt.format(dec)
-
-        return binv
-
-    def op2bin(op):
-        if op == "0":
-            return "0000"
-        elif op == ">":
-            return "0000"
-        elif op == ">=":
-            return "0001"
-        elif op == "<":
-            return "0010"
-        elif op == "<=":
-            return "0011"
-        elif op == "==":
-            return "0100"
-        elif op == "!=":
-            return "0101"
-        elif op == "+":
-            return "1000"
-        elif op == "-":
-            return "1001"
-        elif op == "*":
-            return "1010"
-        elif op == "&":
-            return "0000"
-        elif op == "|":
-            return "0001"
-        elif op == "^":
-            return "0010"
-        elif op == "~":
-            return "0011"
-        elif op == "<<":
-            return "0100"
-        elif op == ">>":
-            return "0101"
-        elif op == "upper":
-            return "1010"
-        elif op == "lower":
-            return "0101"
-        else:
-            print("Error: operation \"%s\" not recognized" % op)
-            return "1111"
-
-    ######################################
-    ### First pass: parse instructions ###
-    ######################################
-    for e in progList:
-        inst = progList[e]['inst']
-        args = progList[e]['args']
-
-        # I-type: three registers and an immediate value.
-        # I-type:<inst>:page:channel:oper:ra:rb:rc:imm
-
-        # pushi p, $ra, $rb, imm
-        if inst == 'pushi':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*(\-?\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                ra = m.group(2)
-                rb = m.group(3)
-                imm = m.group(4)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:pushi:" + \
-                    page + ":0:0:" + rb + ":" + ra + ":0:" + imm
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # popi p, $r
-        elif inst == 'popi':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                r = m.group(2)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:popi:" + \
-                    page + ":0:0:" + r + ":0:0:0"
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # mathi p, $ra, $rb oper imm
-        if inst == 'mathi':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*([\+\-\*])\s*(0?x?\-?[0-9a-fA-F]+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                ra = m.group(2)
-                rb = m.group(3)
-                oper = m.group(4)
-                imm = m.group(5)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:mathi:" + page + \
-                    ":0:" + oper + ":" + ra + ":" + rb + ":0:" + imm
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # seti ch, p, $r, t
-        if inst == 'seti':
-            comp_re = "\s*(\d+)\s*,\s*(\d+)\s*,\s*\$(\d+)\s*,\s*(\-?\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                ch = m.group(1)
-                page = m.group(2)
-                ra = m.group(3)
-                t = m.group(4)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:seti:" + \
-                    page + ":" + ch + ":0:0:" + ra + ":0:" + t
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # synci t
-        if inst == 'synci':
-            comp_re = "\s*(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                t = m.group(1)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:synci:0:0:0:0:0:0:" + t
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # waiti ch, t
-        if inst == 'waiti':
-            comp_re = "\s*(\d+)\s*,\s*(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                ch = m.group(1)
-                t = m.group(2)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:waiti:0:" + \
-                    ch + ":0:0:0:0:" + t
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # bitwi p, $ra, $rb oper imm
-        if inst == 'bitwi':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*([&|<>^]+)\s*(0?x?\-?[0-9a-fA-F]+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                ra = m.group(2)
-                rb = m.group(3)
-                oper = m.group(4)
-                imm = m.group(5)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:bitwi:" + page + \
-                    ":0:" + oper + ":" + ra + ":" + rb + ":0:" + imm
-
-            # bitwi p, $ra, ~imm
-            else:
-                comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*~\s*(0?x?\-?[0-9a-fA-F]+)"
-                m = re.search(comp_re, args)
-
-                # If there is a match.
-                if m:
-                    page = m.group(1)
-                    ra = m.group(2)
-                    oper = "~"
-                    imm = m.group(3)
-
-                    # Add entry into structure.
-                    progList[e]['inst_parse'] = "I-type:bitwi:" + \
-                        page + ":0:" + oper + ":" + ra + ":0:0:" + imm
-
-                # Error: bad instruction format.
-                else:
-                    print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # memri p, $r, imm
-        if inst == 'memri':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*(0?x?\-?[0-9a-fA-F]+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                r = m.group(2)
-                imm = m.group(3)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:memri:" + \
-                    page + ":0:0:" + r + ":0:0:" + imm
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # memwi p, $r, imm
-        if inst == 'memwi':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*(0?x?\-?[0-9a-fA-F]+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                r = m.group(2)
-                imm = m.group(3)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:memwi:" + \
-                    page + ":0:0:0:0:" + r + ":" + imm
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # regwi p, $r, imm
-        if inst == 'regwi':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*(0?x?\-?[0-9a-fA-F]+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                r = m.group(2)
-                imm = m.group(3)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:regwi:" + \
-                    page + ":0:0:" + r + ":0:0:" + imm
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # setbi ch, p, $r, t
-        if inst == 'setbi':
-            comp_re = "\s*(\d+)\s*,\s*(\d+)\s*,\s*\$(\d+)\s*,\s*(\-?\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                ch = m.group(1)
-                page = m.group(2)
-                ra = m.group(3)
-                t = m.group(4)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "I-type:setbi:" + \
-                    page + ":" + ch + ":0:0:" + ra + ":0:" + t
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # J-type: three registers and an address for jump.
-        # J-type:<inst>:page:oper:ra:rb:rc:addr
-
-        # loopnz p, $r, @label
-        if inst == 'loopnz':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*\@(.+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                oper = "+"
-                r = m.group(2)
-                label = m.group(3)
-
-                # Resolve symbol.
-                if label in symbList:
-                    label_addr = symbList[label]
-                else:
-                    print("Error: could not resolve symbol %s on instruction @%d: %s %s" % (
-                        label, e, inst, args))
-
-                # Add entry into structure.
-                regs = r + ":" + r + ":0:" + str(label_addr)
-                progList[e]['inst_parse'] = "J-type:loopnz:" + \
-                    page + ":" + oper + ":" + regs
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # condj p, $ra op $rb, @label
-        if inst == 'condj':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*([<>=!]+)\s*\$(\d+)\s*,\s*\@(.+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                ra = m.group(2)
-                oper = m.group(3)
-                rb = m.group(4)
-                label = m.group(5)
-
-                # Resolve symbol.
-                if label in symbList:
-                    label_addr = symbList[label]
-                else:
-                    print("Error: could not resolve symbol %s on instruction @%d: %s %s" % (
-                        label, e, inst, args))
-
-                # Add entry into structure.
-                regs = ra + ":" + rb + ":" + str(label_addr)
-                progList[e]['inst_parse'] = "J-type:condj:" + \
-                    page + ":" + oper + ":0:" + regs
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # end
-        if inst == 'end':
-            # Add entry into structure.
-            progList[e]['inst_parse'] = "J-type:end:0:0:0:0:0:0"
-
-        # R-type: 8 registers, 7 for reading and 1 for writing.
-        # R-type:<inst>:page:channel:oper:ra:rb:rc:rd:re:rf:rg:rh
-
-        # math p, $ra, $rb oper $rc
-        if inst == 'math':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*([\+\-\*])\s*\$(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                ra = m.group(2)
-                rb = m.group(3)
-                oper = m.group(4)
-                rc = m.group(5)
-
-                # Add entry into structure.
-                regs = ra + ":" + rb + ":" + rc + ":0:0:0:0:0"
-                progList[e]['inst_parse'] = "R-type:math:" + \
-                    page + ":0:" + oper + ":" + regs
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # set ch, p, $ra, $rb, $rc, $rd, $re, $rt
-        if inst == 'set':
-            regs = "\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)"
-            comp_re = "\s*(\d+)\s*,\s*(\d+)\s*," + regs
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                ch = m.group(1)
-                page = m.group(2)
-                ra = m.group(3)
-                rb = m.group(4)
-                rc = m.group(5)
-                rd = m.group(6)
-                ree = m.group(7)
-                rt = m.group(8)
-
-                # Add entry into structure.
-                regs = ra + ":" + rt + ":" + rb + ":" + rc + ":" + rd + ":" + ree + ":0"
-                progList[e]['inst_parse'] = "R-type:set:" + \
-                    page + ":" + ch + ":0:0:" + regs
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # sync p, $r
-        if inst == 'sync':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                r = m.group(2)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "R-type:sync:" + \
-                    page + ":0:0:0:0:" + r + ":0:0:0:0:0"
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # read ch, p, oper $r
-        if inst == 'read':
-            comp_re = "\s*(\d+)\s*,\s*(\d+)\s*,\s*(upper|lower)\s+\$(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                ch = m.group(1)
-                page = m.group(2)
-                oper = m.group(3)
-                r = m.group(4)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "R-type:read:" + page + \
-                    ":" + ch + ":" + oper + ":" + r + ":0:0:0:0:0:0:0"
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # wait ch, p, $r
-        if inst == 'wait':
-            comp_re = "\s*(\d+)\s*,\s*(\d+)\s*,\s*\$(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                ch = m.group(1)
-                page = m.group(2)
-                r = m.group(3)
-
-                # Add entry into structure.
-                progList[e]['inst_parse'] = "R-type:wait:" + \
-                    page + ":" + ch + ":0:0:0:" + r + ":0:0:0:0:0"
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # bitw p, $ra, $rb oper $rc
-        if inst == 'bitw':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*([&|<>^]+)\s*\$(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                ra = m.group(2)
-                rb = m.group(3)
-                oper = m.group(4)
-                rc = m.group(5)
-
-                # Add entry into structure.
-                regs = ra + ":" + rb + ":" + rc + ":0:0:0:0:0"
-                progList[e]['inst_parse'] = "R-type:bitw:" + \
-                    page + ":0:" + oper + ":" + regs
-
-            # bitw p, $ra, ~$rb
-            else:
-                comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*~\s*\$(\d+)"
-                m = re.search(comp_re, args)
-
-                # If there is a match.
-                if m:
-                    page = m.group(1)
-                    ra = m.group(2)
-                    rb = m.group(3)
-                    oper = "~"
-
-                    # Add entry into structure.
-                    regs = ra + ":0:" + ":" + rb + ":0:0:0:0:0"
-                    progList[e]['inst_parse'] = "R-type:bitw:" + \
-                        page + ":0:" + oper + ":" + regs
-
-                # Error: bad instruction format.
-                else:
-                    print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # memr p, $ra, $rb
-        if inst == 'memr':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                ra = m.group(2)
-                rb = m.group(3)
-
-                # Add entry into structure.
-                regs = ra + ":" + rb + ":0:0:0:0:0:0"
-                progList[e]['inst_parse'] = "R-type:memr:" + \
-                    page + ":0:0:" + regs
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # memw p, $ra, $rb
-        if inst == 'memw':
-            comp_re = "\s*(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)"
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                page = m.group(1)
-                ra = m.group(2)
-                rb = m.group(3)
-
-                # Add entry into structure.
-                regs = rb + ":" + ra + ":0:0:0:0:0"
-                progList[e]['inst_parse'] = "R-type:memw:" + \
-                    page + ":0:0:0:" + regs
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-        # setb ch, p, $ra, $rb, $rc, $rd, $re, $rt
-        if inst == 'setb':
-            regs = "\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)\s*,\s*\$(\d+)"
-            comp_re = "\s*(\d+)\s*,\s*(\d+)\s*," + regs
-            m = re.search(comp_re, args)
-
-            # If there is a match.
-            if m:
-                ch = m.group(1)
-                page = m.group(2)
-                ra = m.group(3)
-                rb = m.group(4)
-                rc = m.group(5)
-                rd = m.group(6)
-                ree = m.group(7)
-                rt = m.group(8)
-
-                # Add entry into structure.
-                regs = ra + ":" + rt + ":" + rb + ":" + rc + ":" + rd + ":" + ree + ":0"
-                progList[e]['inst_parse'] = "R-type:setb:" + \
-                    page + ":" + ch + ":0:0:" + regs
-
-            # Error: bad instruction format.
-            else:
-                print("Error: bad format on instruction @%d: %s" % (e, inst))
-
-    ######################################
-    ### Second pass: convert to binary ###
-    ######################################
-    for e in progList:
-        inst = progList[e]['inst_parse']
-        spl = inst.split(":")
-
-        # I-type
-        if spl[0] == "I-type":
-            # Instruction.
-            if spl[1] in instList:
-                inst_bin = instList[spl[1]]['bin']
-            else:
-                print(
-                    "Error: instruction %s not found on instraction list" % spl[1])
-
-            # page.
-            page = unsigned2bin(spl[2], 3)
-
-            # channel
-            ch = unsigned2bin(spl[3], 3)
-
-            # oper
-            oper = op2bin(spl[4])
-
-            # Registers.
-            ra = unsigned2bin(spl[5], 5)
-            rb = unsigned2bin(spl[6], 5)
-            rc = unsigned2bin(spl[7], 5)
-
-            # Immediate.
-            imm = integer2bin(spl[8], 31)
-
-            # Machine code (bin/hex).
-            code = inst_bin + page + ch + oper + ra + rb + rc + imm
-            code_h = "{:016x}".format(int(code, 2))
-
-            # Write values back into hash.
-            progList[e]['inst_bin'] = code
-            progList[e]['inst_hex'] = code_h
-
-        elif (spl[0] == "J-type"):
-            # Instruction.
-            if spl[1] in instList:
-                inst_bin = instList[spl[1]]['bin']
-            else:
-                print(
-                    "Error: instruction %s not found on instraction list" % spl[1])
-
-            # Page.
-            page = unsigned2bin(spl[2], 3)
-
-            # Zeros.
-            z3 = unsigned2bin("0", 3)
-
-            # oper
-            oper = op2bin(spl[3])
-
-            # Registers.
-            ra = unsigned2bin(spl[4], 5)
-            rb = unsigned2bin(spl[5], 5)
-            rc = unsigned2bin(spl[6], 5)
-
-            # Zeros.
-            z15 = unsigned2bin("0", 15)
-
-            # Address.
-            jmp_addr = unsigned2bin(spl[7], 16)
-
-            # Machine code (bin/hex).
-            code = inst_bin + page + z3 + oper + ra + rb + rc + z15 + jmp_addr
-            code_h = "{:016x}".format(int(code, 2))
-
-            # Write values back into hash.
-            progList[e]['inst_bin'] = code
-            progList[e]['inst_hex'] = code_h
-
-        elif (spl[0] == "R-type"):
-            # Instruction.
-            if spl[1] in instList:
-                inst_bin = instList[spl[1]]['bin']
-            else:
-                print(
-                    "Error: instruction \"%s\" not found on instraction list" % spl[1])
-
-            # Page.
-            page = unsigned2bin(spl[2], 3)
-
-            # Channel
-            ch = unsigned2bin(spl[3], 3)
-
-            # Oper
-            oper = op2bin(spl[4])
-
-            # Registers.
-            ra = unsigned2bin(spl[5], 5)
-            rb = unsigned2bin(spl[6], 5)
-            rc = unsigned2bin(spl[7], 5)
-            rd = unsigned2bin(spl[8], 5)
-            ree = unsigned2bin(spl[9], 5)
-            rf = unsigned2bin(spl[10], 5)
-            rg = unsigned2bin(spl[11], 5)
-            rh = unsigned2bin(spl[12], 5)
-
-            # Zeros.
-            z6 = unsigned2bin("0", 6)
-
-            # Machine code (bin/hex).
-            code = inst_bin + page + ch + oper + ra + \
-                rb + rc + rd + ree + rf + rg + rh + z6
-            code_h = "{:016x}".format(int(code, 2))
-
-            # Write values back into hash.
-            progList[e]['inst_bin'] = code
-            progList[e]['inst_hex'] = code_h
-
-        else:
-            print("Error: bad type on instruction @%d: %s" % (e, inst))
-
-    ####################
-    ### Write output ###
-    ####################
-    # Binary format.
+    binprog, text = assemble(file)
     if outfmt == "bin":
-        for e in progList:
-            outProg[e] = progList[e]['inst_bin']
-
-    # Hex format.
+        return {addr: format(int(mc), '064b') for addr, mc in enumerate(binprog)}
     elif outfmt == "hex":
-        for e in progList:
-            out = progList[e]['inst_hex'] + " -> " + \
-                progList[e]['inst'] + " " + progList[e]['args']
-            outProg[e] = out
-
+        return {addr: "%016x -> %s %s" % (int(mc), name, args) for addr, (mc, (name, args)) in enumerate(zip(binprog, text))}
     else:
-        print("Error: \"%s\" is not a recognized output format" % outfmt)
-
-    # Return program list.
-    return outProg
+        raise RuntimeError("\"%s\" is not a recognized output format" % outfmt)
 
 
 def parse_to_bin(path):
@@ -885,11 +205,10 @@ def parse_to_bin(path):
 
     :param file: ASM program file name
     :type file: str
-    :return: Program as a list of 64-bit ints
-    :rtype: list
+    :return: Program as an array of 64-bit ints
+    :rtype: numpy.ndarray
     """
-    p = parse_prog(path)
-    return [int(p[i], 2) for i in p]
+    return assemble(path)[0]
 
 def load_program(soc, prog="prog.asm", fmt="asm"):
     """
@@ -0,0 +1,208 @@
+"""
+On-disk cache of compiled QICK programs.
+"""
+import os
+import logging
+import hashlib
+import json
+import tempfile
+import numpy as np
+
+from qick import get_version
+from .helpers import NpEncoder
+
+logger = logging.getLogger(__name__)
+
+# Default size limit for the cache directory, in bytes.
+DEFAULT_MAX_BYTES = 256*2**20
+
+def default_cache_dir():
+    """Default location of the cache: a qick/binprog directory in the user's cache directory.
+
+    Returns
+    -------
+    str
+        directory path
+    """
+    base = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "qick", "binprog")
+
+class _DigestEncoder(NpEncoder):
+    """
+    JSON encoder for computing cache keys: arrays are replaced by a hash of their contents, instead of being base64-encoded.
+    """
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return (hashlib.sha256(np.ascontiguousarray(obj)).hexdigest(), obj.shape, obj.dtype.str)
+        return super().default(obj)
+
+class BinprogCache():
+    """Cache of compiled program memories, stored as .npz files in a directory.
+    Entries are keyed by a hash of the program's ASM and the firmware configuration, so the cache can be shared between processes and sessions.
+    When the directory grows past the size limit, the least recently used entries are deleted.
+
+    A cache hit only skips the final step of compilation, where the ASM and waveform list are encoded into memory images.
+    Programs built with make_program() still generate their ASM (and their envelopes) every time, so the cache mostly helps programs that are loaded from a dump with load_prog(), e.g. in the QickClient.
+
+    To use the cache for all programs, set it as a class attribute:
+    ``AbsQickProgram.binprog_cache = BinprogCache()``
+
+    Parameters
+    ----------
+    path : str
+        cache directory (created if needed); if None, use default_cache_dir()
+    max_bytes : int
+        size limit for the cache directory
+    """
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        if path is None:
+            path = default_cache_dir()
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+        # digests of firmware configurations, indexed by id()
+        # the config is kept with its digest, so the id can't be reused by another object
+        self._cfg_digests = {}
+
+    def key(self, progdict, cfg):
+        """Compute the cache key for a program.
+
+        Parameters
+        ----------
+        progdict : dict
+            the parts of the program dump that the compiled program depends on (see AbsQickProgram.binprog_keys)
+        cfg : dict
+            firmware configuration, from QickConfig.get_cfg()
+
+        Returns
+        -------
+        str
+            hex digest, or None if the program can't be serialized
+        """
+        try:
+            # arrays are hashed as raw bytes, which is much faster than serializing them
+            s = json.dumps(progdict, cls=_DigestEncoder)
+        except (TypeError, ValueError) as e:
+            logger.debug("can't hash program for the binprog cache: %s", e)
+            return None
+        h = hashlib.sha256()
+        # the library version is included because the encoding may change between versions
+        h.update(get_version().encode())
+        h.update(self.cfg_digest(cfg).encode())
+        h.update(s.encode())
+        return h.hexdigest()
+
+    def cfg_digest(self, cfg):
+        """Compute the hash of a firmware configuration.
+        The result is remembered, since the configuration of a QickConfig doesn't change.
+
+        Parameters
+        ----------
+        cfg : dict
+            firmware configuration, from QickConfig.get_cfg()
+
+        Returns
+        -------
+        str
+            hex digest
+        """
+        entry = self._cfg_digests.get(id(cfg))
+        if entry is None:
+            s = json.dumps(cfg, cls=_DigestEncoder)
+            entry = (cfg, hashlib.sha256(s.encode()).hexdigest())
+            self._cfg_digests[id(cfg)] = entry
+        return entry[1]
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + ".npz")
+
+    def get(self, key):
+        """Look up a compiled program.
+
+        Parameters
+        ----------
+        key : str
+            cache key
+
+        Returns
+        -------
+        dict of numpy.ndarray
+            the memory images that were stored, or None if there is no entry
+        """
+        fname = self._entry_path(key)
+        try:
+            with np.load(fname, allow_pickle=False) as f:
+                arrays = {k: f[k] for k in f.files}
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # a truncated or corrupted entry: delete it and recompile
+            logger.warning("deleting unreadable binprog cache entry %s: %s", fname, e)
+            self._remove(fname)
+            return None
+        try:
+            # mark the entry as recently used
+            os.utime(fname)
+        except OSError:
+            pass
+        logger.debug("binprog cache hit: %s", key)
+        return arrays
+
+    def put(self, key, arrays):
+        """Store a compiled program, and evict old entries if the cache is over its size limit.
+
+        Parameters
+        ----------
+        key : str
+            cache key
+        arrays : dict of numpy.ndarray
+            memory images to store
+        """
+        # write to a temporary file and rename it, so other processes never see a partial entry
+        fd, tmpname = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmpname, self._entry_path(key))
+        except OSError as e:
+            logger.warning("could not write binprog cache entry: %s", e)
+            self._remove(tmpname)
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries until the cache is within its size limit.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.name.endswith(".npz"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        entries.sort()
+        for mtime, size, fname in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(fname)
+            total -= size
+
+    def clear(self):
+        """Delete all entries.
+        """
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith(".npz"):
+                    self._remove(entry.path)
+
+    def _remove(self, fname):
+        try:
+            os.remove(fname)
+        except FileNotFoundError:
+            # another process got there first
+            pass
@@ -10,6 +10,7 @@ import time
 import queue
 import logging
 from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from fractions import Fraction
 from . import bitfile_path, obtain, get_version
 from .ip import SocIP, QickMetadata
@@ -755,6 +756,9 @@ class QickSoc(Overlay, QickConfig):
     adc_sample_rates : dict[int, float] or None
         Sample rates to override the values compiled into the firmware.
         This should be a dictionary mapping ADC tiles to sample rates (in megasamples per second).
+    streamer_backend : str
+        "thread" (default) or "process".
+        The process backend runs the streaming readout in a separate process that writes into shared memory, so Python-side processing in the main process can't delay the readout.
     """
 
     # The following constants are no longer used. Some of the values may not match the bitfile.
@@ -776,7 +780,7 @@ class QickSoc(Overlay, QickConfig):
     #gain_resolution_signed_bits = 16
 
     # Constructor.
-    def __init__(self, bitfile=None, download=True, no_tproc=False, no_rf=False, force_init_clks=False, clk_output=None, external_clk=None, dac_sample_rates=None, adc_sample_rates=None, **kwargs):
+    def __init__(self, bitfile=None, download=True, no_tproc=False, no_rf=False, force_init_clks=False, clk_output=None, external_clk=None, dac_sample_rates=None, adc_sample_rates=None, streamer_backend="thread", **kwargs):
         self.external_clk = external_clk
         self.clk_output = clk_output
         # Read the bitstream configuration from the HWH file.
@@ -791,6 +795,8 @@ class QickSoc(Overlay, QickConfig):
         # Initialize the configuration
         self._cfg = {}
         self.external_trigger = False
+        # a readout with the process streamer backend resets the start source in the worker's copy of the QickSoc (see _sync_start_src())
+        self._start_src_reset_pending = False
         QickConfig.__init__(self)
 
         self['board'] = os.environ["BOARD"]
@@ -855,7 +861,7 @@ class QickSoc(Overlay, QickConfig):
 
             self.map_signal_paths()
 
-            self._streamer = DataStreamer(self)
+            self._streamer = DataStreamer(self, backend=streamer_backend)
 
             # list of objects that need to be registered for autoproxying over Pyro
             self.autoproxy = [self.streamer, self.tproc]
@@ -1143,7 +1149,7 @@ class QickSoc(Overlay, QickConfig):
         """
         return self.rf.round_sample_rate(tiletype, tile, fs_target)
 
-    def get_decimated(self, ch, address=0, length=None):
+    def get_decimated(self, ch, address=0, length=None, out=None, dtype=None):
         """
         Acquires data from the readout decimated buffer
 
@@ -1153,6 +1159,10 @@ class QickSoc(Overlay, QickConfig):
         :type address: int
         :param length: Buffer transfer length
         :type length: int
+        :param out: Array of shape (length, 2) to write the data into (only useful when calling locally, not through Pyro); the data is converted to the array's dtype in the same pass
+        :type out: numpy.ndarray
+        :param dtype: dtype for the returned array, if out is None (default int16)
+        :type dtype: numpy.dtype
         :return: List of I and Q decimated arrays
         :rtype: list of numpy.ndarray
         """
@@ -1162,9 +1172,9 @@ class QickSoc(Overlay, QickConfig):
             length = self.avg_bufs[ch]['buf_maxlen']
 
         # request data from DMA
-        return self.avg_bufs[ch].transfer_buf(address, length)
+        return self.avg_bufs[ch].transfer_buf(address, length, out=out, dtype=dtype)
 
-    def get_accumulated(self, ch, address=0, length=None):
+    def get_accumulated(self, ch, address=0, length=None, out=None, dtype=None):
         """
         Acquires data from the readout accumulated buffer
 
@@ -1174,6 +1184,10 @@ class QickSoc(Overlay, QickConfig):
         :type address: int
         :param length: Buffer transfer length
         :type length: int
+        :param out: Array of shape (length, 2) to write the data into (only useful when calling locally, not through Pyro); the data is converted to the array's dtype in the same pass
+        :type out: numpy.ndarray
+        :param dtype: dtype for the returned array, if out is None (default int32)
+        :type dtype: numpy.dtype
         :returns:
             - di[:length] (:py:class:`list`) - list of accumulated I data
             - dq[:length] (:py:class:`list`) - list of accumulated Q data
@@ -1184,7 +1198,74 @@ class QickSoc(Overlay, QickConfig):
             length = self.avg_bufs[ch]['avg_maxlen']
 
         # request data from DMA
-        return self.avg_bufs[ch].transfer_avg(address, length)
+        return self.avg_bufs[ch].transfer_avg(address, length, out=out, dtype=dtype)
+
+    def get_accumulated_multi(self, reqs, out=None, dtype=None):
+        """
+        Acquires data from several readout accumulated buffers in one call.
+        This saves round trips when calling through Pyro.
+
+        Requests for the same channel are done back to back, so the DMA switch is only set once per channel,
+        and requests for adjacent address ranges in the same channel are merged into a single DMA transfer.
+        Channels behind different DMAs are read in parallel.
+
+        :param reqs: list of (ch, address, length) for each transfer
+        :type reqs: list
+        :param out: list of arrays of shape (length, 2) to write the data into, one per request (only useful when calling locally, not through Pyro)
+        :type out: list of numpy.ndarray
+        :param dtype: dtype for the returned arrays, if out is None (default int32)
+        :type dtype: numpy.dtype
+        :returns: list of arrays of I,Q pairs, one per request
+        :rtype: list of numpy.ndarray
+        """
+        reqs = obtain(reqs)
+        if out is None:
+            out = [None]*len(reqs)
+        results = [None]*len(reqs)
+
+        # group requests by DMA, and by channel
+        groups = defaultdict(lambda: defaultdict(list))
+        for i, (ch, address, length) in enumerate(reqs):
+            groups[self['readouts'][ch]['avg_dma']][ch].append(i)
+
+        def read_group(chs):
+            for ch, idxs in chs.items():
+                buf = self.avg_bufs[ch]
+                # merge adjacent ranges into runs
+                idxs = sorted(idxs, key=lambda i: reqs[i][1])
+                runs = []
+                for i in idxs:
+                    _, address, length = reqs[i]
+                    if runs and runs[-1][1] == address and runs[-1][1]-runs[-1][0]+length < buf['avg_maxlen']:
+                        runs[-1][1] += length
+                        runs[-1][2].append(i)
+                    else:
+                        runs.append([address, address+length, [i]])
+                for iRun, (start, end, run_idxs) in enumerate(runs):
+                    # the switch only needs to be set for the first transfer from this channel
+                    route = (iRun == 0)
+                    if len(run_idxs) == 1:
+                        i = run_idxs[0]
+                        results[i] = buf.transfer_avg(start, end-start, out=out[i], dtype=dtype, route=route)
+                    else:
+                        data = buf.transfer_avg(start, end-start, route=route)
+                        for i in run_idxs:
+                            _, address, length = reqs[i]
+                            chunk = data[address-start:address-start+length]
+                            if out[i] is not None:
+                                out[i][...] = chunk
+                                results[i] = out[i]
+                            else:
+                                results[i] = chunk if dtype is None else chunk.astype(dtype)
+
+        if len(groups) > 1:
+            with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                # list() re-raises any exception from the threads
+                list(pool.map(read_group, groups.values()))
+        else:
+            for chs in groups.values():
+                read_group(chs)
+        return results
 
     def configure_readout(self, ch, ro_regs):
         """Configure readout channel output style and frequency.
@@ -1311,6 +1392,32 @@ class QickSoc(Overlay, QickConfig):
         data = np.array(data, dtype=np.int16)
         self.gens[ch].load(xin=data, addr=addr)
 
+    def load_envelopes(self, ch, envs):
+        """Load multiple envelopes into a signal generator.
+        Envelopes that are adjacent in memory are loaded with a single DMA transfer.
+
+        Parameters
+        ----------
+        ch: int
+            Generator channel to configure
+        envs: list of (numpy.ndarray, int)
+            (data, addr) for each envelope, where data is an array of int16 (I, Q) values and addr is the starting address
+        """
+        envs = obtain(envs)
+        self.gens[ch].load_batch([(np.asarray(data, dtype=np.int16), addr) for data, addr in envs])
+
+    def clear_envelope_cache(self):
+        """Forget which envelopes and weights have been loaded.
+        The drivers skip loads of data that is already in the generator envelope memories or the readout weight memories.
+        If those memories may have been written by something other than this QickSoc object, call this to force the next loads.
+        """
+        for gen in self.gens:
+            if isinstance(gen, AbsArbSignalGen):
+                gen.env_contents.clear()
+        for buf in self.avg_bufs:
+            if hasattr(buf, 'wgt_contents'):
+                buf.wgt_contents.clear()
+
     def set_nyquist(self, ch, nqz, force=False):
         """
         Sets DAC channel ch to operate in Nyquist zone nqz mode.
@@ -1418,11 +1525,11 @@ class QickSoc(Overlay, QickConfig):
         binprog = obtain(binprog)
         # cast to ndarray
         if self.TPROC_VERSION == 1:
-            binprog = np.array(binprog, dtype=np.uint64)
+            binprog = np.asarray(binprog, dtype=np.uint64)
         elif self.TPROC_VERSION == 2:
             for mem_sel in ['pmem', 'dmem', 'wmem']:
                 if binprog[mem_sel] is not None:
-                    binprog[mem_sel] = np.array(binprog[mem_sel], dtype=np.int32)
+                    binprog[mem_sel] = np.asarray(binprog[mem_sel], dtype=np.int32)
         self.tproc.load_bin_program(binprog, load_mem=load_mem)
 
     def reload_mem(self):
@@ -1491,6 +1598,8 @@ class QickSoc(Overlay, QickConfig):
         :param src: start source "internal" or "external"
         :type src: str
         """
+        # this supersedes the reset at the end of a readout
+        self._start_src_reset_pending = False
         if src == "internal":
             self.external_trigger = False
         elif src == "external":
@@ -1505,6 +1614,7 @@ class QickSoc(Overlay, QickConfig):
 
         If the tProc is configured for external start, this does nothing (the tProc will start on the first start signal it sees after external start is enabled).
         """
+        self._sync_start_src()
         if self.TPROC_VERSION == 1:
             if not self.external_trigger:
                 self.tproc.start()
@@ -1512,6 +1622,15 @@ class QickSoc(Overlay, QickConfig):
             if self.tproc.get_start_src() == 'internal':
                 self.tproc.start()
 
+    def _sync_start_src(self):
+        """
+        A streaming readout sets the tProc to internal start when it ends.
+        With the process streamer backend this happens in the worker, which only updates its own copy of the QickSoc, so the main process catches up here once the readout is done.
+        """
+        if self._start_src_reset_pending and self.streamer.done_flag.is_set():
+            self._start_src_reset_pending = False
+            self.external_trigger = False
+
     def stop_tproc(self, lazy=False):
         """
         Stop the tProc.
@@ -1596,7 +1715,7 @@ class QickSoc(Overlay, QickConfig):
         # this should always run with internal trigger
         prog.run(self, start_src="internal")
 
-    def start_readout(self, total_shots, counter_addr=1, ch_list=None, reads_per_shot=1, stride=None):
+    def start_readout(self, total_shots, counter_addr=1, ch_list=None, reads_per_shot=1, stride=None, out=None):
         """
         Start a streaming readout of the accumulated buffers.
 
@@ -1608,8 +1727,12 @@ class QickSoc(Overlay, QickConfig):
         :type ch_list: list of int
         :param reads_per_shot: Number of data points to expect per counter increment
         :type reads_per_shot: list of int
-        :param stride: Default number of measurements to transfer at a time.
+        :param stride: Number of measurements to transfer at a time. If None, the streamer picks the stride and adjusts it during the readout.
         :type stride: int
+        :param out: Arrays (int64, one per channel, C-contiguous) that the streamer should write the data into.
+            If None, the streamer writes into its own arrays.
+            This is only useful when calling locally, not through Pyro.
+        :type out: list of numpy.ndarray
         """
         ch_list = obtain(ch_list)
         reads_per_shot = obtain(reads_per_shot)
@@ -1617,10 +1740,11 @@ class QickSoc(Overlay, QickConfig):
         if isinstance(reads_per_shot, int):
             reads_per_shot = [reads_per_shot]*len(ch_list)
         streamer = self.streamer
+        self._sync_start_src()
 
         if not streamer.readout_worker.is_alive():
             print("restarting readout worker")
-            streamer.start_worker()
+            streamer.restart_worker()
             print("worker restarted")
 
         # if there's still a readout job running, stop it
@@ -1644,11 +1768,16 @@ class QickSoc(Overlay, QickConfig):
             self.poll_data(totaltime=-1, timeout=0.1)
             print("buffer cleared")
 
+        # the telemetry should only cover this readout
+        streamer.telemetry.clear()
         streamer.total_count = total_shots
         streamer.count = 0
+        data_bufs = streamer.set_buffers(total_shots, reads_per_shot, out)
 
         streamer.done_flag.clear()
-        streamer.job_queue.put((total_shots, counter_addr, ch_list, reads_per_shot, stride))
+        streamer.job_queue.put((total_shots, counter_addr, ch_list, reads_per_shot, stride, data_bufs, self.external_trigger))
+        if streamer.backend == "process":
+            self._start_src_reset_pending = True
 
     def poll_data(self, totaltime=0.1, timeout=None):
         """
@@ -1663,7 +1792,7 @@ class QickSoc(Overlay, QickConfig):
         :type totaltime: float
         :param timeout: How long to wait for the next data packet (None = wait forever)
         :type timeout: float
-        :return: list of (data, stats) pairs, oldest first
+        :return: list of (length, (data, stats)) pairs, oldest first; the data arrays are views into the streamer's destination arrays (copies, for the process backend)
         :rtype: list
         """
         streamer = self.streamer
@@ -1681,15 +1810,46 @@ class QickSoc(Overlay, QickConfig):
                 if streamer.stop_flag.is_set() or data is None:
                     break
                 streamer.count += length
-                new_data.append((length, data))
+                first_shot, stats = data
+                if first_shot is None:
+                    new_data.append((length, data))
+                else:
+                    streamer.telemetry.record(stats, time.time())
+                    new_data.append((length, (streamer.get_chunk(length, first_shot), stats)))
             except queue.Empty:
                 break
+        self._sync_start_src()
         return new_data
 
+    def get_streamer_telemetry(self, fmt='summary'):
+        """Get the streamer's per-chunk measurements (DMA time and throughput, buffer headroom, queue depth, poll-to-consume latency) for the most recent chunks of the current (or last) readout.
+
+        Parameters
+        ----------
+        fmt : str
+            "summary" (dict of summary values), "chunks" (dict of per-chunk arrays, oldest first), or "prometheus" (summary in Prometheus text format)
+
+        Returns
+        -------
+        dict or str
+            telemetry in the requested format
+        """
+        telemetry = self.streamer.telemetry
+        if fmt == 'summary':
+            return telemetry.summary()
+        elif fmt == 'chunks':
+            return telemetry.get()
+        elif fmt == 'prometheus':
+            return telemetry.to_prometheus()
+        else:
+            raise RuntimeError("invalid telemetry format: %s" % (fmt))
+
     def clear_ddr4(self, length=None):
         """Clear the DDR4 buffer, filling it with 0's.
         This is not necessary (the buffer will overwrite old data), but may be useful for debugging.
         Clearing the full buffer (4 GB) typically takes 4-5 seconds.
+        The driver keeps track of how much of the buffer has been armed for writing since the last clear, and only clears that region,
+        so clearing between acquisitions only costs as much time as the acquisitions wrote.
 
         Parameters
         ----------
@@ -1698,7 +1858,7 @@ class QickSoc(Overlay, QickConfig):
         """
         self.ddr4_buf.clear_mem(length)
 
-    def get_ddr4(self, nt, start=None):
+    def get_ddr4(self, nt, start=None, filename=None):
         """Get data from the DDR4 buffer.
         The first samples (typically 401 or 801) of the buffer are always stale data from the previous acquisition.
 
@@ -1712,9 +1872,48 @@ class QickSoc(Overlay, QickConfig):
             If a value is specified, the end address of the transfer window will also be incremented.
             If None, the junk at the start of the buffer will be skipped but the end address will not be incremented.
             This reduces the amount of data, giving you exactly the block of valid data from a DDR4 trigger with the same value of nt.
+        filename : str
+            If specified, the data is copied in chunks to a memory-mapped file at this path instead of into RAM.
+            This allows captures that are larger than the available memory.
+
+        Returns
+        -------
+        numpy.ndarray
+            int16 array of shape (length, 2); a numpy.memmap if filename was specified
         """
+        if filename is not None:
+            return self.ddr4_buf.get_mem_to_file(filename, nt, start)
         return self.ddr4_buf.get_mem(nt, start)
 
+    def iter_ddr4(self, nt, start=None, chunk_len=2**22, follow=False, t_trigger=None):
+        """Get data from the DDR4 buffer in chunks, instead of a single copy.
+        Each chunk is a separate array, so you can process or save the data without holding the whole capture in memory.
+
+        In follow mode, chunks are yielded while the buffer is still filling, as soon as the buffer has recorded them.
+        The buffer has no readable write pointer, so the progress of the write is estimated from the readout's sample rate and the trigger time.
+
+        Parameters
+        ----------
+        nt : int
+            Number of data transfers; see ``get_ddr4``
+        start : int
+            Number of samples to skip at the beginning of the buffer; see ``get_ddr4``
+        chunk_len : int
+            Maximum number of samples per chunk
+        follow : bool
+            Yield chunks while the acquisition is in progress
+        t_trigger : float
+            For follow mode, the time (from time.time()) when the buffer was triggered; if None, the time when you start iterating.
+
+        Yields
+        ------
+        int
+            Index of the first sample of the chunk, relative to the start of the requested data
+        numpy.ndarray
+            int16 array of shape (n, 2)
+        """
+        return self.ddr4_buf.iter_mem(nt, start, chunk_len=chunk_len, follow=follow, t_trigger=t_trigger)
+
     def arm_ddr4(self, ch, nt, force_overwrite=False):
         """Prepare the DDR4 buffer to take data.
         This must be called before starting a program that triggers the buffer.
@@ -946,6 +946,11 @@ class AbsQickProgram(ABC):
     # if true, downconversion frequencies are sign-flipped, so they are subtracted from the signal instead of added
     FLIP_DOWNCONVERSION = False
 
+    # on-disk cache of compiled programs (a progcache.BinprogCache), or None to always compile
+    # this can be set on the class (for all programs) or on a program object
+    # only the encoding of the ASM is skipped, so this mostly helps programs loaded with load_prog()
+    binprog_cache = None
+
     def __init__(self, soccfg):
         """
         Constructor method
@@ -957,6 +962,9 @@ class AbsQickProgram(ABC):
 
         # Attributes to dump when saving the program to JSON.
         self.dump_keys = ['envelopes', 'ro_chs', 'gen_chs']
+        # Attributes that the compiled memory images depend on, used as the binprog cache key.
+        # Envelopes are left out, since they are loaded separately and hashing them can cost more than compiling.
+        self.binprog_keys = []
 
     def _init_declarations(self):
         """Initialize data structures for keeping track of program declarations.
@@ -1029,6 +1037,8 @@ class AbsQickProgram(ABC):
         """
         for key in self.dump_keys:
             setattr(self, key, progdict[key])
+        # any binary we had belongs to the previous program
+        self.binprog = None
 
         # tweak data structures that got screwed up by JSON:
         # in JSON, dict keys are always strings, so we must cast back to int
@@ -1039,6 +1049,33 @@ class AbsQickProgram(ABC):
             for name, env in envdict['envs'].items():
                 env['data'] = decode_array(env['data'])
 
+    def _cached_mems(self, compile_mems):
+        """Get the compiled memory images for this program from binprog_cache, or compile them and add them to the cache.
+        The cache key is computed from the attributes listed in binprog_keys and the firmware config, so this must be called after the ASM has been generated.
+
+        Parameters
+        ----------
+        compile_mems : callable
+            Function that compiles the program and returns a dict of memory images (array, or None for an empty memory).
+
+        Returns
+        -------
+        dict
+            memory images; memories that are not in the dict are empty
+        """
+        cache = self.binprog_cache
+        key = None
+        if cache is not None:
+            key = cache.key({k: getattr(self, k) for k in self.binprog_keys}, self.soccfg.get_cfg())
+        if key is not None:
+            mems = cache.get(key)
+            if mems is not None:
+                return mems
+        mems = compile_mems()
+        if key is not None:
+            cache.put(key, {k: np.asarray(v) for k, v in mems.items() if v is not None})
+        return mems
+
     def config_all(self, soc, load_envelopes=True, reset=False, load_mem=True):
         """
         Load the waveform memory, gens, ROs, and program memory as specified for this program.
@@ -1051,8 +1088,10 @@ class AbsQickProgram(ABC):
             Force-stop the tProc before loading the program.
             This option only affects tProc v1, where the reset takes several ms.
             For tProc v2, where reset is easy, we always do the reset.
+            This also forces all envelopes and weights to be reloaded, even if they are already in memory.
         """
         # compile() first, because envelopes might be declared in a make_program() inside _make_asm()
+        # if binprog_cache is set, the compiled binary is looked up there once the ASM is ready
         if self.binprog is None:
             self.compile()
 
@@ -1061,6 +1100,8 @@ class AbsQickProgram(ABC):
 
         # now stop the tproc (if the tproc supports it)
         soc.stop_tproc(lazy=not reset)
+        if reset:
+            soc.clear_envelope_cache()
 
         # Load the pulses from the program into the soc
         if load_envelopes:
@@ -1585,14 +1626,16 @@ class AbsQickProgram(ABC):
         soc : QickSoc
             Qick object
         """
-        # for pyro compatibility, convert numpy arrays to Python lists
+        # load all the envelopes for a generator in one call
+        # numpy arrays are fine over pyro, since we use the pickle serializer
         for iCh, pulses in enumerate(self.envelopes):
+            envs = []
             for name, pulse in pulses['envs'].items():
                 data = pulse['data']
                 assert data.dtype==np.int16
-                soc.load_envelope(iCh,
-                        data=data.tolist(),
-                        addr=pulse['addr'])
+                envs.append((data, pulse['addr']))
+            if envs:
+                soc.load_envelopes(iCh, envs)
 
         for ch, cfg in self.ro_chs.items():
             ro_cfg = self.soccfg['readouts'][ch]
@@ -2215,7 +2258,7 @@ class AcquireMixin:
 
         return self.finish_acquire()
 
-    def acquire_decimated(self, soc, rounds=1, load_envelopes=True, start_src="internal", progress=True, remove_offset=True, step_rounds=False, extra_args=None):
+    def acquire_decimated(self, soc, rounds=1, load_envelopes=True, start_src="internal", progress=True, remove_offset=True, step_rounds=False, extra_args=None, dtype=np.float64, keep_rounds=True):
         """Acquire data using the decimating readout.
 
         Parameters
@@ -2237,6 +2280,12 @@ class AcquireMixin:
             You will need to step through and complete the acquisition with prepare_round(), finish_round(), and finish_acquire().
         extra_args: dict or None
             If the data-processing methods have been overriden and need extra arguments, those are supplied here and will be added to acquire_params.
+        dtype: numpy.dtype
+            Float type for the processed data.
+            np.float32 halves the memory use; it is exact as long as the sum of all rounds fits in 24 bits (e.g. up to 512 rounds of full-scale data).
+        keep_rounds: bool
+            Keep the data from every round, so it can be retrieved with get_rounds().
+            If False, the raw data from each round is added straight into a running sum, and memory use doesn't grow with the number of rounds.
 
         Returns
         -------
@@ -2252,6 +2301,8 @@ class AcquireMixin:
                 'start_src': start_src,
                 'rounds_remaining': rounds,
                 'remove_offset': remove_offset,
+                'dtype': dtype,
+                'keep_rounds': keep_rounds,
                 }
         if extra_args is not None:
             self.acquire_params.update(extra_args)
@@ -2268,6 +2319,9 @@ class AcquireMixin:
                 raise RuntimeError("Warning: requested readout length (%d x %d trigs x %d reps) exceeds buffer size (%d)"%(ro['length'], ro['trigs'], total_count, maxlen))
 
         self.rounds_buf = []
+        # running sum of the raw data, if we're not keeping the rounds
+        self.dec_sum = None
+        self.dec_rounds = 0
 
         # load the program - don't load data memory now, we'll do that later
         self.config_all(soc, load_envelopes=load_envelopes, load_mem=False)
@@ -2289,11 +2343,14 @@ class AcquireMixin:
         """
         total_count = functools.reduce(operator.mul, self.loop_dims)
         onetrig = all([ro['trigs']==1 for ro in self.ro_chs.values()])
+        dtype = self.acquire_params.get('dtype', np.float64)
         result = []
         for ii, (ch, ro) in enumerate(self.ro_chs.items()):
-            d = dec_buf[ii].astype(float)
+            offset = 0.0
             if self.acquire_params['remove_offset']:
-                d -= self._ro_offset(ch, ro.get('ro_config'))
+                offset = self._ro_offset(ch, ro.get('ro_config'))
+            # convert to float and remove the offset in one pass
+            d = np.subtract(dec_buf[ii], offset, dtype=dtype)
             if total_count == 1 and onetrig:
                 # simple case: data is 1D (one rep and one shot), just average over rounds
                 result.append(d)
@@ -2306,10 +2363,33 @@ class AcquireMixin:
                 result.append(d_reshaped)
         return result
 
+    def _accumulate_decimated(self, dec_buf):
+        """add raw decimated data to the running sum (used instead of _process_decimated() if we're not keeping the rounds)
+        """
+        if self.dec_sum is None:
+            dtype = self.acquire_params.get('dtype', np.float64)
+            self.dec_sum = [np.zeros(d.shape, dtype=dtype) for d in dec_buf]
+        for ii, d in enumerate(dec_buf):
+            # convert and add in one pass
+            np.add(self.dec_sum[ii], d, out=self.dec_sum[ii])
+        self.dec_rounds += 1
+
     def _summarize_decimated(self, rounds_buf):
         """aggregate the data from all rounds
         """
-        return [np.mean([round_d[i] for round_d in self.rounds_buf], axis=0) for i in range(len(self.ro_chs))]
+        if not self.acquire_params.get('keep_rounds', True):
+            # the average of the raw data gets processed like the data from a single round
+            # (dec_sum is left untouched, so this can be called again)
+            return self._process_decimated([d / self.dec_rounds for d in self.dec_sum])
+        # sum one round at a time, instead of stacking all the rounds into one array
+        result = []
+        for i in range(len(self.ro_chs)):
+            avg = np.array(rounds_buf[0][i], copy=True)
+            for round_d in rounds_buf[1:]:
+                avg += round_d[i]
+            avg /= len(rounds_buf)
+            result.append(avg)
+        return result
 
     def prepare_round(self):
         """Used with the step_rounds argument to acquire()/acquire_decimated()/run_rounds().
@@ -2380,7 +2460,10 @@ class AcquireMixin:
             for ii, (ch, ro) in enumerate(self.ro_chs.items()):
                 dec_buf.append(obtain(soc.get_decimated(ch=ch, address=0, length=ro['length']*ro['trigs']*total_count)))
                 self.acc_buf.append(obtain(soc.get_accumulated(ch=ch, address=0, length=ro['trigs']*total_count).reshape((*self.loop_dims, ro['trigs'], 2))))
-            self.rounds_buf.append(self._process_decimated(dec_buf))
+            if self.acquire_params['keep_rounds']:
+                self.rounds_buf.append(self._process_decimated(dec_buf))
+            else:
+                self._accumulate_decimated(dec_buf)
         elif self.acquire_params['type'] == 'run_rounds':
             soc.start_tproc()
             with tqdm(total=total_count, disable=self.acquire_params['hidereps']) as pbar:
@@ -2401,8 +2484,10 @@ class AcquireMixin:
             self.rounds_buf.append(self.acc_buf)
         else: # accumulated
             with tqdm(total=total_count, disable=self.acquire_params['hidereps']) as pbar:
+                # if the QickSoc is local (not a Pyro proxy), the streamer can write directly into acc_buf
+                out = self.acc_buf if isinstance(soc, QickConfig) else None
                 soc.start_readout(total_count, counter_addr=self.counter_addr,
-                                       ch_list=list(self.ro_chs), reads_per_shot=reads_per_shot)
+                                       ch_list=list(self.ro_chs), reads_per_shot=reads_per_shot, out=out)
                 while count<total_count:
                     new_data = obtain(soc.poll_data())
                     for new_points, (d, s) in new_data:
@@ -2413,7 +2498,10 @@ class AcquireMixin:
                             if count+new_points > total_count:
                                 logger.error("got too much data: count=%d, new_points=%d, total_count=%d"%(count, new_points, total_count))
                             # use reshape to view the acc_buf array in a shape that matches the raw data
-                            self.acc_buf[ii].reshape((-1,2))[count*nreads:(count+new_points)*nreads] = d[ii]
+                            acc_flat = self.acc_buf[ii].reshape((-1,2))
+                            # skip the copy if the streamer already wrote the data into acc_buf
+                            if not np.may_share_memory(d[ii], acc_flat):
+                                acc_flat[count*nreads:(count+new_points)*nreads] = d[ii]
                         count += new_points
                         self.stats.append(s)
                         pbar.update(new_points)
@@ -1,8 +1,17 @@
-from threading import Thread, Event
+from threading import Thread, Event, active_count
 from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, namedtuple
+import multiprocessing
+import atexit
 import time
 import numpy as np
 import traceback
+# shared memory is needed for the process backend, and is only available in Python 3.8+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
 
 # This code originally used Process not Thread.
 # Process is much slower to start (Process.start() is ~100 ms, Thread.start() is a few ms)
@@ -10,10 +19,196 @@ import traceback
 # On the other hand, CPU-bound Python threads can't run in parallel ("global interpreter lock").
 # The overall problem is not CPU-bound - we should always be limited by tProc execution.
 # In the worst case where the tProc is running fast, we should actually be waiting for IO a lot (due to the DMA).
-# So we think it's safe to use threads.
-# However, this is a complicated problem and we may ultimately need to mess around with sys.setswitchinterval() or go back to Process.
-# To use Process instead of Thread, use the following import and change WORKERTYPE.
-#from multiprocessing import Process, Queue, Event
+# So we think it's safe to use threads, and that's the default.
+# However, if the main process does a lot of Python-side processing while the readout is running (thresholding, plotting, Pyro serialization), that can stall the DMA draining.
+# For that case there is a process backend (backend="process"):
+# the worker is a forked process that owns the DMA buffers and writes the data into shared-memory slabs, and only the write cursors and stats go through the (pickling) queues.
+
+# Stats for each chunk of streamed data.
+# The first five fields are the same as the plain tuple used in older versions.
+StreamerStats = namedtuple('StreamerStats', [
+    'elapsed',      # time since the readout started (s)
+    'shots',        # value of the shot counter when the transfer started
+    'addr',         # buffer address of the transfer (for the last channel)
+    'newshots',     # number of shots in the transfer
+    'stride',       # stride chosen for the next transfer
+    't_dma',        # time spent on the DMA transfers (s)
+    'nbytes',       # number of bytes transferred
+    'headroom',     # smallest number of free samples left in any buffer at the end of the transfer
+    'queue_depth',  # number of chunks waiting in the data queue before this one was published
+    't_publish',    # wall-clock time when the chunk was published (s since epoch)
+    ])
+
+class StreamerTelemetry():
+    """
+    Fixed-size ring of per-chunk streamer measurements.
+    The streamer records one entry for every chunk that poll_data() hands to the consumer.
+
+    :param size: Number of chunks to keep
+    :type size: int
+    """
+    FIELDS = [('elapsed', np.float64),
+              ('newshots', np.int64),
+              ('stride', np.int64),
+              ('t_dma', np.float64),
+              ('nbytes', np.int64),
+              ('bytes_per_s', np.float64),
+              ('headroom', np.int64),
+              ('queue_depth', np.int64),
+              ('t_consume', np.float64),
+              ]
+
+    def __init__(self, size=1024):
+        self.ring = np.zeros(size, dtype=self.FIELDS)
+        # total number of chunks recorded
+        self.n = 0
+
+    def clear(self):
+        """
+        Forget all recorded chunks.
+        """
+        self.n = 0
+
+    def record(self, stats, t_consume):
+        """
+        Record the stats for a chunk.
+
+        :param stats: Stats published by the streamer worker
+        :type stats: StreamerStats
+        :param t_consume: Wall-clock time when the chunk was taken off the queue
+        :type t_consume: float
+        """
+        entry = self.ring[self.n % len(self.ring)]
+        entry['elapsed'] = stats.elapsed
+        entry['newshots'] = stats.newshots
+        entry['stride'] = stats.stride
+        entry['t_dma'] = stats.t_dma
+        entry['nbytes'] = stats.nbytes
+        entry['bytes_per_s'] = stats.nbytes/stats.t_dma if stats.t_dma > 0 else 0
+        entry['headroom'] = stats.headroom
+        entry['queue_depth'] = stats.queue_depth
+        entry['t_consume'] = t_consume - stats.t_publish
+        self.n += 1
+
+    def get(self):
+        """
+        Get the recorded chunks.
+
+        :return: arrays of the per-chunk values, oldest first: DMA time and poll-to-consume latency (t_dma, t_consume) in seconds, headroom in samples
+        :rtype: dict of numpy.ndarray
+        """
+        size = len(self.ring)
+        if self.n <= size:
+            entries = self.ring[:self.n]
+        else:
+            entries = np.roll(self.ring, -(self.n % size))
+        return {name: entries[name].copy() for name, _ in self.FIELDS}
+
+    def summary(self):
+        """
+        Summarize the recorded chunks.
+
+        :return: summary values
+        :rtype: dict
+        """
+        d = self.get()
+        if self.n == 0:
+            return {'chunks': 0}
+        return {'chunks': self.n,
+                'min_headroom': int(d['headroom'].min()),
+                'mean_t_dma': float(d['t_dma'].mean()),
+                'max_t_dma': float(d['t_dma'].max()),
+                'bytes_per_s': float(d['nbytes'].sum()/max(d['t_dma'].sum(), 1e-9)),
+                'max_queue_depth': int(d['queue_depth'].max()),
+                'mean_t_consume': float(d['t_consume'].mean()),
+                'max_t_consume': float(d['t_consume'].max()),
+                }
+
+    def to_prometheus(self, prefix="qick_streamer"):
+        """
+        Format the summary in the Prometheus text exposition format.
+
+        :param prefix: Prefix for the metric names
+        :type prefix: str
+        :return: metrics text
+        :rtype: str
+        """
+        helptext = {'chunks': ('counter', "Number of chunks recorded"),
+                    'min_headroom': ('gauge', "Smallest number of free samples left in any buffer after a transfer"),
+                    'mean_t_dma': ('gauge', "Mean DMA time per chunk, in seconds"),
+                    'max_t_dma': ('gauge', "Longest DMA time per chunk, in seconds"),
+                    'bytes_per_s': ('gauge', "DMA throughput, in bytes per second"),
+                    'max_queue_depth': ('gauge', "Largest number of chunks waiting in the data queue"),
+                    'mean_t_consume': ('gauge', "Mean time between publishing and consuming a chunk, in seconds"),
+                    'max_t_consume': ('gauge', "Longest time between publishing and consuming a chunk, in seconds"),
+                    }
+        lines = []
+        for key, val in self.summary().items():
+            name = "%s_%s" % (prefix, key)
+            if key == 'chunks': name += "_total"
+            mtype, text = helptext[key]
+            lines.append("# HELP %s %s" % (name, text))
+            lines.append("# TYPE %s %s" % (name, mtype))
+            lines.append("%s %s" % (name, repr(val)))
+        return "\n".join(lines) + "\n"
+
+class StrideController():
+    """
+    Feedback controller for the streamer's transfer size.
+    The stride is the number of new shots the streamer waits for before reading out the buffers.
+    Small strides waste time on DMA setup and switch reconfiguration; large strides increase latency and the risk of overflowing the buffers.
+
+    After every transfer, the controller is given the number of shots that were unread at the end of the transfer (the peak buffer occupancy), the measured shot rate and the time spent on the transfer.
+    If the peak occupancy leaves the safety band, the stride is recomputed so the predicted peak occupancy lands in the middle of the band.
+
+    :param max_shots: Number of shots that fit in the smallest buffer
+    :type max_shots: float
+    :param band: Lower and upper limits on the peak buffer occupancy, as fractions of the buffer size
+    :type band: tuple of float
+    :param smoothing: Weight given to each new measurement of the shot rate (exponential moving average)
+    :type smoothing: float
+    """
+    def __init__(self, max_shots, band=(0.2, 0.5), smoothing=0.5):
+        self.max_shots = max_shots
+        self.band = band
+        self.smoothing = smoothing
+        # start at 10% of the smallest buffer, but stride must always be at least 1
+        self.stride = max(1, int(0.1 * max_shots))
+        # shots per second
+        self.rate = None
+
+    def update(self, rate, newshots, unread, t_transfer):
+        """
+        Update the stride based on the last transfer.
+
+        :param rate: Shot rate measured since the last transfer (shots/s)
+        :type rate: float
+        :param newshots: Number of shots in the last transfer
+        :type newshots: int
+        :param unread: Number of unread shots in the buffer at the end of the last transfer
+        :type unread: int
+        :param t_transfer: Time spent on the last transfer (s)
+        :type t_transfer: float
+        :return: new stride
+        :rtype: int
+        """
+        if self.rate is None:
+            self.rate = rate
+        else:
+            self.rate += self.smoothing * (rate - self.rate)
+
+        occupancy = unread / self.max_shots
+        if self.band[0] <= occupancy <= self.band[1]:
+            return self.stride
+
+        target = 0.5 * (self.band[0] + self.band[1]) * self.max_shots
+        # shots that arrive while we are busy with the transfer
+        backlog = self.rate * t_transfer
+        # the transfer time scales roughly linearly with the transfer size, and so does the backlog
+        # (this underestimates the backlog for small transfers, where the fixed overhead dominates; the next update will correct for that)
+        stride = target / (1 + backlog/max(1, newshots))
+        self.stride = max(1, int(min(stride, self.band[1] * self.max_shots)))
+        return self.stride
 
 class DataStreamer():
     """
@@ -25,37 +220,77 @@ class DataStreamer():
 
     :param soc: The QickSoc object.
     :type soc: QickSoc
+    :param backend: "thread" or "process"
+    :type backend: str
     """
 
-    #WORKERTYPE = Process
-    WORKERTYPE = Thread
-
-    def __init__(self, soc):
+    def __init__(self, soc, backend="thread"):
         self.soc = soc
+        if backend not in ["thread", "process"]:
+            raise RuntimeError("invalid streamer backend: %s" % (backend))
+        if backend == "process" and shared_memory is None:
+            raise RuntimeError("the process streamer backend requires Python 3.8 or newer")
+        self.backend = backend
+
+        # Destination arrays for the streamed data, one per readout channel.
+        # The worker writes each transfer straight into these arrays, at the position given by the shot index.
+        # With the process backend, the streamer's own arrays are kept between readouts, so repeated readouts of the same size don't need new shared memory.
+        self.data_bufs = None
+        # Destination arrays that were allocated by the streamer (as opposed to supplied by the caller).
+        self._own_bufs = []
+        # SharedMemory objects backing _own_bufs (process backend only)
+        self._shms = []
+        # SharedMemory objects attached by the worker process, indexed by name (process backend only)
+        self._attached = {}
+        self.reads_per_count = None
+        # per-chunk telemetry, recorded by poll_data()
+        self.telemetry = StreamerTelemetry()
+        if backend == "process":
+            # the worker process exits without running atexit handlers, so this only runs in the main process
+            atexit.register(self._free_shms)
 
         self.start_worker()
 
     def start_worker(self):
+        if self.backend == "process":
+            # the worker must be forked, so it inherits the QickSoc (and its memory maps) instead of pickling it
+            ctx = multiprocessing.get_context('fork')
+            workertype, queuetype, eventtype = ctx.Process, ctx.Queue, ctx.Event
+        else:
+            workertype, queuetype, eventtype = Thread, Queue, Event
+
         # Initialize flags and queues.
         # Passes run commands from the main thread to the worker thread.
-        self.job_queue = Queue()
-        # Passes data from the worker thread to the main thread.
-        self.data_queue = Queue()
+        self.job_queue = queuetype()
+        # Passes write cursors (the data itself is in data_bufs) and stats from the worker thread to the main thread.
+        self.data_queue = queuetype()
         # Passes exceptions from the worker thread to the main thread.
-        self.error_queue = Queue()
+        self.error_queue = queuetype()
         # The main thread can use this flag to tell the worker thread to stop.
         # The main thread clears the flag when starting readout.
-        self.stop_flag = Event()
+        self.stop_flag = eventtype()
         # The worker thread uses this to tell the main thread when it's done.
         # The main thread clears the flag when starting readout.
-        self.done_flag = Event()
+        self.done_flag = eventtype()
         self.done_flag.set()
 
-        # Process object for the streaming readout.
+        # Thread or Process object for the streaming readout.
         # daemon=True means the readout thread will be killed if the parent is killed
-        self.readout_worker = self.WORKERTYPE(target=self._run_readout, daemon=True)
+        self.readout_worker = workertype(target=self._run_readout, daemon=True)
         self.readout_worker.start()
 
+    def restart_worker(self):
+        """
+        Start a new worker, to replace one that died.
+        With the process backend, the new worker would be forked from a process that may by now be running other threads (e.g. Pyro server threads), and locks held by those threads would stay locked forever in the fork.
+        So if other threads are running, the streamer switches to the thread backend.
+        """
+        if self.backend == "process" and active_count() > 1:
+            print("other threads are running, so a worker process can't be forked safely: switching the streamer to the thread backend")
+            self._free_shms()
+            self.backend = "thread"
+        self.start_worker()
+
     def stop_readout(self):
         """
         Signal the readout loop to break.
@@ -80,6 +315,136 @@ class DataStreamer():
         """
         return not self.data_queue.empty()
 
+    def set_buffers(self, total_shots, reads_per_count, out=None):
+        """
+        Set up the destination arrays for a readout.
+
+        :param total_shots: Number of shots expected
+        :type total_shots: int
+        :param reads_per_count: Number of data points to expect per counter increment
+        :type reads_per_count: list of int
+        :param out: Arrays to write the data into, one per channel; each must be a C-contiguous int64 array with room for total_shots*reads_per_count (I, Q) pairs.
+            If None, or if using the process backend (where the worker can't write into the caller's arrays), the streamer uses its own arrays.
+        :type out: list of numpy.ndarray
+        :return: destination arrays viewed as (-1, 2), or for the process backend, the names and shapes of the shared-memory slabs
+        :rtype: list
+        """
+        if out is None or self.backend == "process":
+            shapes = [(total_shots*nreads, 2) for nreads in reads_per_count]
+            # with the thread backend, poll_data() hands out views into these arrays, which the caller may keep, so each readout gets new ones
+            if self.backend == "thread" or [b.shape for b in self._own_bufs] != shapes:
+                self._alloc_buffers(shapes)
+            bufs = self._own_bufs
+        else:
+            bufs = []
+            for buf, nreads in zip(out, reads_per_count):
+                if buf.dtype != np.int64 or not buf.flags['C_CONTIGUOUS'] or buf.size < total_shots*nreads*2:
+                    raise RuntimeError("streamer output arrays must be C-contiguous int64 arrays with room for all the data")
+                bufs.append(buf.reshape((-1, 2)))
+        self.data_bufs = bufs
+        self.reads_per_count = reads_per_count
+        if self.backend == "process":
+            return [(shm.name, buf.shape) for shm, buf in zip(self._shms, bufs)]
+        return bufs
+
+    def _alloc_buffers(self, shapes):
+        """
+        Allocate the streamer's own destination arrays, in shared memory if using the process backend.
+
+        :param shapes: Array shapes, one per channel
+        :type shapes: list of tuple
+        """
+        if self.backend == "process":
+            # the worker will drop the old slabs when it gets a job with new slabs
+            self._free_shms()
+            # zero-size shared memory isn't allowed
+            self._shms = [shared_memory.SharedMemory(create=True, size=max(8, int(np.prod(shape))*8)) for shape in shapes]
+            self._own_bufs = [np.ndarray(shape, dtype=np.int64, buffer=shm.buf) for shm, shape in zip(self._shms, shapes)]
+        else:
+            self._own_bufs = [np.empty(shape, dtype=np.int64) for shape in shapes]
+
+    def _free_shms(self):
+        """
+        Release the shared-memory slabs allocated by the main process.
+        """
+        # drop every array that points into the slabs before unmapping them, since touching one afterwards would crash the interpreter
+        # (get_chunk() hands out copies, so the streamer holds the only such arrays)
+        self._own_bufs = []
+        self.data_bufs = None
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms = []
+
+    def _attach_buffers(self, bufspecs):
+        """
+        Called by the worker to get the destination arrays for a job.
+        For the thread backend this does nothing.
+        For the process backend, this attaches to the shared-memory slabs allocated by the main process.
+
+        :param bufspecs: return value of set_buffers()
+        :type bufspecs: list
+        :return: destination arrays
+        :rtype: list of numpy.ndarray
+        """
+        if self.backend != "process":
+            return bufspecs
+        names = [name for name, shape in bufspecs]
+        # drop the slabs from previous jobs
+        for name in list(self._attached):
+            if name not in names:
+                self._attached.pop(name).close()
+        bufs = []
+        for name, shape in bufspecs:
+            if name not in self._attached:
+                shm = shared_memory.SharedMemory(name=name)
+                # the main process owns the slab; stop our resource tracker from unlinking it when this process exits
+                resource_tracker.unregister(shm._name, 'shared_memory')
+                self._attached[name] = shm
+            bufs.append(np.ndarray(shape, dtype=np.int64, buffer=self._attached[name].buf))
+        return bufs
+
+    def get_chunk(self, newshots, first_shot):
+        """
+        Get the data for a chunk published by the worker.
+
+        :param newshots: Number of shots in the chunk
+        :type newshots: int
+        :param first_shot: Index of the first shot in the chunk
+        :type first_shot: int
+        :return: views into the destination arrays (copies, for the process backend), one per channel
+        :rtype: list of numpy.ndarray
+        """
+        chunks = [buf[first_shot*nreads:(first_shot+newshots)*nreads] for buf, nreads in zip(self.data_bufs, self.reads_per_count)]
+        if self.backend == "process":
+            # the slabs get overwritten by the next readout and unmapped when they are replaced (see _free_shms()), so views must not escape
+            chunks = [chunk.copy() for chunk in chunks]
+        return chunks
+
+    def _read_channels(self, iChs, ch_list, reads_per_count, data_bufs, last_shots, newshots):
+        """
+        Transfer a chunk of data for a group of channels, one channel at a time.
+
+        :param iChs: Indices (in ch_list) of the channels to read
+        :type iChs: list of int
+        :param ch_list: List of readout channels
+        :type ch_list: list of int
+        :param reads_per_count: Number of data points to expect per counter increment
+        :type reads_per_count: list of int
+        :param data_bufs: Destination arrays
+        :type data_bufs: list of numpy.ndarray
+        :param last_shots: Index of the first shot in the chunk
+        :type last_shots: int
+        :param newshots: Number of shots in the chunk
+        :type newshots: int
+        """
+        for iCh in iChs:
+            ch = ch_list[iCh]
+            newpoints = newshots*reads_per_count[iCh]
+            addr = last_shots * reads_per_count[iCh] % self.soc['readouts'][ch]['avg_maxlen']
+            first = last_shots * reads_per_count[iCh]
+            self.soc.get_accumulated(ch=ch, address=addr, length=newpoints, out=data_bufs[iCh][first:first+newpoints])
+
     def _run_readout(self):
         """
         Worker thread for the streaming readout
@@ -94,25 +459,42 @@ class DataStreamer():
         :type reads_per_count: list of int
         """
         while True:
+            pool = None
             try:
                 # wait for a job
-                total_shots, counter_addr, ch_list, reads_per_count, stride = self.job_queue.get(block=True)
+                total_shots, counter_addr, ch_list, reads_per_count, stride, data_bufs, external_trigger = self.job_queue.get(block=True)
+                data_bufs = self._attach_buffers(data_bufs)
+                # a worker process has its own copy of the QickSoc, which needs to know the start source
+                self.soc.external_trigger = external_trigger
                 #print("streamer loop: start", total_count)
 
                 shots = 0
                 last_shots = 0
 
+                # how many shots will fit in each buffer?
+                max_shots = min([self.soc['readouts'][ch]['avg_maxlen']/reads_per_count[i] for i, ch in enumerate(ch_list)])
                 # how many shots worth of data to transfer at a time
-                if stride is None:
-                    # how many shots will fit in each buffer?
-                    shots = [self.soc['readouts'][ch]['avg_maxlen']/reads_per_count[i] for i, ch in enumerate(ch_list)]
-                    # take 10% of the smallest buffer, but stride must always be at least 1
-                    stride = max(1, int(0.1 * min(shots)))
                 # bigger stride is more efficient, but the transfer size must never exceed AVG_MAX_LENGTH, so the stride should be set with some safety margin
+                if stride is None:
+                    # tune the stride as we go, based on the measured shot rate and transfer time
+                    controller = StrideController(max_shots)
+                    stride = controller.stride
+                else:
+                    controller = None
+
+                # group the channels by the DMA that reads them out
+                # channels sharing a DMA (and the switch in front of it) must be read one after another, but different DMAs can run in parallel
+                dma_groups = defaultdict(list)
+                for iCh, ch in enumerate(ch_list):
+                    dma_groups[self.soc['readouts'][ch]['avg_dma']].append(iCh)
+                dma_groups = list(dma_groups.values())
+                if len(dma_groups) > 1:
+                    pool = ThreadPoolExecutor(max_workers=len(dma_groups))
 
                 stats = []
 
                 t_start = time.time()
+                t_last = t_start
 
                 # if the tproc is configured for internal start, this will start the program
                 # for external start, the program will not start until a start pulse is received
@@ -126,28 +508,51 @@ class DataStreamer():
                     shots = self.soc.get_tproc_counter(addr=counter_addr)
                     # wait until either you've gotten a full stride of measurements or you've finished (so you don't go crazy trying to download every measurement)
                     if shots >= min(last_shots+stride, total_shots):
+                        t_poll = time.time()
                         newshots = shots-last_shots
-                        # buffer for each channel
-                        acc_buf = [None for nreads in reads_per_count]
 
-                        # for each adc channel get the single shot data and add it to the buffer
                         for iCh, ch in enumerate(ch_list):
                             newpoints = newshots*reads_per_count[iCh]
-                            avg_maxlen = self.soc['readouts'][0]['avg_maxlen']
+                            avg_maxlen = self.soc['readouts'][ch]['avg_maxlen']
                             if newpoints >= avg_maxlen:
                                 raise RuntimeError("Overflowed the averages buffer (%d unread samples >= buffer size %d)."
                                                    % (newpoints, avg_maxlen) +
                                                    "\nYou need to slow down the tProc by increasing relax_delay." +
                                                    "\nIf the TQDM progress bar is enabled, disabling it may help.")
 
-                            addr = last_shots * reads_per_count[iCh] % avg_maxlen
-                            data = self.soc.get_accumulated(ch=ch, address=addr, length=newpoints)
-                            acc_buf[iCh] = data
+                        # for each adc channel get the single shot data and write it to the destination array
+                        if pool is None:
+                            for group in dma_groups:
+                                self._read_channels(group, ch_list, reads_per_count, data_bufs, last_shots, newshots)
+                        else:
+                            futures = [pool.submit(self._read_channels, group, ch_list, reads_per_count, data_bufs, last_shots, newshots) for group in dma_groups]
+                            # result() re-raises any exception from the transfer
+                            for future in futures:
+                                future.result()
+                        addr = last_shots * reads_per_count[-1] % self.soc['readouts'][ch_list[-1]]['avg_maxlen']
 
-                        last_shots += newshots
+                        t_done = time.time()
+                        # how far did the tProc get while we were reading?
+                        unread = self.soc.get_tproc_counter(addr=counter_addr) - last_shots
+                        # how close did we come to overwriting unread data?
+                        headroom = min([self.soc['readouts'][ch]['avg_maxlen'] - unread*reads_per_count[iCh] for iCh, ch in enumerate(ch_list)])
+                        if controller is not None:
+                            rate = newshots/max(t_poll-t_last, 1e-6)
+                            stride = controller.update(rate, newshots, unread, t_done-t_poll)
+                        t_last = t_poll
 
-                        stats = (time.time()-t_start, shots, addr, newshots)
-                        self.data_queue.put((newshots, (acc_buf, stats)))
+                        t_publish = time.time()
+                        # each accumulated sample is 8 bytes (32-bit I and Q)
+                        stats = StreamerStats(t_publish-t_start, shots, addr, newshots, stride,
+                                              t_dma=t_done-t_poll,
+                                              nbytes=8*newshots*sum(reads_per_count),
+                                              headroom=headroom,
+                                              queue_depth=self.data_queue.qsize(),
+                                              t_publish=t_publish)
+                        # only publish the write cursor, the data is already in place
+                        self.data_queue.put((newshots, (last_shots, stats)))
+
+                        last_shots += newshots
                 #if last_count==total_count: print("streamer loop: normal completion")
 
             except Exception as e:
@@ -158,7 +563,12 @@ class DataStreamer():
                 # put dummy data in the data queue, to trigger a poll_data read
                 self.data_queue.put((0, (None, None)))
             finally:
-                # we should set the done flag regardless of whether we completed readout, used the stop flag, or errored out
-                self.done_flag.set()
-                # set tproc for internal start so we don't run the program repeatedly (this also clears the internal-start register)
-                self.soc.start_src("internal")
+                if pool is not None:
+                    pool.shutdown()
+                try:
+                    # set tproc for internal start so we don't run the program repeatedly (this also clears the internal-start register)
+                    self.soc.start_src("internal")
+                finally:
+                    # we should set the done flag regardless of whether we completed readout, used the stop flag, or errored out
+                    # it's set after the start source is reset, so the main process can rely on the reset having happened (see QickSoc._sync_start_src())
+                    self.done_flag.set()
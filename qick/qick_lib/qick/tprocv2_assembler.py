@@ -228,17 +228,44 @@ regex = {
 
 import re
 import logging
+from functools import lru_cache
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
-def find_pattern(regex : str, text : str):
-    match = re.search(regex, text)
+# Precompiled patterns: every line and operand goes through these.
+regex_c     = {key: re.compile(val) for key, val in regex.items()}
+Param_RegEx = {key: re.compile(val['RegEx']) for key, val in Param_List.items()}
+SRC_RE      = re.compile(r's(\d+)|r(\d+)|w(\d+)|#([ubh0-9A-F\-]+)') #S,R,W,Signed, Unsigned, Binary, Hexa
+NUM_RE      = re.compile(r'^(\d+)')
+LIT_RE      = re.compile(r'#(-?\d+)|#u(\d+)|#b(\d+)|#h([0-9A-F]+)|&(\d+)|@(-?\d+)')
+REG_RE      = re.compile(r's(\d+)|r(\d+)|w(\d+)')
+DST_RE      = re.compile(r'^s(\d+)|^r(\d+)|^w(\d+)|(r_wave)')
+MEM_ADDR_RE = re.compile(r's(\d+)|r(\d+)|&(\d+)|\s*([A-Z]{3}|[A-Z]{2}|\+|\-)')
+BRANCH_RE   = re.compile(r'&(\d+)|s(\d+)')
+ADDR_RE     = re.compile(r'&(\d+)')
+DREG_RE     = re.compile(r'r(\d+)')
+OP_BIN_RE   = re.compile(r'#b(\d+)')
+WORDS_RE    = re.compile(r' |\(|\)|\[|\]')
+INSIDE_RE   = re.compile(r'\s*([\w]+)')
+
+# Size of the memo caches for operand parsing, keyed by operand string.
+OPERAND_CACHE_SIZE = 4096
+# Size of the memo cache for encoded instructions, keyed by command (see EncodingCache).
+ENCODING_CACHE_SIZE = 16384
+
+def find_pattern(regex, text : str):
+    """
+    :regex (str or re.Pattern): pattern to search for
+    :returns (str): the first match, or None
+    """
+    match = regex.search(text) if isinstance(regex, re.Pattern) else re.search(regex, text)
     match = match.group() if (match) else None
     return match
 
 def check_name(name_str : str) -> bool:
     # Check for correct Characters
-    name_check = re.findall(regex['NAME'], name_str)
+    name_check = regex_c['NAME'].findall(name_str)
     if not name_check:
         raise RuntimeError('CHECK_NAME, Name Error: ' + name_str)
     name_check = name_check[0]
@@ -249,14 +276,15 @@ def check_name(name_str : str) -> bool:
         raise RuntimeError('CHECK_NAME, Name can not be a Register name: ' + name_str)
     return True
 
-def integer2bin(strin : str, bits : int = 8, uint : int = 0) -> str:
+def int2field(dec : int, bits : int = 8, uint : int = 0) -> int:
     """
-        receives an integer in str format and returns their bits as a string.
-        
-    :strin (str): string with an integer
-    :bits (int): number of bits to return
-    :uint (int): is unsigned 
-    :returns (str): bits as a string
+        checks that an integer fits in a bit field and returns the field value.
+        negative numbers are returned in two's complement.
+
+    :dec (int or str): integer (a str is parsed as base 10)
+    :bits (int): width of the field
+    :uint (int): is unsigned
+    :returns (int): field value (0 <= value < 2**bits)
     """
     if (uint == 0):
         minv = -2**(bits-1)
@@ -264,7 +292,7 @@ def integer2bin(strin : str, bits : int = 8, uint : int = 0) -> str:
     else:
         minv = 0
         maxv = 2**(bits) - 1
-    dec = int(strin, 10)
+    dec = int(dec, 10) if isinstance(dec, str) else dec
     # Check max.
     if dec < minv:
         raise RuntimeError("integer2bin: number %d is smaller than %d" % (dec, minv))
@@ -274,17 +302,99 @@ def integer2bin(strin : str, bits : int = 8, uint : int = 0) -> str:
     # Check if number is negative.
     if dec < 0:
         dec = dec + 2**bits
+    return dec
+
+def integer2bin(strin : str, bits : int = 8, uint : int = 0) -> str:
+    """
+        receives an integer in str format and returns their bits as a string.
+        
+    :strin (str): string with an integer
+    :bits (int): number of bits to return
+    :uint (int): is unsigned 
+    :returns (str): bits as a string
+    """
     # Convert to binary.
     fmt = "{0:0" + str(bits) + "b}"
-    binv = fmt.format(dec)
+    binv = fmt.format(int2field(strin, bits, uint))
     return binv
 
+# Instruction word layout (72 bits), MSB first: (field, width)
+INST_FIELDS = (('HDR', 3), ('AI', 1), ('DF', 2), ('COND', 3), ('CFG', 7), ('ADDR', 17), ('DATA', 32), ('RD', 7))
+
+def pack_inst(hdr : int, ai : int, df : int, cond : int, cfg : int, addr : int, data : int, rd : int) -> int:
+    """
+        packs the fields of one instruction into a 72-bit integer (see INST_FIELDS).
+        fields are assumed to be already range-checked.
+    """
+    return (hdr<<69) | (ai<<68) | (df<<66) | (cond<<63) | (cfg<<56) | (addr<<39) | (data<<7) | rd
+
+def inst2bin(code : int) -> str:
+    """
+        formats a 72-bit instruction as a string of 0s and 1s, with the fields separated by underscores.
+        this is only a debug view; the binary is generated from the integer.
+    """
+    fields = []
+    shift = 72
+    for name, width in INST_FIELDS:
+        shift -= width
+        fields.append(((code >> shift) & ((1<<width)-1), width))
+    return "{:03b}_{:01b}{:02b}__{:03b}__{:07b}___{:017b}____{:032b}__{:07b}".format(*[f[0] for f in fields])
+
+class EncodingCache():
+    """
+        memo of encoded instructions, shared between list2bin calls.
+        the key is the command after label resolution, minus the LINE field (which only shows up in error messages)
+        and the P_ADDR field (which only WAIT encodes, as its jump target),
+        so an instruction that is unchanged between two compilations is only encoded once, even if it moved in program memory.
+        when the cache is full, the oldest entries are dropped.
+    """
+    def __init__(self, maxsize : int = ENCODING_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.codes = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(command : dict):
+        """
+        :returns (tuple): hashable key for the command, or None if the command can't be cached
+        """
+        skip = ('LINE',) if command.get('CMD') == 'WAIT' else ('LINE', 'P_ADDR')
+        key = tuple(item for item in command.items() if item[0] not in skip)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key):
+        code = self.codes.get(key)
+        if code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return code
+
+    def put(self, key, code):
+        if len(self.codes) >= self.maxsize:
+            del self.codes[next(iter(self.codes))]
+        self.codes[key] = code
+
+    def clear(self):
+        self.codes.clear()
+        self.hits = 0
+        self.misses = 0
+
+# Default cache used by list2bin(use_cache=True).
+encoding_cache = EncodingCache()
+
+@lru_cache(maxsize=OPERAND_CACHE_SIZE)
 def get_src_type (src : str) -> str:
     """
     :returns (tuple): Type of Source
     """
     src_type = 'X'
-    REG = re.findall('s(\d+)|r(\d+)|w(\d+)|#([ubh0-9A-F\-]+)',src) #S,R,W,Signed, Unsigned, Binary, Hexa
+    REG = SRC_RE.findall(src)
     if not REG:
         raise RuntimeError('get_src_type: Source Data not Recognized '+src )
     #print('Register Type> ',REG, REG[0])
@@ -305,99 +415,98 @@ def get_src_type (src : str) -> str:
 
 def check_num(num_str : str) -> bool:
     r = False
-    num     = re.search('^(\d+)', num_str)
+    num     = NUM_RE.search(num_str)
     extr_num = num.group(0) if num else ''
     if (extr_num == num_str):
         r = True
     return r
 
+@lru_cache(maxsize=OPERAND_CACHE_SIZE)
 def check_lit(lit_str : str) -> bool:
     r = False
-    lit     = re.search('#(-?\d+)|#u(\d+)|#b(\d+)|#h([0-9A-F]+)|&(\d+)|@(-?\d+)', lit_str)
+    lit     = LIT_RE.search(lit_str)
     extr_lit = lit.group(0) if lit else ''
     if (extr_lit == lit_str):
         r = True
     return r
 
-def get_imm_dt (lit : str, bit_len : int, lit_val : int = 0) -> str:
-    LIT = re.findall('#(-?\d+)|#u(\d+)|#b(\d+)|#h([0-9A-F]+)|&(\d+)|@(-?\d+)',lit) #S,R,W,Signed, Unsigned, Binary, Hexa
+@lru_cache(maxsize=OPERAND_CACHE_SIZE)
+def get_imm_dt (lit : str, bit_len : int, lit_val : int = 0) -> int:
+    """
+    :returns (int): literal encoded as a field of bit_len bits, or the literal value if lit_val is set.
+    """
+    LIT = LIT_RE.findall(lit) #S,R,W,Signed, Unsigned, Binary, Hexa
     if ( not LIT or not check_lit(lit)):
         raise RuntimeError("get_imm_dt: Data Format incorrect "+ lit )
     LIT = LIT[0]
     try: 
         if (LIT[0]): ## is Signed
-            literal = str(int(LIT[0]))
-            DataImm = '_'+ integer2bin(literal, bit_len)
+            literal = int(LIT[0])
+            DataImm = int2field(literal, bit_len)
         elif (LIT[1]): ## is Unsigned
-            literal = str(int(LIT[1]))
-            DataImm = '_'+ integer2bin(literal, bit_len,1)
+            literal = int(LIT[1])
+            DataImm = int2field(literal, bit_len,1)
         elif (LIT[2]): ## is Binary
-            literal = str(int(LIT[2],2))
-            DataImm = '_'+ integer2bin(literal, bit_len,1)
+            literal = int(LIT[2],2)
+            DataImm = int2field(literal, bit_len,1)
         elif (LIT[3]): ## is Hexa
-            literal = str(int(LIT[3],16))
-            DataImm = '_'+ integer2bin(literal, bit_len,1)
+            literal = int(LIT[3],16)
+            DataImm = int2field(literal, bit_len,1)
         elif (LIT[4]): ## is Address
-            literal = str(int(LIT[4]))
-            DataImm = '_'+ integer2bin(literal, bit_len,1)
+            literal = int(LIT[4])
+            DataImm = int2field(literal, bit_len,1)
         elif (LIT[5]): ## is Time
-            literal = str(int(LIT[5]))
-            DataImm = '_'+ integer2bin(literal, bit_len)
+            literal = int(LIT[5])
+            DataImm = int2field(literal, bit_len)
         else:
             raise RuntimeError("get_imm_dt: Data Format incorrect "+ lit )
     except:
         raise RuntimeError("get_imm_dt: Data Format incorrect "+ lit )
     if (lit_val) :
-        return int(literal)
+        return literal
     else:
         return DataImm
 
+@lru_cache(maxsize=OPERAND_CACHE_SIZE)
 def check_reg(name_reg : str) -> bool:
     r = False
-    name     = re.search('s(\d+)|r(\d+)|w(\d+)', name_reg)
+    name     = REG_RE.search(name_reg)
     extr_reg = name.group(0) if name else ''
     if (extr_reg == name_reg):
         r = True
     return r
 
-def get_reg_addr (reg : str, Type : str) -> str:
+@lru_cache(maxsize=OPERAND_CACHE_SIZE)
+def get_reg_addr (reg : str, Type : str) -> int:
     """
-    :returns: register_address.
+    :returns (int): register address field.
+        7 bits for 'Dest', 8 bits for 'src_data' (register type in bits 6:5), 6 bits for 'src_addr' (dreg flag in bit 5)
     """
     if not check_reg(reg): #extr_num == name_num):
         raise RuntimeError('get_reg_addr: Register '+ reg +' Name error' )
-    REG = re.findall('s(\d+)|r(\d+)|w(\d+)', reg)[0]
-    if (Type=='Dest'):
+    REG = REG_RE.findall(reg)[0]
+    if Type in ['Dest', 'src_data']:
         if (REG[0]): ## is SREG
             if (int(REG[0]) > 15): raise RuntimeError('get_reg_addr: Register s'+ str(REG[0])+' is not a sreg (Max 15)' )
-            return '00'+integer2bin(REG[0], 5,1)
+            return (0b00<<5) | int(REG[0])
         elif (REG[1]): ## is DREG
             if (int(REG[1]) > 31): raise RuntimeError('get_reg_addr: Register d'+ str(REG[1])+' is not a dreg (Max 31)' )
-            return '01'+integer2bin(REG[1], 5,1)
+            return (0b01<<5) | int(REG[1])
         elif (REG[2]): ## is WREG
             if (int(REG[2]) > 5): raise RuntimeError('get_reg_addr: Register w'+ str(REG[2])+' is not a wreg (Max 5)' )
-            return '10'+integer2bin(REG[2], 5,1)
-    elif (Type=='src_data'):
-        if (REG[0]): ## is SREG
-            if (int(REG[0]) > 15): raise RuntimeError('get_reg_addr: Register s'+ str(REG[0])+' is not a sreg (Max 15)' )
-            return '0_00'+integer2bin(REG[0], 5,1)
-        elif (REG[1]): ## is DREG
-            if (int(REG[1]) > 31): raise RuntimeError('get_reg_addr: Register d'+ str(REG[1])+' is not a dreg (Max 31)' )
-            return '0_01'+integer2bin(REG[1], 5,1)
-        elif (REG[2]): ## is WREG
-            if (int(REG[2]) > 5): raise RuntimeError('get_reg_addr: Register w'+ str(REG[1])+' is not a wreg (Max 5)' )
-            return '0_10'+integer2bin(REG[2], 5,1)
+            return (0b10<<5) | int(REG[2])
     elif (Type=='src_addr'):
         if (REG[0]): ## is SREG
             if (int(REG[0]) > 15): raise RuntimeError('get_reg_addr: Register s'+ str(REG[0])+' is not a sreg (Max 15)' )
-            return '0'+integer2bin(REG[0], 5,1)
+            return int(REG[0])
         elif (REG[1]): ## is DREG
             if (int(REG[1]) > 31): raise RuntimeError('get_reg_addr: Register d'+ str(REG[1])+' is not a dreg (Max 31)' )
-            return '1'+integer2bin(REG[1], 5,1)
+            return (1<<5) | int(REG[1])
         elif (REG[2]): ## is WREG
             if (int(REG[2]) > 5): raise RuntimeError('get_reg_addr: Register w'+ str(REG[2])+' is not a wreg (Max 5)' )
             raise RuntimeError('get_reg_addr: Register w'+ str(REG[2])+' Can not be wreg' )
-    return 'X'
+    raise RuntimeError('get_reg_addr: Register type '+ Type +' not recognized' )
+
 
 class LFSR:
     def __init__(self):
@@ -429,21 +538,23 @@ class Assembler():
     def list2asm(program_list : list, label_dict : dict) -> str:
         """
             translates a program list to assembly.
+            the program list is not modified.
             
             :program_list (list): each element is a dictionary with all the commands and instructions.
             :label_dict (dictionary): dictionary with all labels information found. ({'P_ADDR': 0,'LINE': 0, 'ADDR': 0})
             :returns (str): assembly as a string.
         """
         
-        def process_command(command : dict, p_addr : int) -> str:
+        def process_command(command : dict, p_addr : int, label : str) -> str:
             """
                 processes one command from program list and adds adds it to the assembler string as an instruction.
                 
                 :command (dict): current instruction from program_list to add in assembler
                 :p_addr (int): program address of the command in memory. // p_addr stands for program address.
+                :label (str): label to print in place of the address, or None
                 :returns (str): returns the new line of assembler code
             """
-            logger.debug("process_command: processing %s at p_addr=%d"%(command, p_addr))
+            logger.debug("process_command: processing %s at p_addr=%d", command, p_addr)
             assembler = ""
             assembler += "RET\n" if (command['CMD']=='RET') else f"     {command['CMD']} "
             if (command['CMD'] == 'DPORT_WR') or (command['CMD']=='WPORT_WR') or (command['CMD']=='TRIG') or (command['CMD']=='DPORT_RD'):
@@ -453,7 +564,7 @@ class Assembler():
             assembler += f"{command['SRC']} "     if ('SRC'      in command) else ''
             assembler += f"{command['DATA']} "    if ('DATA'      in command) else ''
             if ('ADDR' in command):
-                if (not 'LABEL' in command):
+                if (label is None):
                     if ( f"&{p_addr-1}" == command['ADDR'] and command['CMD'] == 'JUMP'):
                         assembler += "PREV "
                     elif ( f"&{p_addr}" == command['ADDR'] and command['CMD'] == 'JUMP'):
@@ -464,7 +575,7 @@ class Assembler():
                         assembler += "SKIP "
                     else:
                         assembler += f"[{command['ADDR']}] "
-            assembler += f"{command['LABEL'] } "     if ('LABEL'    in command) else ''
+            assembler += f"{label} "     if (label is not None) else ''
             assembler += f"-if({command['IF']}) "    if ('IF'       in command) else ''
             assembler += f"-wr({command['WR']}) "    if ('WR'       in command) else ''
             assembler += f"{command['LIT']} "       if ('LIT'      in command) else ''
@@ -486,45 +597,37 @@ class Assembler():
             assembler += f"{command['R3']} "      if ('R3'       in command) else ''
             assembler += f"{command['R4']} "      if ('R4'       in command) else ''
 
-            logger.debug("process_command: generated ASM string: %s"%(assembler))
+            logger.debug("process_command: generated ASM string: %s", assembler)
             assembler += '\n'
             return assembler
     
-        assembler_code = ''
-        key_list = list(label_dict.keys())
-        val_list = list(label_dict.values())
+        # address -> label index (if two labels share an address, the first one defined is used)
+        addr_labels = {}
+        for label, addr in label_dict.items():
+            addr_labels.setdefault(addr, label)
+
+        asm_lines = []
         wait_cnt = 0
-        for ind, command in enumerate(program_list, start=1):
+        for line_number, command in enumerate(program_list):
             # CHECK FOR LABEL IN THAT MEMORY PLACE
-            address = command['P_ADDR'] if ('P_ADDR' in command) else (ind+wait_cnt) # set correct instruction address in memory.
+            address = command['P_ADDR'] if ('P_ADDR' in command) else (line_number+1+wait_cnt) # set correct instruction address in memory.
             if ( command['CMD'] == 'WAIT'):
                 wait_cnt = wait_cnt + 1
             # LABEL in the Correct Line
-            PADDR = '&' + str(address)
-            if (PADDR in val_list):
-                label = key_list[val_list.index(PADDR)]
+            label = addr_labels.get('&' + str(address))
+            if (label is not None):
                 if (label[0:2]=='F_' or label[0:2]=='S_' or label[0:2]=='T_'):
                     label = '\n' + label
-                assembler_code += label + ':\n'
+                asm_lines.append(label + ':\n')
             # CHECK FOR LABEL SOURCE
+            label = command.get('LABEL')
             if ('SRC' in command):
                 if (command['SRC'] =='label'):
-                    ADDR = command['ADDR']
-                    if (ADDR in val_list):
-                        label = key_list[val_list.index(ADDR)]
-                        #command.pop['ADDR']
-                        command['LABEL'] = label
-            assembler_code += process_command(command, address)
-
-        # ADD Address to commands with LABEL
-        for line_number, command in enumerate(program_list):
-            if ('LABEL' in command):
-                if ( command['LABEL'] in label_dict ) :
-                    command['ADDR'] = label_dict[ command['LABEL'] ]
-                else:
-                    raise RuntimeError('LABEL: Label ' + command['LABEL'] + ' not recognized')
-            command['LINE'] = line_number
-        return assembler_code
+                    label = addr_labels.get(command['ADDR'], label)
+            if (label is not None) and (label not in label_dict):
+                raise RuntimeError('LABEL: Label ' + label + ' not recognized')
+            asm_lines.append(process_command(command, address, label))
+        return ''.join(asm_lines)
     
     @staticmethod
     def file_asm2list(filename : str) -> tuple:
@@ -585,9 +688,9 @@ class Assembler():
             # Check if LABEL, DIRETIVE OR INSTRUCTION
             for line_number, command in enumerate(file_lines, start=1):
                 if (command):
-                    label        = find_pattern(regex['LABEL'], command)
-                    directive    = find_pattern(regex['DIRECTIVE'], command)
-                    instruction  = find_pattern(regex['CMD'], command)
+                    label        = find_pattern(regex_c['LABEL'], command)
+                    directive    = find_pattern(regex_c['DIRECTIVE'], command)
+                    instruction  = find_pattern(regex_c['CMD'], command)
                     if (label): # add label to label_dict if not already registered.
                         L_Name    = command[:-1]
                         if not check_name(L_Name):
@@ -694,8 +797,8 @@ class Assembler():
             mem_addr = 0
             for line_number, command in enumerate(file_lines, start=1):
                 command_info = {}
-                instruction  = find_pattern(regex['CMD'], command)
-                directive    = find_pattern(regex['DIRECTIVE'], command)
+                instruction  = find_pattern(regex_c['CMD'], command)
+                directive    = find_pattern(regex_c['DIRECTIVE'], command)
                 if ((not command) or (line_number in label_line_idxs)):
                     continue
                 elif (directive):
@@ -725,23 +828,25 @@ class Assembler():
                     command_info['P_ADDR'] = mem_addr
                     # CHECK for Literal Values
                     ###############################################################
-                    LIT      = re.findall(regex['LIT'], command)
+                    LIT      = regex_c['LIT'].findall(command)
                     if (LIT and len(LIT) == 2 and LIT[0] != LIT[1]):
                         raise RuntimeError('COMMAND_RECOGNITION: Literals not equals in Line ' + str(line_number))
 
                     # CHANGE ALIAS
                     ###############################################################
-                    cmd_words = re.split(' |\(|\)|\[|\]', command)
-                    for key in Alias_List:
-                        CHANGE = find_pattern(key, command)
-                        if (key in cmd_words):
-                            command = command.replace(CHANGE, Alias_List[key]) if CHANGE else command
+                    # aliases are names, so only words of the line can be aliases
+                    # replace them in Alias_List order, as one replacement can change the next
+                    alias_words = Alias_List.keys() & WORDS_RE.split(command)
+                    if alias_words:
+                        for key in Alias_List:
+                            if (key in alias_words):
+                                command = command.replace(key, Alias_List[key])
 
                     # Extract PARAMETERS
                     ###############################################################
                     command_info['LINE'] = line_number # Stores Line Number for ERROR Messages
                     for key in Param_List:
-                        PARAM = re.findall(Param_List[key]['RegEx'], command)
+                        PARAM = Param_RegEx[key].findall(command)
                         if PARAM:
                             if (len(PARAM) >1):
                                 raise RuntimeError('COMMAND_RECOGNITION: Duplicated Parameter ' + key +' in line '+str(line_number))
@@ -750,12 +855,11 @@ class Assembler():
                             command = command.replace(aux, '')
                     # COMMANDS PARAMETERS CHECK
                     ###############################################################
-                    CMD_DEST_SOURCE = re.findall(regex['CDS'], command)
+                    CMD_DEST_SOURCE = regex_c['CDS'].findall(command)
                     ## SINGLE PARAMETERS CHECK
                     ###########################################################
                     if ('OP' in command_info):
-                        comp_OP_PARAM = "#b(\d+)"
-                        param_op = re.findall(comp_OP_PARAM, command_info['OP'])
+                        param_op = OP_BIN_RE.findall(command_info['OP'])
                         if param_op:
                             try:
                                 str(int(param_op[0],2))
@@ -848,7 +952,7 @@ class Assembler():
 
                     # GET COMMAND DESTINATION SOURCE
                     ###############################################################
-                    CMD_DEST_SOURCE = re.findall(regex['CDS'], command)
+                    CMD_DEST_SOURCE = regex_c['CDS'].findall(command)
                     command_info['CMD'] = CMD_DEST_SOURCE[0]
                     ###############################################################################
                     ## MORE THAN ONE SOURCE
@@ -1003,117 +1107,129 @@ class Assembler():
         return (program_list, label_dict)
 
     @staticmethod
-    def list2bin(program_list : list, label_dict : dict = {}, save_unparsed_filename : str = "") -> list:
+    def list2bin(program_list : list, label_dict : dict = {}, save_unparsed_filename : str = "", debug_strings : bool = True, use_cache : bool = False) -> tuple:
         """
             translates a program list to binary form.
+            the program list is not modified: fields filled in by the assembler go in a copy of the command.
             :program_list (list): each element is a dictionary with all the commands and instructions. see ' asm2list() '
             :label_dict (dict): dictionary with label information only if program_list contains labels.
             :save_unparsed_filename (str): if not null, opens this file and saves unparsed binary ('_' not removed).
-            :returns (tuple): (binary_program_list, binary_program_array)
+            :debug_strings (bool): if False, the binary strings are not generated (and None is returned in their place).
+            :use_cache (bool): if True, look up and store the encoded instructions in the shared encoding_cache, so only new or changed instructions are encoded.
+            :returns (tuple): (binary_program_list, binary_array)
             :binary_program_list (list): each element is a string with 0s and 1s representing the binary program
-            :binary_program_array (list): each element is a list of 32-bit ints representing the binary program
+            :binary_array (numpy.ndarray): int32 array of shape (n, 8), each row is one instruction (72 bits in the first 3 words)
         """
-        def parse_lines_and_labels(program_list : list, label_dict : dict) -> None:
-            for line_number, command in enumerate(program_list, start=1):
-                if (('LABEL' in command) and (command['LABEL'] in label_dict) and 'ADDR' not in command):
-                    command['ADDR'] = label_dict[ command['LABEL'] ]
-                if not 'LINE' in command:
-                    command['LINE'] = line_number
-
         logger.debug("LIST2BIN: ##### LIST 2 BIN")
 
-        parse_lines_and_labels(program_list, label_dict)
-        
-        # first line is NOP
-        #binary_program_list = ['000_000__000__0_0_0_00_00___00000___000000__000000____0_0000000__0_0000000__0000000000000000__0000000']
-        binary_program_list = []
-        CODE = 'x'
-        for command in program_list:
-            logger.debug("list2bin: translating %s"%(command))
-            if 'CMD' not in command:
-                raise RuntimeError("COMMAND_TRANSLATION: No Command at line " + str(command['LINE']))
-            if not ('UF' in command):
-                command['UF'] = '0'
-        ###############################################################################
-            if command['CMD'] == 'NOP':
-                CODE = '000_000__000__0_0_0_00_00___00000___000000__000000____0_0000000__0_0000000__0000000000000000__0000000'
-        ###############################################################################
-            elif command['CMD'] == 'TEST':
-                command['UF'] = '1'
-                CODE = Instruction.CFG(command)
-        ###############################################################################
-            elif (command['CMD'] == 'REG_WR'):
-                CODE = Instruction.REG_WR(command)
-        ###############################################################################
-            elif command['CMD'] == 'DMEM_WR':
-                CODE = Instruction.DMEM_WR(command)
-        ###############################################################################
-            elif command['CMD'] == 'WMEM_WR':
-                CODE = Instruction.WMEM_WR(command)
-        ###############################################################################
-            elif command['CMD']=='TRIG':
-                CODE = Instruction.PORT_WR(command)
-        ###############################################################################
-            elif command['CMD'] in ['DPORT_WR', 'DPORT_RD', 'WPORT_WR']:
-                CODE = Instruction.PORT_WR(command)
-        ###############################################################################
-            elif command['CMD'] == 'JUMP':
-                CODE = Instruction.BRANCH(command, '00')
-        ###############################################################################
-            elif command['CMD'] == 'CALL':
-                CODE = Instruction.BRANCH(command, '10')
-        ###############################################################################
-            elif command['CMD'] == 'RET':
-                CODE = Instruction.BRANCH(command, '11')
-        ###############################################################################
-            elif command['CMD'] in ['TIME', 'FLAG', 'DIV']:
-                CODE = Instruction.CTRL(command)
-        ###############################################################################
-            elif command['CMD'] in ['NET', 'COM']:
-                CODE = Instruction.CTRL(command)
-        ###############################################################################
-            elif command['CMD'] in ['PA', 'PB']:
-                CODE = Instruction.CTRL(command)
-        ###############################################################################
-            elif command['CMD'] == 'ARITH':
-                CODE = Instruction.ARITH(command)
-        ###############################################################################
-            elif command['CMD'] == 'CLEAR':
-                CODE = Instruction.CLEAR(command)
-        ###############################################################################
-            elif command['CMD'] == 'WAIT':
-                CODE = Instruction.WAIT(command)
-            else:
-                raise RuntimeError("COMMAND_TRANSLATION: Command Listed but not programmed > " + command['CMD'])
-        ###################################################################################
-            length = CODE.count('0') + CODE.count('1')
-            if (length != 72):
-                if (command['CMD'] == 'WAIT'):
-                    logger.debug('COMMAND_TRANSLATION: Command Wait add one more instruction ' + str(command['LINE']) )
+        # instructions as 72-bit integers, and the command names for the debug strings
+        codes = []
+        comments = []
+        for line_number, command in enumerate(program_list, start=1):
+            # resolve labels and fill line numbers
+            derived = {}
+            if (('LABEL' in command) and ('ADDR' not in command) and (command['LABEL'] in label_dict)):
+                derived['ADDR'] = label_dict[ command['LABEL'] ]
+            if not 'LINE' in command:
+                derived['LINE'] = line_number
+            if (command.get('CMD') == 'TEST'):
+                derived['UF'] = '1'
+            if derived:
+                command = dict(command, **derived)
+            logger.debug("list2bin: translating %s", command)
+            CODE = None
+            key = None
+            if use_cache:
+                key = encoding_cache.key(command)
+                if key is not None:
+                    CODE = encoding_cache.get(key)
+            if CODE is None:
+                if 'CMD' not in command:
+                    raise RuntimeError("COMMAND_TRANSLATION: No Command at line " + str(command['LINE']))
+            ###############################################################################
+                if command['CMD'] == 'NOP':
+                    CODE = Instruction.NOP(command)
+            ###############################################################################
+                elif command['CMD'] == 'TEST':
+                    CODE = Instruction.CFG(command)
+            ###############################################################################
+                elif (command['CMD'] == 'REG_WR'):
+                    CODE = Instruction.REG_WR(command)
+            ###############################################################################
+                elif command['CMD'] == 'DMEM_WR':
+                    CODE = Instruction.DMEM_WR(command)
+            ###############################################################################
+                elif command['CMD'] == 'WMEM_WR':
+                    CODE = Instruction.WMEM_WR(command)
+            ###############################################################################
+                elif command['CMD']=='TRIG':
+                    CODE = Instruction.PORT_WR(command)
+            ###############################################################################
+                elif command['CMD'] in ['DPORT_WR', 'DPORT_RD', 'WPORT_WR']:
+                    CODE = Instruction.PORT_WR(command)
+            ###############################################################################
+                elif command['CMD'] == 'JUMP':
+                    CODE = Instruction.BRANCH(command, 0b00)
+            ###############################################################################
+                elif command['CMD'] == 'CALL':
+                    CODE = Instruction.BRANCH(command, 0b10)
+            ###############################################################################
+                elif command['CMD'] == 'RET':
+                    CODE = Instruction.BRANCH(command, 0b11)
+            ###############################################################################
+                elif command['CMD'] in ['TIME', 'FLAG', 'DIV']:
+                    CODE = Instruction.CTRL(command)
+            ###############################################################################
+                elif command['CMD'] in ['NET', 'COM']:
+                    CODE = Instruction.CTRL(command)
+            ###############################################################################
+                elif command['CMD'] in ['PA', 'PB']:
+                    CODE = Instruction.CTRL(command)
+            ###############################################################################
+                elif command['CMD'] == 'ARITH':
+                    CODE = Instruction.ARITH(command)
+            ###############################################################################
+                elif command['CMD'] == 'CLEAR':
+                    CODE = Instruction.CLEAR(command)
+            ###############################################################################
+                elif command['CMD'] == 'WAIT':
+                    CODE = Instruction.WAIT(command)
                 else:
-                    raise RuntimeError(f"COMMAND_TRANSLATION: {CODE}\nINSTRUCTION LENGTH > {length} at line {command['LINE']}")
+                    raise RuntimeError("COMMAND_TRANSLATION: Command Listed but not programmed > " + command['CMD'])
+                if key is not None:
+                    # WAIT encodes to two words, store them as a tuple so callers can't alter the cached entry
+                    encoding_cache.put(key, tuple(CODE) if isinstance(CODE, list) else CODE)
+        ###################################################################################
             if (command['CMD'] == 'WAIT'):
-                binary_program_list.extend(CODE)
+                logger.debug('COMMAND_TRANSLATION: Command Wait add one more instruction ' + str(command['LINE']) )
+                codes.extend(CODE)
+                comments.extend(['', ''])
             else:
-                CODE = CODE + ' //' + command['CMD']
-                binary_program_list.append(CODE)
-                
+                codes.append(CODE)
+                comments.append(' //' + command['CMD'])
+
+        # the encoders range-check every field, so this should never happen
+        for CODE in codes:
+            if (CODE >> 72):
+                raise RuntimeError(f"COMMAND_TRANSLATION: INSTRUCTION LENGTH > 72 bits: {CODE:#x}")
+
+        binary_program_list = None
+        if (debug_strings or save_unparsed_filename):
+            binary_program_list = [inst2bin(CODE) + comment for CODE, comment in zip(codes, comments)]
+
         if (save_unparsed_filename):
             with open(save_unparsed_filename, "w+") as f:
                 for line in binary_program_list:
                     f.write(f"{line}\n")
-        
-        binary_array = []
-        for line_bin in binary_program_list:
-            tmp = line_bin.replace('_', '')
-            b0 = '0b'+tmp[40:72]
-            n0 = int(b0,2)
-            b1 = '0b'+ tmp[8:40]
-            n1 = int(b1,2)
-            b2 = '0b'+tmp[:8]
-            n2 = int(b2,2)
-            binary_line = [n0, n1, n2, 0, 0, 0, 0, 0]
-            binary_array.append(binary_line)
+
+        # split each 72-bit instruction into 32-bit words: [31:0], [63:32], [71:64]
+        n = len(codes)
+        binary_array = np.zeros((n, 8), dtype=np.int32)
+        words = binary_array.view(np.uint32)
+        low = np.fromiter((CODE & 0xFFFFFFFFFFFFFFFF for CODE in codes), dtype=np.uint64, count=n)
+        words[:, 0] = low & 0xFFFFFFFF
+        words[:, 1] = low >> 32
+        words[:, 2] = np.fromiter((CODE >> 64 for CODE in codes), dtype=np.uint64, count=n)
         return binary_program_list, binary_array
 
     def file_asm2bin(filename : str, save_unparsed_filename : str = "") -> list:
@@ -1126,7 +1242,7 @@ class Assembler():
         program_list, label_dict = Assembler.file_asm2list(filename)
         if not program_list:
             raise RuntimeError("ASM2BIN: Program list with errors.")
-        binary_program_list = Assembler.list2bin(program_list, save_unparsed_filename)
+        binary_program_list = Assembler.list2bin(program_list, label_dict, save_unparsed_filename)
         if binary_program_list == []:
             binary_program_list = [[],[]]
         return binary_program_list
@@ -1141,44 +1257,45 @@ class Assembler():
         program_list, label_dict = Assembler.str_asm2list(str_asm)
         if not program_list:
             raise RuntimeError("ASM2BIN: Program list with errors.")
-        binary_program_list = Assembler.list2bin(program_list, save_unparsed_filename)
+        binary_program_list = Assembler.list2bin(program_list, label_dict, save_unparsed_filename)
         return binary_program_list
 
 ###############################################################################
 ## BASIC COMANDS
 ###############################################################################
 class Instruction():
+    """
+        encoders for the instruction types.
+        each encoder returns the instruction as a 72-bit integer (see INST_FIELDS and pack_inst).
+    """
     #PROCESSING
     @staticmethod
-    def __PROCESS_CONDITION(command : dict) -> str:
-        cond = ''
+    def __PROCESS_CONDITION(command : dict) -> int:
+        cond = 0
         if ('IF' in command ):
             if command['IF'] not in condList:
                 raise RuntimeError('Parameter.IF: Posible CONDITIONS are (' + ', '.join(list(condList.keys())) + ') in instruction ' + str(command['LINE']) )
-            cond = condList[command['IF']]
-        else: 
-            cond = '000'
+            cond = int(condList[command['IF']], 2)
         return cond
 
     @staticmethod
     def __PROCESS_WR(command : dict) -> tuple:    #### Get WR 
-        RD    = '0000000'
-        Rdi=Wr  = '0'
+        RD    = 0
+        Rdi=Wr  = 0
         if ('WR' in command ):
-            Wr = '1'
-            regex_inside_parenthesis = r'\s*([\w]+)'
-            DEST_SOURCE = re.findall(regex_inside_parenthesis, command['WR'])
+            Wr = 1
+            DEST_SOURCE = INSIDE_RE.findall(command['WR'])
             #### SOURCE
             if len(DEST_SOURCE) != 2:
                 raise RuntimeError('Parameter.WR: Write Register error <-wr(reg source) in instruction ' + str(command['LINE']) )
             if (DEST_SOURCE[1] == 'op'):
                 if 'OP' not in command :
                     raise RuntimeError('Parameter.WR: Operation < -op() > option not found in instruction ' + str(command['LINE']) )
-                Rdi    = '0'
+                Rdi    = 0
             elif (DEST_SOURCE[1] == 'imm'):
                 if 'LIT' not in command:
                     raise RuntimeError('Parameter.WR: Literal Value not found in instruction ' + str(command['LINE']) )
-                Rdi    = '1'
+                Rdi    = 1
             else:
                 raise RuntimeError('Parameter.WR: Posible Source Dest for <-wr(reg source)> are (op, imm) in instruction ' + str(command['LINE']) )
             #### DESTINATION REGISTER
@@ -1188,175 +1305,164 @@ class Instruction():
     @staticmethod
     def __PROCESS_WP (command : dict) -> tuple:
         #### WRITE PORT
-        Wp=Sp='0'
-        Dp='000000'
+        Wp=Sp=0
+        Dp=0
         if ('WP' in command ):
             #### DESTINATION PORT
             if 'PORT' not in command:
                 raise RuntimeError('Parameter.WP: Port Address not recognized < pX > ' + str(command['LINE']) )
-            Wp='1'
-            Dp = integer2bin(command['PORT'], 6)
+            Wp=1
+            Dp = int2field(command['PORT'], 6)
             if (command['WP'] == 'r_wave'):
-                Sp = '1'
+                Sp = 1
             elif (command['WP'] == 'wmem'):
-                Sp = '0'
+                Sp = 0
             else:
                 raise RuntimeError('Parameter.WP: Source Wave Port not recognized (wreg, r_wave) ' + str(command['LINE']) )
         return Wp, Sp, Dp
 
     @staticmethod        
     def __PROCESS_SOURCE (command : dict) -> tuple:
-        df = alu_op = 'X'
-        rsD0 = rsD1 = DataImm =''
+        """
+        :returns (tuple): (data, alu_op, df)
+        :data (int): 32-bit data source field, either rsD0(8) rsD1(8) imm(16), rsD0(8) imm(24) or imm(32)
+        """
+        rsD0 = rsD1 = DataImm = 0
         FULL = (command['CMD']=='REG_WR') and (command['SRC']=='op')
         if ('OP' in command):
             cmd_op        = command['OP'].split()
             if (len(cmd_op)==1 ) : # Operation is COPY REG (Add Zero)
-                #print('LEN 1')
                 src_type = get_src_type(cmd_op[0])
-                #print('src_type[0] > ', src_type )
-                df          = '01'
-                rsD1         = '0_0000000'
-                if FULL:                    alu_op  = '0000' # REG_WR rd op -op(rs)
-                else:                       alu_op  = '00'   # -wr(rd op) -op(rs)
-
+                df          = 0b01
+                alu_op      = 0   # REG_WR rd op -op(rs) or -wr(rd op) -op(rs)
                 if ('LIT' in command):      DataImm = get_imm_dt (command ['LIT'], 16)
-                else:                       DataImm = '_0000000000000000'
-
                 if src_type[0]!='R':
                     raise RuntimeError('Parameter.SRC: Operand can not be a Literal.')
-
                 rsD0 = get_reg_addr(cmd_op[0], 'src_data')
-            
+                data = (rsD0<<24) | DataImm
+
             elif (len(cmd_op)==2 ) :
-                #print('LEN 2 >',cmd_op)
                 operation = cmd_op[0]
                 src_type = get_src_type(cmd_op[1])
-                #print('src_type[1] > ', src_type)
                 if not FULL:
                     raise RuntimeError('Parameter.SRC: 1-FULL Operation Not Allowed > ' + str(command['OP']) +' in instruction ' + str(command['LINE']) )
                 if operation not in aluList_op: #ALU LIST ONE PARAMETER
                     raise RuntimeError('Parameter.SRC: Operation Not Recognized > ' + str(command['OP']) )
-                df          = '10'
-                alu_op      = aluList[operation]
-                DataImm     = '__000000000000000000000000'
+                df          = 0b10
+                alu_op      = int(aluList[operation], 2)
                 if src_type[0]!='R':
                     raise RuntimeError('Parameter.SRC: Operand can not be a Literal.')
                 rsD0    = get_reg_addr(cmd_op[1], 'src_data')
+                data    = rsD0<<24
                 ## ABS Should be on rsD1
                 if (operation == 'ABS') :
-                    df        = '01'
-                    rsD1      = rsD0
-                    rsD0      = '0_0000000'
-                    DataImm   = '_0000000000000000'
-                #if (error!=0):
-                #    raise RuntimeError('Parameter.SRC: 1-Operation Not Allowed > ' + str(command['OP']) +' in instruction ' + str(command['LINE']) )
+                    df        = 0b01
+                    data      = rsD0<<16
 
             elif (len(cmd_op)==3 ) :
-                #print('LEN 3 >',cmd_op)
                 ## CHECK FOR FIRST OPERAND (ALU_IN_A > rsD0)
                 src_type = get_src_type(cmd_op[0])
-                #print('First Operand >',src_type, cmd_op[0])
                 if src_type[0]!='R':
                     raise RuntimeError('Parameter.SRC: First Operand can not be a Literal.')
                 rsD0    = get_reg_addr(cmd_op[0], 'src_data')
                 ## CHECK FOR SECOND OPERAND (ALU_IN_B > Imm|rsD1)
                 src_type = get_src_type(cmd_op[2])
-                #print('Second Operand >',src_type, cmd_op[2])
                 if src_type[0]=='R': ## REG OP REG
-                    df             = '01'
+                    df             = 0b01
                     rsD1    = get_reg_addr(cmd_op[2], 'src_data')
                     ## Literal for Second Data Task -wr(rd imm)
                     if ('LIT' in command):
                         DataImm = get_imm_dt (command['LIT'], 16)
-                    else:
-                        DataImm = '_0000000000000000'
-                elif src_type[0]=='N': ## is Number
+                    data = (rsD0<<24) | (rsD1<<16) | DataImm
+                else: ## is Number
                     DataImm = get_imm_dt (cmd_op[2], 24)
-                    #if (error):
-                    #    raise RuntimeError('Parameter.SRC: Literal Value error in instruction ' + str(command['LINE']) )
                     if cmd_op[1] in ['SR', 'SL', 'ASR']:
                         lit_val = get_imm_dt (cmd_op[2], 24, 1)
                         if (lit_val > 15):
                             raise RuntimeError('Parameter.SRC: Max Shift is 15 in instruction ' + str(command['LINE']) )
-                        #if (error):
-                        #    raise RuntimeError('Parameter.SRC: Literal Value error in instruction ' + str(command['LINE']) )
-                    df             = '10'
-                    DataImm  = '_'+DataImm
+                    df             = 0b10
+                    data = (rsD0<<24) | DataImm
 
                 ## CHECK FOR OPERATION
                 operation = cmd_op[1]
                 if (FULL):
                     if operation not in aluList:
                         raise RuntimeError('Parameter.SRC: ALU {Full List} Operation Not Recognized in instruction ' + str(command['LINE']) )
-                    alu_op      = aluList[ operation ]
+                    alu_op      = int(aluList[ operation ], 2)
                 else:
                     if operation not in aluList_s:
                         raise RuntimeError('Parameter.SRC: ALU {Reduced List} Operation Not Recognized in instruction ' + str(command['LINE']) )
-                    alu_op      = aluList_s[ operation ]
+                    alu_op      = int(aluList_s[ operation ], 2)
+            else:
+                raise RuntimeError('Parameter.SRC: Operation format not recognized > ' + str(command['OP']) +' in instruction ' + str(command['LINE']) )
         ## LITERAL and NO OP
         elif ('LIT' in command): 
-            df = '11'
-            alu_op  = '00'
-            DataImm = '__'+get_imm_dt (command['LIT'], 32)
+            df = 0b11
+            alu_op  = 0
+            data = get_imm_dt (command['LIT'], 32)
         else:
-            df      = '11'
-            alu_op  = '00'
-            DataImm = '___00000000000000000000000000000000'
-
-        #if (error):
-        #    raise RuntimeError('Parameter.SRC: Error in line ' + str(command['LINE']) )
-        #    return error, 'X', 'X', 'X'
-        Data_Source = rsD0 +'__'+ rsD1 +'_'+ DataImm
-        return Data_Source, alu_op, df
+            df      = 0b11
+            alu_op  = 0
+            data    = 0
+        return data, alu_op, df
 
     @staticmethod
+    @lru_cache(maxsize=OPERAND_CACHE_SIZE)
     def __PROCESS_MEM_ADDR (ADDR_CMD : str) -> tuple:
-        AI = '0'
-        rsA0 = rsA1 = 'x'
-        comp_ADDR_FMT = "s(\d+)|r(\d+)|&(\d+)|\s*([A-Z]{3}|[A-Z]{2}|\+|\-)"
-        param_op  = re.findall(comp_ADDR_FMT, ADDR_CMD)
+        """
+        :returns (tuple): (rsA0, rsA1, AI)
+        :rsA0 (int): 11-bit field, register address or literal
+        :rsA1 (int): 6-bit field, register address
+        """
+        AI = 0
+        rsA0 = rsA1 = None
+        param_op  = MEM_ADDR_RE.findall(ADDR_CMD)
         if (len(param_op)==1 ) :
             ## CHECK FOR OPERAND
-            rsA1     = '000000' # Register ZERO
+            rsA1     = 0 # Register ZERO
             if (param_op[0][0]): ## is SREG
-                rsA0     = '00000___0' + integer2bin(param_op[0][0], 5)     
+                rsA0     = int2field(param_op[0][0], 5)
             elif (param_op[0][1]): ## is DREG
-                rsA0     = '00000___1' + integer2bin(param_op[0][1], 5)     
+                rsA0     = (1<<5) | int2field(param_op[0][1], 5)
             elif (param_op[0][2]): ## is Literal
-                rsA0     = '___'+ integer2bin(param_op[0][2], 11)
-                AI = '1'
+                rsA0     = int2field(param_op[0][2], 11)
+                AI = 1
             else:
                 raise RuntimeError('Parameter.MEM_ADDR: First Operand not recognized.')
         elif (len(param_op)==3 ) :
             ## CHECK FOR FIRST OPERAND
             if (param_op[0][0]): ## is SREG
-                rsA1     = '0'+integer2bin(param_op[0][0], 5)
+                rsA1     = int2field(param_op[0][0], 5)
             elif (param_op[0][1]): ## is DREG
-                rsA1     = '1' + integer2bin(param_op[0][1], 5)
+                rsA1     = (1<<5) | int2field(param_op[0][1], 5)
             elif (param_op[0][2]): ## is Literal
                 raise RuntimeError('Parameter.MEM_ADDR: First Operand can not be a Literal.')
             ## CHECK FOR SECOND OPERAND
             if (param_op[2][0]): ## is SREG
-                rsA0     = '00000___0' + integer2bin(param_op[2][0], 5)
+                rsA0     = int2field(param_op[2][0], 5)
             elif (param_op[2][1]): ## is DREG
-                rsA0     = '00000___1' + integer2bin(param_op[2][1], 5)
+                rsA0     = (1<<5) | int2field(param_op[2][1], 5)
             elif (param_op[2][2]): ## is Literal
-                rsA0     = '___'+ integer2bin(param_op[2][2], 11)
-                AI = '1'
+                rsA0     = int2field(param_op[2][2], 11)
+                AI = 1
             ## CHECK FOR PLUS
             if param_op[1][3] != '+': ## is R_Reg
                 raise RuntimeError('Parameter.MEM_ADDR: Address Operand should be < + >.')
-        else:
+        if rsA0 is None or rsA1 is None:
             raise RuntimeError('Parameter.MEM_ADDR: Address format error, should be Data Register(r) or Literal(&): '+ADDR_CMD)
         return rsA0, rsA1, AI
 
 
     #INSTRUCTIONS
     @staticmethod
-    def REG_WR (current : dict) -> str:
-        AI = '0'
-        RdP = '000000'
+    def NOP (current : dict) -> int:
+        return 0
+
+    @staticmethod
+    def REG_WR (current : dict) -> int:
+        AI = 0
+        RdP = 0
+        UF = int(current.get('UF', '0'))
         ######### CONDITIONAL
         COND = Instruction.__PROCESS_CONDITION(current)
         ######### SOURCES
@@ -1365,62 +1471,54 @@ class Instruction():
             if 'OP' not in current:
                 raise RuntimeError('Instruction.REG_WR: No < -op() > for Operation Writting in instruction ' + str(current['LINE']))
             DATA, alu_op, DF = Instruction.__PROCESS_SOURCE (current)
-            CFG   = '00__' + current ['UF'] + '__'+ alu_op
-            ADDR  = '___00000000000__000000' # 17 Bits 11 + 6
+            CFG   = (0b00<<5) | (UF<<4) | alu_op
+            ADDR  = 0
         #### SOURCE IMM
         elif (current ['SRC'] == 'imm'):
             #### Get Data Source
             if 'LIT' not in current:
                 raise RuntimeError('Instruction.REG_WR: No Literal value for immediate Assignation (#) in instruction ' + str(current['LINE']) )
             DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
-            CFG = '11__' + current ['UF'] + '_00_' + alu_op
-            ADDR  = '___00000000000__000000' # 17 Bits 11 + 6
+            CFG = (0b11<<5) | (UF<<4) | alu_op
+            ADDR  = 0
         #### SOURCE LABEL
         elif (current ['SRC'] == 'label'):
             #### Get Data Source
             if 'ADDR' not in current:
                 raise RuntimeError('Instruction.REG_WR: Address error in line ' + str(current['LINE']) )
-            comp_addr = "&(\d+)"
-            address = re.findall(comp_addr, current['ADDR'])
-            current['LIT'] = current['ADDR']
+            address = ADDR_RE.findall(current['ADDR'])
             if not address[0]: # LITERAL
                 raise RuntimeError('Instruction.REG_WR: Address error in line ' + str(current['LINE']) )
-            DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
-            ADDR  = '___00000000000__000000' # 17 Bits 11 + 6
-            CFG = '11__' + current ['UF'] + '_00_00'
+            DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(dict(current, LIT=current['ADDR']))
+            ADDR  = 0
+            CFG = (0b11<<5) | (UF<<4)
         #### SOURCE DATA MEMORY
         elif (current ['SRC'] == 'dmem'):
             #### Get Data Source
             DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
-            CFG = '01__' + current ['UF'] + '_00_' + alu_op
             #### Get ADDRESS
             if 'ADDR' not in current:
                 raise RuntimeError('Instruction.REG_WR: No Address for dmem in line ' + str(current['LINE']) )
             rsA0, rsA1, AI = Instruction.__PROCESS_MEM_ADDR (current ['ADDR'])
-            ADDR  = rsA0 + '__' + rsA1
-            CFG = '01__' + current ['UF'] + '_00_'+alu_op
+            ADDR  = (rsA0<<6) | rsA1
+            CFG = (0b01<<5) | (UF<<4) | alu_op
         #### SOURCE WAVE MEM
         elif (current ['SRC'] == 'wmem'):
-                if (COND != '000'):
+                if (COND != 0):
                     raise RuntimeError('Instruction.REG_WR: Wave Register Write is not conditional < -if() >  in instruction ' + str(current['LINE']) )
-                WW = WP = '0'
-                if ('WW' in current):
-                    WW = '1'
+                WW = 1 if ('WW' in current) else 0
                 #### WRITE PORT
                 WP, Sp, RdP = Instruction.__PROCESS_WP(current)
-                COND = WW + Sp + WP
-                #### WRITE REGISTER
-                Wr = Rdi = '0'
-                Wr, Rdi, RD = Instruction.__PROCESS_WR(current)
+                COND = (WW<<2) | (Sp<<1) | WP
                 #### Get Data Source
                 DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
                 #### Get ADDRESS
                 if 'ADDR' not in current:
                     raise RuntimeError('Instruction.REG_WR: No addres for <wmem> source in instruction ' + str(current['LINE']) )
                 rsA0, rsA1, AI = Instruction.__PROCESS_MEM_ADDR (current ['ADDR'])
-                if rsA1 != '000000':
+                if rsA1 != 0:
                     raise RuntimeError('Instruction.REG_WR: Wave Memory Addres Error Source Should be LIT or Reg in instruction ' + str(current['LINE']) )
-                ADDR  = rsA0 + '__' + RdP
+                ADDR  = (rsA0<<6) | RdP
         else:
             raise RuntimeError('Instruction.REG_WR: Posible REG_WR sources are (op, imm, dmem, wmem, label ) in instruction ' + str(current['LINE']) )
 
@@ -1428,264 +1526,234 @@ class Instruction():
         if (current ['SRC'] == 'wmem'):
             if current ['DST'] == 'w0':
                 raise RuntimeError('Instruction.REG_WR: Wave Memory Source Should have a Wave Register <r_wave> Destination ' + str(current['LINE']) )
-            Wr = Rdi = '0'
             Wr, Rdi, RD = Instruction.__PROCESS_WR(current)
-            CFG = '10__' + current ['UF'] +'_'+ Wr + Rdi +'_'+ alu_op
-        elif ( (current ['SRC'] == 'label') and () ):
-            if (RD!='15'):
-                logger.warning('Instruction.REG_WR: Register used to BRANCH should be s15 in instruction ' + str(current['LINE']) )
+            CFG = (0b10<<5) | (UF<<4) | (Wr<<3) | (Rdi<<2) | alu_op
         else:
-            comp_OP_PARAM = "^s(\d+)|^r(\d+)|^w(\d+)|(r_wave)"
-            RD    = re.findall(comp_OP_PARAM, current ['DST'])
+            RD    = DST_RE.findall(current ['DST'])
             if not RD:
                 raise RuntimeError('Instruction.REG_WR: Destination Register '+current ['DST']+' not Recognized in instruction ' + str(current['LINE']) )
             RD = get_reg_addr (current ['DST'], 'Dest')
-        return '100_' + AI + DF +'__'+ COND +'__'+ CFG +'___'+ADDR+'____'+DATA + '__' + RD
+        return pack_inst(0b100, AI, DF, COND, CFG, ADDR, DATA, RD)
     
     @staticmethod
-    def DMEM_WR (current : dict) -> str:
+    def DMEM_WR (current : dict) -> int:
         #### CONDITIONAL
         COND = Instruction.__PROCESS_CONDITION(current)
         #### WRITE REGISTER
-        Wr = Rdi = '0'
         Wr, Rdi, RD = Instruction.__PROCESS_WR(current)
         #### DATA SOURCE
         DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
         #### ADDRESS
         rsA0, rsA1, AI = Instruction.__PROCESS_MEM_ADDR (current['DST'])
-        ADDR  = rsA0 + '__' + rsA1
+        ADDR  = (rsA0<<6) | rsA1
         #### SOURCE    
         if (current ['SRC'] == 'op'):
             if 'OP' not in current:
                 raise RuntimeError('Instruction.MEM_WR: >  -op() option not found in instruction ' + str(current['LINE']) )
-            DI = '0'
+            DI = 0
         elif (current ['SRC'] == 'imm'):
             if 'LIT' not in current:
                 raise RuntimeError('Instruction.MEM_WR: No Literal value found in instruction ' + str(current['LINE']) )
-            DI = '1'
+            DI = 1
         else:
             raise RuntimeError('Instruction.MEM_WR: Posible MEM_WR sources are (op, imm) in instruction ' + str(current['LINE']) )
-        CFG = current['UF']+ '_'+Wr+Rdi+'_'+ alu_op
-        return '101_'+AI+DF+'__'+COND+'__0_'+DI+'_'+CFG+"___"+ADDR+'____'+DATA+'__'+RD
+        CFG = (DI<<5) | (int(current.get('UF', '0'))<<4) | (Wr<<3) | (Rdi<<2) | alu_op
+        return pack_inst(0b101, AI, DF, COND, CFG, ADDR, DATA, RD)
         
     @staticmethod
-    def WMEM_WR (current : dict) -> str:
-        AI=Wp=TI='0'
+    def WMEM_WR (current : dict) -> int:
+        TI = 0
         #### WMEM ADDRESS
         if 'DST' not in current:
             raise RuntimeError('Instruction.WMEM_WR: No address specified in line ' + str(current['LINE']) )
         rsA0, rsA1, AI = Instruction.__PROCESS_MEM_ADDR (current['DST'])
-        if rsA1 != '000000':
+        if rsA1 != 0:
             raise RuntimeError('Instruction.REG_WR: Wave Memory Addres Error Source Should be LIT or Reg in line ' + str(current['LINE']) )
         #### WRITE REGISTER
-        Wr = Rdi = '0'
         Wr, Rdi, RD = Instruction.__PROCESS_WR(current)
         #### WRITE PORT
         Wp, Sp, Dp = Instruction.__PROCESS_WP(current)
         #### DATA SOURCE
         DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
-        #if error:
-        #    raise RuntimeError('Instruction.WMEM_WR: Error in line ' + str(current['LINE']) )
-        #    CODE = 'X'
         if ('TIME' in current ):
-            TI='1'
-            TIME = get_imm_dt (current ['TIME'], 32)
-            #if (error):
-            #    raise RuntimeError('Parameter.WMEM_WR: Time Value error in instruction ')
-            DATA = '_____' + TIME
-        CFG  = '1_' + TI+'_' +current['UF'] +'_'+ Wr +Rdi +'_'+ alu_op
-        return '101_'+AI+DF+'__1'+Sp+Wp+'__'+CFG+"___"+rsA0+'__'+Dp+'____'+DATA+'__'+RD
+            TI = 1
+            DATA = get_imm_dt (current ['TIME'], 32)
+        CFG  = (1<<6) | (TI<<5) | (int(current.get('UF', '0'))<<4) | (Wr<<3) | (Rdi<<2) | alu_op
+        COND = (1<<2) | (Sp<<1) | Wp
+        return pack_inst(0b101, AI, DF, COND, CFG, (rsA0<<6) | Dp, DATA, RD)
        
     @staticmethod
-    def CFG (current : dict) -> str:
-        AI=SO=TO= '0'
-        ADDR = '00000000000_000000'
+    def CFG (current : dict) -> int:
+        AI=SO=TO= 0
         #### CONDITIONAL
         COND = Instruction.__PROCESS_CONDITION(current)
         #### WRITE REGISTER
-        Wr = Rdi = '0'
         Wr, Rdi, RD = Instruction.__PROCESS_WR(current)
         #### DATA SOURCE
         DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
-        #if (error):
-        #    logger.error('Instruction.CFG: Error in line ' + str(current['LINE']) )
-        #    CODE = 'X'
-        CFG  = current['UF'] +'_'+ Wr + Rdi +'_'+ alu_op
-        return '000_'+AI+DF+'__'+COND+'__'+SO+TO+'__'+CFG+"_______"+ADDR+'____'+DATA+'__'+RD
+        CFG  = (SO<<6) | (TO<<5) | (int(current.get('UF', '0'))<<4) | (Wr<<3) | (Rdi<<2) | alu_op
+        return pack_inst(0b000, AI, DF, COND, CFG, 0, DATA, RD)
     
     @staticmethod
-    def BRANCH (current : dict, cj : str) -> str:
+    def BRANCH (current : dict, cj : int) -> int:
+        """
+        :cj (int): 0b00 for JUMP, 0b10 for CALL, 0b11 for RET
+        """
+        UF = int(current.get('UF', '0'))
         #### CONDITIONAL
         COND = Instruction.__PROCESS_CONDITION(current)
         #### WRITE REGISTER
-        Wr = Rdi = '0'
         Wr, Rdi, RD = Instruction.__PROCESS_WR(current)
         #### DATA SOURCE
         DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
         #### DESTINATION MEMORY ADDRESS
-        if (cj =='11'): # RET Instruction. ADDR came from STACK
-            current['UF'] = '0'
-            AI = '0'
-            ADDR = '_00000000000_000000'
+        if (cj == 0b11): # RET Instruction. ADDR came from STACK
+            UF = 0
+            AI = 0
+            ADDR = 0
         else:
-            comp_addr = "&(\d+)|s(\d+)"
-            addr = re.findall(comp_addr, current['ADDR'])
+            addr = BRANCH_RE.findall(current['ADDR'])
             try:
                 if (addr[0][0]): # LITERAL
-                    ADDR     = '_' + integer2bin(addr[0][0], 11, uint=1) + '_000000'
-                    AI = '1'
+                    ADDR     = int2field(addr[0][0], 11, uint=1) << 6
+                    AI = 1
                 elif (addr[0][1] == '15'): #SREG s15
-                    ADDR     = '_00000000000_000000'
-                    AI = '0'
+                    ADDR     = 0
+                    AI = 0
                 else:
                     raise RuntimeError("Instruction.BRANCH: JUMP Memory Address not recognized (imm or s15)")
             except IndexError:
                 raise RuntimeError(f"COMMAND RECOGNITION: for address at line {current['LINE']}. (possible extra [])")
-        #if (error):
-        #    raise RuntimeError("Instruction.BRANCH: Exit with Error in instruction " + str(current['LINE']) )
-        #    CODE = 'X'
-        CFG = current['UF'] +'_'+ Wr+Rdi +'_'+ alu_op
-        return '001_'+AI+DF+'__'+COND+'__'+cj+'__'+CFG+"______"+ADDR+'____'+DATA+'__'+RD
+        CFG = (cj<<5) | (UF<<4) | (Wr<<3) | (Rdi<<2) | alu_op
+        return pack_inst(0b001, AI, DF, COND, CFG, ADDR, DATA, RD)
     
     @staticmethod
-    def PORT_WR (current : dict) -> str:
+    def PORT_WR (current : dict) -> int:
+        DST = current['DST'] if ('DST' in current) else None
         ##### DATA PORTS
         if current['CMD'] in ['DPORT_WR', 'DPORT_RD', 'TRIG']:
-            SO=AI=Ww=Sp= '0'
-            rsA0 = '___00000000000'
-            #### WRITE REGISTER
-            Wr = Rdi = '0'
-            Wr, Rdi, RD = Instruction.__PROCESS_WR(current)
+            SO=AI=Ww=Sp= 0
+            rsA0 = 0
             #### PORT DESTINATION 
             #### TRIG PORT
             if (current['CMD'] == 'TRIG'):
-                Wp= '1'
-                AI=Sp = '1'
-                current['DST'] = str(int(current['DST'])+32)
+                Wp= 1
+                AI=Sp = 1
+                DST = str(int(DST)+32)
                 if (current['SRC'] == 'set'):
-                    rsA0     = '___00000000001'
+                    rsA0     = 1
                 elif (current['SRC'] == 'clr'):
-                    rsA0     = '___00000000000'
+                    rsA0     = 0
                 else:
                     raise RuntimeError('Instruction.PORT_WR: Possible options for TRIG command are (set, clr)' )
 
             #### DATA PORT
             elif (current['CMD'] == 'DPORT_WR'):
-                Wp= '1'
-                Sp= '0'
+                Wp= 1
+                Sp= 0
                 if (current ['SRC'] == 'imm'):
                     if 'DATA' not in current:
                         raise RuntimeError('Instruction.PORT_WR: No Port Data value found in line ' + str(current['LINE']) )
                     if int(current['DATA']) > 2047:
                         raise RuntimeError('Instruction.PORT_WR: Data imm should be smaller than 2047 No Port Data value found in line ' + str(current['LINE']) )
-                    AI=Sp = '1'
+                    AI=Sp = 1
                     # DATA CAMES WITHOUT #
-                    rsA0     = '___'+ integer2bin(current['DATA'], 11)
+                    rsA0     = int2field(current['DATA'], 11)
                 elif (current ['SRC'] == 'reg'):
                     if 'DATA' not in current:
                         raise RuntimeError('Instruction.PORT_WR: No Port Register found in line ' + str(current['LINE']) )
-                    AI=Sp = '0'
-                    comp_REG_FMT = "r(\d+)"
-                    param_op  = re.findall(comp_REG_FMT, current['DATA'])
+                    AI=Sp = 0
+                    param_op  = DREG_RE.findall(current['DATA'])
                     if not param_op:
                         raise RuntimeError('Instruction.PORT_WR: Register Selection Error, should be dreg in line ' + str(current['LINE']) )
-                    rsA0     = '00000___1' + integer2bin(param_op[0], 5)
+                    rsA0     = (1<<5) | int2field(param_op[0], 5)
                 else:
                     raise RuntimeError('Instruction.PORT_WR: Posible DPORT_WR sources are (imm, reg) in line ' + str(current['LINE']) )
             #### READ DATA PORT
             else:
-                TO=Wp='0'
+                Wp=0
         ##### WAVEFORM PORT
         else:
-            AI=Ww=Sp= '0'
-            SO=Wp= '1'
+            AI=Ww=Sp= 0
+            SO=Wp= 1
             #### SOURCE
             if (current['SRC'] == 'wmem'):
-                Sp = '0'
+                Sp = 0
                 if 'ADDR' not in current:
                     raise RuntimeError('Instruction.PORT_WR: No address specified for < wmem > in line ' + str(current['LINE']) )
                 rsA0, rsA1, AI = Instruction.__PROCESS_MEM_ADDR (current ['ADDR'])
-                if (rsA1 != '000000'):
+                if (rsA1 != 0):
                     raise RuntimeError('Instruction.REG_WR: Wave Memory Addres Error Source Should be LIT or Reg in line ' + str(current['LINE']) )
             elif (current['SRC'] == 'r_wave'):
-                Sp='1'
+                Sp=1
                 #### WRITE WAVE MEMORY
                 if ('WW' in current ):
                     if 'ADDR' not in current:
                         raise RuntimeError('Instruction.PORT_WR: No address specified for < -ww > in line ' + str(current['LINE']) )
-                    Ww = '1'
+                    Ww = 1
                     rsA0, rsA1, AI = Instruction.__PROCESS_MEM_ADDR (current ['ADDR'])
-                    if (rsA1 != '000000'):
+                    if (rsA1 != 0):
                         raise RuntimeError('Instruction.REG_WR: Wave Memory Addres Error Source Should be LIT or Reg in line ' + str(current['LINE']) )
                 else:
-                    Ww  = '0'
-                    rsA0 = '___00000000000'
+                    Ww  = 0
+                    rsA0 = 0
             else:
                 raise RuntimeError('Instruction.PORT_WR: Posible wave sources are (wmem, r_wave) in line ' + str(current['LINE']) )
-                DF = '11'
         #### OUT TIME
         if ('TIME' in current):
-            TO = '1'
-            DF = '11'
-            TIME = get_imm_dt (current ['TIME'], 32)
-            #if (error):
-            #    raise RuntimeError('Parameter.WMEM_WR: Time Value error in instruction ')
-            DATA = '_____' + TIME
-
-            #DATA = '______'+ integer2bin(current['TIME'], 32)
-            CFG = SO+TO+'____00000'
-            RD = '0000000'
+            TO = 1
+            DF = 0b11
+            DATA = get_imm_dt (current ['TIME'], 32)
+            CFG = (SO<<6) | (TO<<5)
+            RD = 0
             if ('WR' in current or 'OP' in current):
                 raise RuntimeError('Instruction.PORT_WR: If time specified, Not allowed SDI <-wr(), -op()> in line ' + str(current['LINE']) )
         else:
-            TO = '0'
+            TO = 0
             logger.debug('Instruction.PORT_WR: No time specified for command will use s_time in line ' + str(current['LINE']) )
             #### WRITE REGISTER
-            Wr = Rdi = '0'
             Wr, Rdi, RD = Instruction.__PROCESS_WR(current)
             #### DATA SOURCE
             DATA, alu_op, DF = Instruction.__PROCESS_SOURCE(current)
-            CFG = SO+TO+'__'+current['UF'] +'_'+Wr+Rdi +'_'+ alu_op
+            CFG = (SO<<6) | (TO<<5) | (int(current.get('UF', '0'))<<4) | (Wr<<3) | (Rdi<<2) | alu_op
         #### OUT PORT
-        if 'DST' not in current:
+        if DST is None:
             raise RuntimeError('Instruction.PORT_WR: No Destination Port in line ' + str(current['LINE']) )
-        rsA1 = integer2bin(current['DST'], 6,1)
-        #if (error):
-        #    raise RuntimeError("Instruction.PORT_WR: Exit with Error in line " + str(current['LINE']) )
-        #    CODE = 'X'
-        COND = Ww+Sp+Wp
-        ADDR  = rsA0+'__'+rsA1
-        return '110'+'_'+AI+DF+'__'+COND+'__'+CFG+ '___'+ADDR +'____'+ DATA+'__'+RD
+        rsA1 = int2field(DST, 6,1)
+        COND = (Ww<<2) | (Sp<<1) | Wp
+        ADDR  = (rsA0<<6) | rsA1
+        return pack_inst(0b110, AI, DF, COND, CFG, ADDR, DATA, RD)
     
     ################################ TO UPDATE CODE HERE. NOT LAST VERSION
     @staticmethod
-    def CTRL (current : dict) -> str:
-        Header = '010'
-        RA0=RA1='000000'
-        RD0=RD1='0_0000000'
-        ImmFill='__0000000000000000'
-        DF='01'
-        AI='0'
+    def CTRL (current : dict) -> int:
+        """
+            the 7-bit CFG field is CTRL_ADDR(3) OPERATION(4) for header 010, CTRL_ADDR(2) OPERATION(5) for header 011.
+        """
+        Header = 0b010
+        RA0=RA1=0
+        RD0=RD1=0
+        LIT = None
+        DF=0b01
+        AI=0
         #### CONDITIONAL
         COND = Instruction.__PROCESS_CONDITION(current)
         ######### TIME 
         if (current ['CMD'] == 'TIME'):
-            CTRL_ADDR      = '000'
+            CTRL_ADDR      = 0b000
             if   (current['C_OP'] == 'rst'):
-                OPERATION = '_0001'
+                OPERATION = 0b0001
             elif (current['C_OP'] == 'updt'):
-                OPERATION = '_0010'
+                OPERATION = 0b0010
             elif (current['C_OP'] == 'set_ref'):
-                OPERATION = '_0100'
+                OPERATION = 0b0100
             elif (current['C_OP'] == 'inc_ref'):
-                OPERATION = '_1000'
+                OPERATION = 0b1000
             else:
                 raise RuntimeError('Instruction.CTRL: Posible Operations for TIME command are (rst, set_ref, inc_ref)' )
             if ('LIT' in current ):
-                DF  ='11'
-                RD0 = '_'
-                RD1 = get_imm_dt (current ['LIT'], 32)
-                ImmFill='__'
+                DF  = 0b11
+                LIT = get_imm_dt (current ['LIT'], 32)
             elif ('R1' in current):
                 RD1 = get_reg_addr (current['R1'], 'src_data')
             else: 
@@ -1693,84 +1761,80 @@ class Instruction():
                     raise RuntimeError('Instruction.CTRL: No Time Data' )
         ######### FLAG
         elif (current ['CMD'] == 'FLAG'):
-            CTRL_ADDR      = '001'
+            CTRL_ADDR      = 0b001
             if   (current['C_OP'] == 'set'):
-                OPERATION = '_0001'
+                OPERATION = 0b0001
             elif (current['C_OP'] == 'clr'):
-                OPERATION = '_0010'
+                OPERATION = 0b0010
             elif (current['C_OP'] == 'inv'):
-                OPERATION = '_0100'
+                OPERATION = 0b0100
             else:
                 raise RuntimeError('Instruction.CTRL: Posible Operations for FLAG command are (set, clr, inv)' )
         ######### DIVISION
         elif (current ['CMD'] == 'DIV'):
-            CTRL_ADDR  = '011'
-            OPERATION  = '_0000'
+            CTRL_ADDR  = 0b011
+            OPERATION  = 0b0000
             RA1 = get_reg_addr (current['NUM'], 'src_addr')
             if (check_reg(current['DEN'])) : # Is Register
                 RD1 = get_reg_addr (current['DEN'], 'src_data')
             elif (check_lit(current['DEN'])) : # Is Literal Value
-                DF  ='11'
-                RD0 ='_'
-                RD1 = get_imm_dt (current ['DEN'], 32)
-                ImmFill='__'
+                DF  = 0b11
+                LIT = get_imm_dt (current ['DEN'], 32)
             else:
                 raise RuntimeError('Instruction.CTRL: DIV Denominator not recognized in line ' + str(current['LINE']) )
         ######### NET
         elif (current ['CMD'] == 'NET'):
-            Header = '011'
-            CTRL_ADDR      = '_00' # QNET ADDRESS
+            Header = 0b011
+            CTRL_ADDR      = 0b00 # QNET ADDRESS
             if   (current['C_OP'] == 'set_net'):
-                OPERATION = '00001'
+                OPERATION = 0b00001
             elif (current['C_OP'] == 'sync_net'):
-                OPERATION = '01000'
+                OPERATION = 0b01000
             elif (current['C_OP'] == 'updt_offset'):
-                OPERATION = '01001'
+                OPERATION = 0b01001
             elif (current['C_OP'] == 'set_dt'):
-                OPERATION = '01010'
+                OPERATION = 0b01010
             elif (current['C_OP'] == 'get_dt'):
-                OPERATION = '01011'
+                OPERATION = 0b01011
             elif (current['C_OP'] == 'set_flag'):
-                OPERATION = '01010'
+                OPERATION = 0b01010
             elif (current['C_OP'] == 'get_flag'):
-                OPERATION = '01011'
+                OPERATION = 0b01011
             else:
                 raise RuntimeError('Instruction.CTRL: NET Operation not recognized' )
         ######### COM
         elif (current ['CMD'] == 'COM'):
-            Header = '011'
-            CTRL_ADDR      = '_01' # QCOM ADDRESS
+            Header = 0b011
+            CTRL_ADDR      = 0b01 # QCOM ADDRESS
             if   (current['C_OP'] == 'set_flag'):
                 if (current['R1'] == '0'):
-                    OPERATION = '00000'
+                    OPERATION = 0b00000
                 elif (current['R1'] == '1'):
-                    OPERATION = '00010'
+                    OPERATION = 0b00010
                 else:
                     raise RuntimeError('Instruction.CTRL: COM flag value can be 0 or 1' )
             elif (current['C_OP'] == 'sync'):
-                OPERATION = '00110'
+                OPERATION = 0b00110
             elif (current['C_OP'] == 'reset'):
-                OPERATION = '11111'
+                OPERATION = 0b11111
             else:
                 if (current['C_OP'] == 'set_byte_1'):
-                    OPERATION = '00100'
+                    OPERATION = 0b00100
                 elif (current['C_OP'] == 'set_byte_2'):
-                    OPERATION = '00101'
+                    OPERATION = 0b00101
                 elif (current['C_OP'] == 'set_hw_1'):
-                    OPERATION = '01000'
+                    OPERATION = 0b01000
                 elif (current['C_OP'] == 'set_hw_2'):
-                    OPERATION = '01001'
+                    OPERATION = 0b01001
                 elif (current['C_OP'] == 'set_word_1'):
-                    OPERATION = '01100'
+                    OPERATION = 0b01100
                 elif (current['C_OP'] == 'set_word_2'):
-                    OPERATION = '01101'
+                    OPERATION = 0b01101
                 else:
                     raise RuntimeError('Instruction.CTRL: Possible Operations for COM command are (set_flag, set_byte, set_hw, set_word)' )
                 if ('LIT' in current ):
-                    DF='11'
-                    RD0 = ''
-                    RD1 = get_imm_dt (current ['LIT'], 32)
-                    ImmFill=''
+                    DF  = 0b11
+                    LIT = get_imm_dt (current ['LIT'], 32)
                 elif ('R1' in current):
                     RD1 = get_reg_addr (current['R1'], 'src_data')
                 else: 
@@ -1778,14 +1842,14 @@ class Instruction():
                         raise RuntimeError('Instruction.CTRL: No Time Data' )
         ######### CUSTOM Peripheral
         elif (current ['CMD'] == 'PA' or current ['CMD'] == 'PB'):
-            Header = '011'
+            Header = 0b011
             if (current ['CMD'] == 'PA'):
-                CTRL_ADDR      = '_10' # PA PERIPHERAL
+                CTRL_ADDR      = 0b10 # PA PERIPHERAL
             else:
-                CTRL_ADDR      = '_11' # PB PERIPHERAL
+                CTRL_ADDR      = 0b11 # PB PERIPHERAL
             if ( int(current['C_OP']) > 31):
                 raise RuntimeError("COMMAND_RECOGNITION: External Peripheral Operation not in range [0:31] in line " + str(current['LINE']) )
-            OPERATION = integer2bin(current['C_OP'], 5,1)
+            OPERATION = int2field(current['C_OP'], 5,1)
             if ('LIT' in current):
                 raise RuntimeError('Instruction.CTRL: No Immediate value allowed in Peripheral instruction' )
             if ('R1' in current):
@@ -1796,14 +1860,16 @@ class Instruction():
                 RA0 = get_reg_addr (current['R3'], 'src_addr')
             if ('R4' in current):
                 RA1 = get_reg_addr (current['R4'], 'src_addr')
-        #if (error):
-        #    raise RuntimeError("Instruction.CTRL: Error in instruction " + str(current['LINE']) )
-        #    CODE = 'X'
-        return Header+'_'+AI+DF+'__'+COND+'___'+CTRL_ADDR+'__'+OPERATION+'___00000___'+RA0+'__'+RA1+'____'+RD0+'__'+RD1+ImmFill+'__0000000'
+        if Header == 0b010:
+            CFG = (CTRL_ADDR<<4) | OPERATION
+        else:
+            CFG = (CTRL_ADDR<<5) | OPERATION
+        DATA = LIT if (LIT is not None) else ((RD0<<24) | (RD1<<16))
+        return pack_inst(Header, AI, DF, COND, CFG, (RA0<<6) | RA1, DATA, 0)
     
     @staticmethod
-    def ARITH (current : dict) -> str:
-        RsC=RsD='000000'
+    def ARITH (current : dict) -> int:
+        RsC=RsD=0
         #### CONDITIONAL
         COND = Instruction.__PROCESS_CONDITION(current)
         if 'LIT' in current:
@@ -1811,7 +1877,7 @@ class Instruction():
         if 'C_OP' not in current:
             raise RuntimeError('Instruction.ARITH: No ARITH Operation ' )
         if (current['C_OP'] in arithList ):
-            ARITH_OP = arithList[current['C_OP']]
+            ARITH_OP = int(arithList[current['C_OP']], 2)
         if   (current['C_OP'] == 'T'): # A*B
             if any([x not in current for x in ['R1', 'R2']]):
                 raise RuntimeError('Instruction.ARITH: Few Sources > Need Two Source Register for T operation' )
@@ -1871,14 +1937,13 @@ class Instruction():
             RsC = get_reg_addr (current['R4'], 'src_addr')
         else:
             raise RuntimeError('Instruction.ARITH: No Recognized Operation' )
-        #if (error):
-        #    raise RuntimeError("Instruction.ARITH: Exit with Error in line " + str(current['LINE']) )
-        #    CODE = 'X'
-        return '010_001__'+COND+'___010___'+ARITH_OP +'___00000___'+RsC+'__'+RsD+'____'+RsA+'__'+RsB+'__0000000000000000__0000000'
+        CFG = (0b010<<4) | ARITH_OP
+        return pack_inst(0b010, 0, 0b01, COND, CFG, (RsC<<6) | RsD, (RsA<<24) | (RsB<<16), 0)
 
     @staticmethod
-    def WAIT (current : dict) -> str:
+    def WAIT (current : dict) -> list:
         binary_multi_list = []
+        current = dict(current)
         current['ADDR'] = '&'+str(current['P_ADDR'])
         test_op   = ''
         jump_cond = ''
@@ -1908,12 +1973,13 @@ class Instruction():
         CODE = Instruction.CFG(current) ## ADD TEST INSTRUCTION
         binary_multi_list.append(CODE)
         current['IF'] = jump_cond
-        CODE = Instruction.BRANCH(current, '00') ## ADD JUMP INSTRUCTION
+        CODE = Instruction.BRANCH(current, 0b00) ## ADD JUMP INSTRUCTION
         binary_multi_list.append(CODE)
         return binary_multi_list
 
     @staticmethod
-    def CLEAR (current : dict) -> str:
+    def CLEAR (current : dict) -> int:
+        current = dict(current)
         current['CMD'] = 'REG_WR'
         current['DST'] = 's2'
         current['SRC'] = 'imm'
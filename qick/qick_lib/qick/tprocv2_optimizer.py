@@ -0,0 +1,421 @@
+"""
+Peephole optimizer for tProc v2 program lists.
+
+Works on the program list and label dict that QickProgramV2 generates (the same structures that Assembler.list2bin() takes),
+and returns new ones; the inputs are not modified.
+
+Passes:
+-Dead register writes: a REG_WR whose value is overwritten before anything can read it.
+-Redundant register writes: a REG_WR that writes the value the register already holds.
+-Time increments: consecutive "TIME inc_ref" with literal values are merged, and zero increments are removed.
+-Loop-invariant writes: a REG_WR in the body of an innermost loop whose value is the same on every iteration is moved in front of the loop.
+ The loop body may contain WAITs, which only loop on themselves.
+-Jumps to the next instruction are removed.
+
+The analysis is conservative: only r, w and s14 (s_out_time) registers are ever removed or moved,
+instructions the optimizer doesn't understand are treated as reading and writing everything,
+and labels and branches end the straight-line blocks that the register passes look at.
+If the program uses branches that can't be relocated (a register jump target), it is returned unchanged.
+"""
+
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# all available passes, in the order they are applied
+PASSES = ('dead_writes', 'redundant_writes', 'merge_time', 'hoist', 'jump_to_next')
+
+REG_TOKEN_RE = re.compile(r'\b([rsw]\d+)\b')
+PLAIN_REG_RE = re.compile(r'^(r\d+|w\d+|s14)$')
+NUM_ADDR_RE  = re.compile(r'^&(\d+)$')
+TIME_LIT_RE  = re.compile(r'^#(-?\d+)$')
+
+# the waveform registers, which REG_WR r_wave loads all at once
+W_REGS = frozenset('w%d'%(i) for i in range(6))
+# s registers whose value doesn't change unless the program writes them
+STABLE_S_REGS = frozenset(['s0', 's12', 's13', 's14'])
+# pseudo-registers for the memories, so memory reads get invalidated by memory writes
+WMEM = '@wmem'
+DMEM = '@dmem'
+
+BRANCH_CMDS = frozenset(['JUMP', 'CALL', 'RET', 'WAIT'])
+# straight-line instructions: implicit reads and writes, on top of the registers named in the fields
+IMPLICIT_READS = {
+        'NOP'      : frozenset(),
+        'TEST'     : frozenset(),
+        'TIME'     : frozenset(),
+        'REG_WR'   : frozenset(),
+        'DMEM_WR'  : frozenset(['s14']),
+        'WMEM_WR'  : W_REGS | {'s14'},
+        'WPORT_WR' : W_REGS | {'s14', WMEM},
+        'DPORT_WR' : frozenset(['s14']),
+        'TRIG'     : frozenset(['s14']),
+        }
+IMPLICIT_WRITES = {
+        'DMEM_WR'  : frozenset([DMEM]),
+        'WMEM_WR'  : frozenset([WMEM]),
+        }
+# WAIT polls the user time (s11) or the status register (s10) until it's ready, and doesn't write any registers
+WAIT_READS = frozenset(['s10', 's11'])
+# fields that don't hold register reads
+NON_READ_FIELDS = frozenset(['CMD', 'P_ADDR', 'LINE', 'LABEL', 'WR'])
+
+def inst_size(inst : dict) -> int:
+    """
+    :returns (int): number of program memory words taken by the instruction
+    """
+    return 2 if inst.get('CMD') == 'WAIT' else 1
+
+def is_straight(inst : dict) -> bool:
+    """
+    :returns (bool): True if the optimizer knows everything the instruction reads and writes
+    """
+    return inst.get('CMD') in IMPLICIT_READS
+
+def is_self_wait(inst : dict) -> bool:
+    """
+    :returns (bool): True if the instruction is a WAIT whose only branch is to its own second word
+    """
+    if inst.get('CMD') != 'WAIT' or 'IF' in inst or 'WR' in inst:
+        return False
+    if 'ADDR' not in inst:
+        return True
+    m = NUM_ADDR_RE.match(inst['ADDR'])
+    return m is not None and int(m.group(1)) == inst['_old'] + 1
+
+def get_reads(inst : dict) -> set:
+    """
+    :returns (set): registers (and memories) that a straight-line instruction or a WAIT reads
+    """
+    reads = set(WAIT_READS if inst['CMD'] == 'WAIT' else IMPLICIT_READS[inst['CMD']])
+    for key, val in inst.items():
+        if key in NON_READ_FIELDS or (key == 'DST' and inst['CMD'] == 'REG_WR'):
+            continue
+        reads.update(REG_TOKEN_RE.findall(str(val)))
+    if inst['CMD'] == 'REG_WR':
+        if inst.get('SRC') == 'wmem':
+            reads.add(WMEM)
+        elif inst.get('SRC') == 'dmem':
+            reads.add(DMEM)
+    return reads
+
+def get_writes(inst : dict) -> set:
+    """
+    :returns (set): registers (and memories) that a straight-line instruction or a WAIT writes
+    """
+    writes = set(IMPLICIT_WRITES.get(inst['CMD'], ()))
+    if inst['CMD'] == 'REG_WR':
+        if inst['DST'] == 'r_wave':
+            writes.update(W_REGS)
+        else:
+            writes.add(inst['DST'])
+    if 'WR' in inst:
+        writes.update(REG_TOKEN_RE.findall(inst['WR'].split()[0]))
+    return writes
+
+def is_plain_write(inst : dict) -> bool:
+    """
+    :returns (bool): True if the instruction is a REG_WR with no effect other than setting register values
+    """
+    if inst['CMD'] != 'REG_WR' or inst.get('UF', '0') != '0':
+        return False
+    return inst['DST'] == 'r_wave' or PLAIN_REG_RE.match(inst['DST']) is not None
+
+def is_stable(reads : set) -> bool:
+    """
+    :returns (bool): True if none of the registers read can change without being written by the program
+    """
+    return all(r in STABLE_S_REGS for r in reads if r.startswith('s'))
+
+class ProgramOptimizer():
+    """
+    Holds the program as one list of items (labels and instructions, in program order), applies the passes, and lays the program back out.
+    Each instruction item remembers its original address (for relocating numeric branch targets).
+    Removed instructions are marked dead and stay in the list until the layout, so their addresses can be mapped to the next live instruction.
+    """
+    def __init__(self, prog_list : list, label_dict : dict):
+        self.head = prog_list[0]
+        self.label_order = list(label_dict.keys())
+        self.fixed_labels = {}
+        self.items = []
+        self.end_addr = None
+        self.relocatable = self._build(prog_list, label_dict)
+
+    def _build(self, prog_list, label_dict):
+        by_addr = {}
+        for name, addr in label_dict.items():
+            m = NUM_ADDR_RE.match(addr)
+            if m is None:
+                self.fixed_labels[name] = addr
+            else:
+                by_addr.setdefault(int(m.group(1)), []).append(name)
+        # the first entry is a placeholder NOP which occupies address 0, the program proper starts at address 1
+        addr = 1
+        for inst in prog_list[1:]:
+            if inst.get('P_ADDR') != addr:
+                logger.debug("optimizer: instruction %s is not at the expected address %d", inst, addr)
+                return False
+            for name in by_addr.pop(addr, []):
+                self.items.append({'LABEL_DEF': name})
+            inst = dict(inst)
+            inst['_old'] = addr
+            self.items.append(inst)
+            addr += inst_size(inst)
+        self.end_addr = addr
+        for name in by_addr.pop(addr, []):
+            self.items.append({'LABEL_DEF': name})
+        if by_addr:
+            logger.debug("optimizer: labels %s don't point at an instruction", by_addr)
+            return False
+        # every branch target must be a label or an address we can relocate
+        starts = {item['_old'] for item in self.items if '_old' in item}
+        for inst in self.insts():
+            if inst['CMD'] in ['JUMP', 'CALL'] or (inst['CMD'] == 'WAIT' and 'ADDR' in inst):
+                if 'LABEL' in inst and 'ADDR' not in inst:
+                    if inst['LABEL'] not in label_dict or NUM_ADDR_RE.match(label_dict[inst['LABEL']]) is None:
+                        return False
+                    continue
+                m = NUM_ADDR_RE.match(inst.get('ADDR', ''))
+                if m is None:
+                    return False
+                target = int(m.group(1))
+                # WAIT jumps to its own second word
+                if target not in starts and target != self.end_addr and not (inst['CMD'] == 'WAIT' and target == inst['_old'] + 1):
+                    return False
+        return True
+
+    def insts(self):
+        """
+        :returns (generator): live instruction items
+        """
+        return (item for item in self.items if 'CMD' in item and not item.get('_dead'))
+
+    def _blocks(self):
+        """
+        Splits the items into straight-line blocks, without labels, branches or unknown instructions.
+        :returns (list): each element is a list of live instructions
+        """
+        blocks = [[]]
+        for item in self.items:
+            if item.get('_dead'):
+                continue
+            if 'CMD' in item and is_straight(item):
+                blocks[-1].append(item)
+            elif blocks[-1]:
+                blocks.append([])
+        return blocks
+
+    def dead_writes(self) -> int:
+        count = 0
+        for block in self._blocks():
+            # registers that are certain to be overwritten before they are read
+            dead = set()
+            for inst in reversed(block):
+                writes = get_writes(inst)
+                if is_plain_write(inst) and writes and writes <= dead:
+                    inst['_dead'] = True
+                    count += 1
+                    continue
+                if 'IF' not in inst:
+                    dead |= writes
+                dead -= get_reads(inst)
+        return count
+
+    def redundant_writes(self) -> int:
+        count = 0
+        for block in self._blocks():
+            # register -> (the REG_WR that last set it, the registers that value depends on)
+            known = {}
+            for inst in block:
+                writes = get_writes(inst)
+                reads = get_reads(inst)
+                sig = None
+                if is_plain_write(inst) and 'IF' not in inst:
+                    sig = tuple((k, v) for k, v in sorted(inst.items()) if k not in ['P_ADDR', 'LINE', '_old'])
+                    if inst['DST'] in known and known[inst['DST']][0] == sig:
+                        inst['_dead'] = True
+                        count += 1
+                        continue
+                for reg in [k for k, v in known.items() if v[1] & writes]:
+                    del known[reg]
+                if sig is not None and not (reads & writes) and is_stable(reads):
+                    known[inst['DST']] = (sig, reads | writes)
+        return count
+
+    def merge_time(self) -> int:
+        count = 0
+        prev = None
+        for item in self.items:
+            if item.get('_dead'):
+                continue
+            if item.get('CMD') != 'TIME' or item.get('C_OP') != 'inc_ref' or 'IF' in item or 'LIT' not in item:
+                prev = None
+                continue
+            m = TIME_LIT_RE.match(item['LIT'])
+            if m is None:
+                prev = None
+                continue
+            val = int(m.group(1))
+            if val == 0:
+                item['_dead'] = True
+                count += 1
+                continue
+            if prev is not None:
+                total = int(TIME_LIT_RE.match(prev['LIT']).group(1)) + val
+                # the literal is a signed 32-bit value
+                if -2**31 <= total < 2**31:
+                    prev['LIT'] = '#%d'%(total)
+                    item['_dead'] = True
+                    count += 1
+                    continue
+            prev = item
+        return count
+
+    def hoist(self) -> int:
+        count = 0
+        label_refs = {}
+        num_targets = set()
+        for inst in self.insts():
+            if 'LABEL' in inst:
+                label_refs[inst['LABEL']] = label_refs.get(inst['LABEL'], 0) + 1
+            m = NUM_ADDR_RE.match(inst.get('ADDR', '')) if inst['CMD'] in BRANCH_CMDS else None
+            if m is not None:
+                num_targets.add(int(m.group(1)))
+        for jump in list(self.insts()):
+            if jump['CMD'] != 'JUMP' or 'LABEL' not in jump or label_refs[jump['LABEL']] != 1:
+                continue
+            start = next((i for i, item in enumerate(self.items) if item.get('LABEL_DEF') == jump['LABEL']), None)
+            end = next(i for i, item in enumerate(self.items) if item is jump)
+            if start is None or start > end:
+                continue
+            body = [item for item in self.items[start+1:end] if not item.get('_dead')]
+            # innermost loops only: the body is one straight-line block (apart from WAITs), entered only from the top
+            if not all('CMD' in item and (is_straight(item) or is_self_wait(item)) for item in body):
+                continue
+            if any(item['_old'] in num_targets for item in body + [jump]):
+                continue
+            body.append(jump)
+            hoisted = []
+            for pos, inst in enumerate(body):
+                if not is_plain_write(inst) or 'IF' in inst or inst.get('SRC') not in ['imm', 'op']:
+                    continue
+                writes = get_writes(inst)
+                reads = get_reads(inst)
+                if reads & writes or not is_stable(reads):
+                    continue
+                others = [other for other in body if other is not inst and other not in hoisted]
+                if any(get_writes(other) & (writes | reads) for other in others):
+                    continue
+                if any(get_reads(other) & writes for other in body[:pos] if other not in hoisted):
+                    continue
+                hoisted.append(inst)
+            for inst in hoisted:
+                self.items.remove(inst)
+                start = next(i for i, item in enumerate(self.items) if item.get('LABEL_DEF') == jump['LABEL'])
+                self.items.insert(start, inst)
+                count += 1
+        return count
+
+    def jump_to_next(self) -> int:
+        count = 0
+        for jump in list(self.insts()):
+            if jump['CMD'] != 'JUMP' or 'WR' in jump or jump.get('UF', '0') != '0':
+                continue
+            pos = next(i for i, item in enumerate(self.items) if item is jump)
+            if 'LABEL' in jump and 'ADDR' not in jump:
+                target = next((i for i, item in enumerate(self.items) if item.get('LABEL_DEF') == jump['LABEL']), None)
+            else:
+                addr = int(NUM_ADDR_RE.match(jump['ADDR']).group(1))
+                target = next((i for i, item in enumerate(self.items) if item.get('_old') == addr), len(self.items) if addr == self.end_addr else None)
+            if target is None or target <= pos:
+                continue
+            if all('LABEL_DEF' in item or item.get('_dead') for item in self.items[pos+1:target]):
+                jump['_dead'] = True
+                count += 1
+        return count
+
+    def run(self, passes=PASSES) -> int:
+        """
+        Applies the passes until none of them finds anything more to do.
+        :returns (int): total number of instructions removed or moved
+        """
+        if not self.relocatable:
+            logger.info("optimizer: program has branches that can't be relocated, skipping")
+            return 0
+        total = 0
+        while True:
+            changed = 0
+            for name in PASSES:
+                if name in passes:
+                    n = getattr(self, name)()
+                    logger.debug("optimizer: %s changed %d instructions", name, n)
+                    changed += n
+            total += changed
+            if changed == 0:
+                return total
+
+    def layout(self) -> tuple:
+        """
+        Assigns new addresses and line numbers, and relocates the labels and numeric branch targets.
+        :returns (tuple): (program_list, label_dict)
+        """
+        # old address -> new address; removed instructions map to the next live instruction
+        addr_map = {}
+        pending = []
+        new_labels = {}
+        prog_list = [self.head]
+        p_addr = self.head['P_ADDR']
+        line = self.head['LINE']
+        for item in self.items:
+            if 'LABEL_DEF' in item:
+                new_labels[item['LABEL_DEF']] = '&%d'%(p_addr)
+                line += 1
+                continue
+            if item.get('_dead'):
+                pending.append(item['_old'])
+                continue
+            for old in pending:
+                addr_map[old] = p_addr
+            pending = []
+            for i in range(inst_size(item)):
+                addr_map[item['_old'] + i] = p_addr + i
+            inst = {k: v for k, v in item.items() if k != '_old'}
+            inst['P_ADDR'] = p_addr
+            inst['LINE'] = line
+            prog_list.append(inst)
+            p_addr += inst_size(inst)
+            line += 1
+        for old in pending + [self.end_addr]:
+            addr_map[old] = p_addr
+        for inst in prog_list[1:]:
+            if inst['CMD'] in BRANCH_CMDS and 'ADDR' in inst:
+                m = NUM_ADDR_RE.match(inst['ADDR'])
+                if m is not None:
+                    inst['ADDR'] = '&%d'%(addr_map[int(m.group(1))])
+        label_dict = {}
+        for name in self.label_order:
+            label_dict[name] = self.fixed_labels[name] if name in self.fixed_labels else new_labels[name]
+        return prog_list, label_dict
+
+def optimize(prog_list : list, label_dict : dict, passes=PASSES) -> tuple:
+    """
+    Runs the peephole optimizer on a program.
+
+    :prog_list (list): program list, as generated by QickProgramV2 (the first entry is the placeholder NOP)
+    :label_dict (dict): label name -> address
+    :passes (iterable): names of the passes to apply, see PASSES
+    :returns (tuple): (program_list, label_dict), new objects; if nothing could be optimized these are copies of the inputs
+    """
+    for name in passes:
+        if name not in PASSES:
+            raise RuntimeError("unknown optimizer pass %s, the available passes are %s"%(name, PASSES))
+    opt = ProgramOptimizer(prog_list, label_dict)
+    changed = opt.run(passes)
+    if not changed:
+        return [dict(inst) for inst in prog_list], dict(label_dict)
+    before = sum(inst_size(inst) for inst in prog_list[1:])
+    new_list, new_labels = opt.layout()
+    after = sum(inst_size(inst) for inst in new_list[1:])
+    logger.info("optimizer: %d instructions changed, program size %d -> %d words", changed, before, after)
+    return new_list, new_labels